@@ -1,7 +1,53 @@
+from datetime import datetime
+from typing import Optional
+
 import pydantic
 
-from job_scheduler.models import Job
+from job_scheduler.models import Job, JobAction
 
 
 class CreateJob(pydantic.BaseModel):
     job: Job
+
+
+class PutTemplate(pydantic.BaseModel):
+    action: JobAction
+
+
+class ListJobs(pydantic.BaseModel):
+    limit: Optional[int] = pydantic.Field(default=None, ge=1, le=1000)
+    cursor: Optional[str] = None
+    category: Optional[str] = None
+    name_prefix: Optional[str] = None
+    run_at_from: Optional[datetime] = None
+    run_at_to: Optional[datetime] = None
+    paused: Optional[bool] = None
+    stream: bool = False
+
+
+class ListExecutions(pydantic.BaseModel):
+    limit: Optional[int] = pydantic.Field(default=None, ge=1, le=1000)
+    # Id of the last execution of the previous page
+    cursor: Optional[int] = None
+    category: Optional[str] = None
+    started_from: Optional[datetime] = None
+    started_to: Optional[datetime] = None
+
+
+class JobSelection(pydantic.BaseModel):
+    category: Optional[str] = None
+    name_prefix: Optional[str] = None
+    run_at_from: Optional[datetime] = None
+    run_at_to: Optional[datetime] = None
+
+    @pydantic.model_validator(mode="after")
+    def check_selection(self) -> "JobSelection":
+        # DELETE /jobs is the way to remove all jobs.
+        if self.category is None and not self.name_prefix:
+            raise ValueError("Select jobs by category and/or name_prefix")
+        return self
+
+
+class ShiftJobs(JobSelection):
+    # Seconds to move the run times by, negative to move them earlier
+    seconds: float
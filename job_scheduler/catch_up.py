@@ -0,0 +1,91 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from job_scheduler.settings import parse_category_setting
+
+
+class MisfirePolicy:
+    """What to do with the runs of a job that were missed.
+
+    ``all`` runs every missed run, ``latest`` only the most recent one and
+    ``skip_older_than:N`` drops the runs missed by more than N seconds.
+    """
+
+    MODES = ("all", "latest", "skip_older_than")
+
+    def __init__(self, mode: str = "all", max_lateness: float = 0) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown misfire policy: {mode}")
+        self.mode = mode
+        self.max_lateness = max_lateness
+
+    @classmethod
+    def parse(cls, value: str) -> "MisfirePolicy":
+        mode, _, max_lateness = value.strip().partition(":")
+        if mode == "skip_older_than":
+            try:
+                return cls(mode, float(max_lateness))
+            except ValueError:
+                raise ValueError(f"Invalid misfire policy: {value}")
+        if max_lateness:
+            raise ValueError(f"Invalid misfire policy: {value}")
+        return cls(mode)
+
+    def __str__(self) -> str:
+        if self.mode == "skip_older_than":
+            return f"{self.mode}:{self.max_lateness:g}"
+        return self.mode
+
+    def apply(
+        self, run_times: List[datetime], now: datetime
+    ) -> Tuple[List[datetime], int]:
+        """Returns the run times to run and the number of dropped ones."""
+        if self.mode == "latest":
+            kept = run_times[-1:]
+        elif self.mode == "skip_older_than":
+            kept = [
+                run_time
+                for run_time in run_times
+                if (now - run_time).total_seconds() <= self.max_lateness
+            ]
+        else:
+            kept = run_times
+        return kept, len(run_times) - len(kept)
+
+
+def parse_misfire_policies(value: str) -> Dict[str, MisfirePolicy]:
+    """Parses "category=policy,..." settings into policies by category."""
+    return parse_category_setting(value, MisfirePolicy.parse)
+
+
+class TokenBucket:
+    """Allows ``rate`` operations per second, in bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def take(self, count: int) -> int:
+        """Takes up to ``count`` tokens and returns how many were taken."""
+        self._refill()
+        taken = min(count, int(self._tokens))
+        self._tokens -= taken
+        return taken
+
+    def give_back(self, count: int) -> None:
+        self._tokens = min(self._tokens + count, self.burst)
+
+    def seconds_until_available(self) -> float:
+        self._refill()
+        return max(1 - self._tokens, 0) / self.rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._updated_at) * self.rate, self.burst
+        )
+        self._updated_at = now
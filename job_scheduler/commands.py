@@ -1,11 +1,257 @@
 import abc
 import asyncio
-from typing import Any, Dict, Optional, Text
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Text
+from urllib.parse import urlsplit
 
 import aiohttp
 from loguru import logger
 
+from job_scheduler.http_client import get_http_session
+from job_scheduler.log import redact_headers, truncate
+from job_scheduler.metrics import (
+    HTTP_COMMAND_DURATION,
+    HTTP_COMMAND_RESPONSES,
+    category_label,
+)
 from job_scheduler.models import JobAction
+from job_scheduler.settings import settings
+
+
+class HTTPCommandError(ValueError):
+    def __init__(
+        self, message: str, status: int, response: Optional[str] = None
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        # Captured excerpt of the response body, see HTTPJobData
+        self.response = response
+
+
+class CommandResult:
+    def __init__(
+        self, status: Optional[int] = None, response: Optional[str] = None
+    ) -> None:
+        self.status = status
+        self.response = response
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str, retry_after: float) -> None:
+        super().__init__(
+            f"Circuit breaker for host {host} is open, "
+            f"retry after {retry_after:.1f}s"
+        )
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stops calls to a host while too many of its recent calls failed.
+
+    The outcomes of the last ``window_size`` calls are kept, calls slower
+    than ``slow_call_duration`` seconds count as failed. Once at least
+    ``min_calls`` are recorded and the failure rate reaches
+    ``failure_rate_threshold`` the circuit opens and calls are rejected for
+    ``open_duration`` seconds. Then a single probe call is let through
+    (half-open), which closes the circuit if it succeeds and opens it again
+    if it fails.
+
+    Every allowed call gets a number from before_call() to pass to
+    record(), so calls that started before the circuit changed its state
+    do not count: while the circuit is not closed only the probe decides.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        host: str,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 20,
+        window_size: int = 100,
+        slow_call_duration: float = 60,
+        open_duration: float = 30,
+    ) -> None:
+        self.host = host
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.slow_call_duration = slow_call_duration
+        self.open_duration = open_duration
+
+        self.state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._num_failures = 0
+        self._opened_at = 0.0
+        # Number of the last allowed call, of the probe and of the last call
+        # started before the circuit closed
+        self._last_call = 0
+        self._probe: Optional[int] = None
+        self._closed_after = 0
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._num_failures / len(self._outcomes)
+
+    def before_call(self) -> int:
+        """Returns the number of the call to pass to record().
+
+        Raises CircuitOpenError if the call is not allowed.
+        """
+        if self.state == self.CLOSED:
+            self._last_call += 1
+            return self._last_call
+
+        retry_after = self._opened_at + self.open_duration - time.monotonic()
+        if self.state == self.OPEN and retry_after <= 0:
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN and self._probe is None:
+            self._last_call += 1
+            self._probe = self._last_call
+            return self._probe
+
+        # While the probe is running the outcome is unknown, so callers wait
+        # as long as for a freshly opened circuit.
+        if self.state == self.HALF_OPEN:
+            retry_after = self.open_duration
+        raise CircuitOpenError(self.host, retry_after)
+
+    def record(self, call: int, failed: bool, duration: float) -> None:
+        failed = failed or duration >= self.slow_call_duration
+
+        if self.state != self.CLOSED:
+            if call == self._probe:
+                self._probe = None
+                if failed:
+                    self._open()
+                else:
+                    self._close()
+            return
+        if call <= self._closed_after:
+            return
+
+        if len(self._outcomes) == self._outcomes.maxlen and self._outcomes[0]:
+            self._num_failures -= 1
+        self._outcomes.append(failed)
+        self._num_failures += failed
+
+        if (
+            len(self._outcomes) >= self.min_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        if self.state == self.CLOSED:
+            logger.warning(
+                f"Opening circuit breaker for host {self.host}, "
+                f"failure rate {self.failure_rate:.0%}"
+            )
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+
+    def _close(self) -> None:
+        logger.info(f"Closing circuit breaker for host {self.host}")
+        self.state = self.CLOSED
+        self._outcomes.clear()
+        self._num_failures = 0
+        self._closed_after = self._last_call
+
+    def to_dict(self) -> Dict[Text, Any]:
+        data: Dict[Text, Any] = {
+            "host": self.host,
+            "state": self.state,
+            "failure_rate": self.failure_rate,
+            "num_calls": len(self._outcomes),
+        }
+        if self.state == self.OPEN:
+            data["retry_after"] = max(
+                self._opened_at + self.open_duration - time.monotonic(), 0
+            )
+        return data
+
+
+class CircuitBreakerRegistry:
+    def __init__(self, **breaker_args: Any) -> None:
+        self.breaker_args = breaker_args
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                host, **self.breaker_args
+            )
+        return breaker
+
+    def list(self) -> List[CircuitBreaker]:
+        return [self._breakers[host] for host in sorted(self._breakers)]
+
+
+def merge_circuit_breakers(
+    snapshots: Iterable[Sequence[Dict[Text, Any]]]
+) -> List[Dict[Text, Any]]:
+    """Combines the breaker lists of one or more processes by host.
+
+    The lists hold CircuitBreaker.to_dict() results. Per host the most
+    restrictive state of the processes is shown, with their calls and
+    failure rate in total, the number of processes per state and the
+    longest ``retry_after`` of the open ones (None if none is open).
+    """
+    ranks = {
+        CircuitBreaker.CLOSED: 0,
+        CircuitBreaker.HALF_OPEN: 1,
+        CircuitBreaker.OPEN: 2,
+    }
+    merged: Dict[str, Dict[Text, Any]] = {}
+    for snapshot in snapshots:
+        for breaker in snapshot:
+            data = merged.get(breaker["host"])
+            if data is None:
+                data = merged[breaker["host"]] = {
+                    "host": breaker["host"],
+                    "state": breaker["state"],
+                    "failure_rate": 0.0,
+                    "num_calls": 0,
+                    "num_failures": 0.0,
+                    "states": {},
+                    "retry_after": None,
+                }
+            if ranks[breaker["state"]] > ranks[data["state"]]:
+                data["state"] = breaker["state"]
+            data["num_failures"] += (
+                breaker["failure_rate"] * breaker["num_calls"]
+            )
+            data["num_calls"] += breaker["num_calls"]
+            data["states"][breaker["state"]] = (
+                data["states"].get(breaker["state"], 0) + 1
+            )
+            if "retry_after" in breaker:
+                data["retry_after"] = max(
+                    data["retry_after"] or 0, breaker["retry_after"]
+                )
+
+    for data in merged.values():
+        num_failures = data.pop("num_failures")
+        data["failure_rate"] = (
+            num_failures / data["num_calls"] if data["num_calls"] else 0.0
+        )
+    return [merged[host] for host in sorted(merged)]
+
+
+circuit_breakers = CircuitBreakerRegistry(
+    failure_rate_threshold=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+    min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+    window_size=settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+    slow_call_duration=settings.CIRCUIT_BREAKER_SLOW_CALL_DURATION,
+    open_duration=settings.CIRCUIT_BREAKER_OPEN_DURATION,
+)
 
 
 class Command(metaclass=abc.ABCMeta):
@@ -19,18 +265,30 @@ class Command(metaclass=abc.ABCMeta):
         return str(self)
 
     @abc.abstractmethod
-    async def execute(self, context: Dict[Text, Any]):
-        ...
+    async def execute(self, context: Dict[Text, Any]) -> CommandResult:
+        """Runs the command, returning its response status and excerpt."""
 
     @staticmethod
     def get_command(action: JobAction) -> "Command":
-        if action.http:
+        # Commands are immutable, so the command is built once per action.
+        # Jobs sharing an action template share the command as well.
+        if action._command is None:
+            action._command = Command._build_command(action)
+        return action._command
+
+    @staticmethod
+    def _build_command(action: JobAction) -> "Command":
+        if action.template:
+            raise ValueError(f"Unresolved action template: {action.template}")
+        elif action.http:
             return HTTPCommand(
                 url=action.http.url,
                 method=action.http.method,
                 headers=action.http.headers,
                 body=action.http.body,
                 timeout=action.http.timeout,
+                response_mode=action.http.response_mode,
+                response_max_bytes=action.http.response_max_bytes,
             )
         else:
             raise ValueError(f"Unsupported job action: {action}")
@@ -46,6 +304,8 @@ class HTTPCommand(Command):
         headers: Dict[Text, Any] = {},
         body: Optional[str] = None,
         timeout: Optional[int] = None,
+        response_mode: str = "discard",
+        response_max_bytes: int = 1024,
     ) -> None:
         super().__init__(type="http")
         self.url = url
@@ -53,42 +313,129 @@ class HTTPCommand(Command):
         self.headers = headers
         self.body = body
         self.timeout = timeout
+        self.response_mode = response_mode
+        self.response_max_bytes = response_max_bytes
+        self.host = urlsplit(url).netloc
 
     def __str__(self) -> str:
-        return f"HTTPCommand<{self.url}, {self.method}, {self.headers}, {self.body}>"
+        return (
+            f"HTTPCommand<{self.url}, {self.method}, "
+            f"{redact_headers(self.headers)}, {truncate(self.body)}>"
+        )
 
-    async def execute(self, context: Dict[Text, Any]):
+    async def execute(self, context: Dict[Text, Any]) -> CommandResult:
+        # Messages are formatted by loguru only if the record is emitted,
+        # the keyword arguments also become fields of structured records.
         logger.debug(
-            f"Executing HTTP command in context={repr(context)}: {self}"
+            "Executing {command} for job {job_uuid}",
+            command=self,
+            **context,
         )
 
-        session_timeout = aiohttp.ClientTimeout(
+        request_timeout = aiohttp.ClientTimeout(
             total=self.timeout
             if self.timeout
             else self.__class__.DEFAULT_TIMEOUT
         )
 
-        async with aiohttp.ClientSession(timeout=session_timeout) as session:
+        session = get_http_session()
+        category = category_label(context.get("job_category"))
+
+        breaker = (
+            circuit_breakers.get(self.host)
+            if settings.CIRCUIT_BREAKER_ENABLED
+            else None
+        )
+        if breaker:
             try:
-                async with session.request(
-                    method=self.method,
-                    url=self.url,
-                    headers=self.headers,
-                    data=self.body,
-                ) as response:
-                    status = response.status
-
-                    if not (200 <= status < 300):
-                        raise ValueError(
-                            f"HTTP command for context={repr(context)} failed with status={status}"
-                        )
-
-                    response_body = await response.text()
+                call = breaker.before_call()
+            except CircuitOpenError:
+                HTTP_COMMAND_RESPONSES.inc(category, "circuit_open")
+                raise
+
+        # Server errors, timeouts and connection errors count as failures of
+        # the host, client errors do not.
+        failed = True
+        status_label = "error"
+        started_at = time.monotonic()
+        try:
+            async with session.request(
+                method=self.method,
+                url=self.url,
+                headers=self.headers,
+                data=self.body,
+                timeout=request_timeout,
+            ) as response:
+                status = response.status
+                failed = status >= 500
+                status_label = str(status)
+
+                excerpt = await self._read_response(response)
+                if excerpt is not None:
                     logger.debug(
-                        f"HTTP response for context={repr(context)}: {response.status}, {response_body}"
+                        "HTTP response for job {job_uuid}: {status}, {body}",
+                        status=status,
+                        body=excerpt,
+                        **context,
+                    )
+                if self.response_mode != "capture":
+                    excerpt = None
+
+                if not (200 <= status < 300):
+                    raise HTTPCommandError(
+                        f"HTTP command for context={repr(context)} failed with status={status}",
+                        status=status,
+                        response=excerpt,
                     )
-            except asyncio.exceptions.TimeoutError as exp:
-                logger.exception(
-                    f"HTTP command for context={repr(context)} timed out"
+                return CommandResult(status=status, response=excerpt)
+        except asyncio.exceptions.TimeoutError as exp:
+            logger.error(
+                "HTTP command {url} for job {job_uuid} timed out",
+                url=self.url,
+                **context,
+            )
+            status_label = "timeout"
+            raise exp
+        finally:
+            duration = time.monotonic() - started_at
+            HTTP_COMMAND_DURATION.observe(duration, category)
+            HTTP_COMMAND_RESPONSES.inc(category, status_label)
+            if breaker:
+                breaker.record(call, failed, duration)
+
+    async def _read_response(
+        self, response: aiohttp.ClientResponse
+    ) -> Optional[str]:
+        """Reads the response body as configured and frees the connection.
+
+        Returns the first response_max_bytes of the body unless it is
+        discarded. The connection goes back to the pool if the body was read
+        to its end, otherwise it is closed rather than draining the rest.
+        """
+        if self.response_mode == "discard":
+            num_bytes = 0
+            while num_bytes <= settings.HTTP_DRAIN_MAX_BYTES:
+                chunk = await response.content.readany()
+                if not chunk:
+                    break
+                num_bytes += len(chunk)
+            excerpt = None
+        else:
+            data = bytearray()
+            while len(data) < self.response_max_bytes:
+                chunk = await response.content.read(
+                    self.response_max_bytes - len(data)
                 )
-                raise exp
+                if not chunk:
+                    break
+                data += chunk
+            try:
+                excerpt = data.decode(response.charset or "utf-8", "replace")
+            except LookupError:
+                excerpt = data.decode("utf-8", "replace")
+
+        if response.content.at_eof():
+            response.release()
+        else:
+            response.close()
+        return excerpt
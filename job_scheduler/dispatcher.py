@@ -0,0 +1,528 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple, Union
+
+from loguru import logger
+
+from job_scheduler.catch_up import MisfirePolicy, TokenBucket
+from job_scheduler.executor import JobExecutor
+from job_scheduler.metrics import JOB_MISSED_RUNS, category_label
+from job_scheduler.store import AsyncJobStore, StoredJob
+from job_scheduler.timing_wheel import TimingWheel
+from job_scheduler.workers import WorkerPool
+
+# Most seconds between removing the one-shot jobs that finished
+LEASE_FLUSH_INTERVAL = 1.0
+
+
+class _Lease:
+    """Claim of a one-shot job held until its runs are done."""
+
+    def __init__(
+        self, token: str, num_runs: int, run_time: Optional[float]
+    ) -> None:
+        self.token = token
+        self.num_runs = num_runs
+        # Stored run time of the claimed job, see AsyncJobStore.finish_jobs()
+        self.run_time = run_time
+        self.dropped = False
+
+
+class Dispatcher:
+    """Fires due jobs from an AsyncJobStore.
+
+    Follows APScheduler's processing loop: due jobs are claimed in batches,
+    their triggers advanced (or the job removed once its trigger is
+    exhausted) and the job runs are submitted to a JobExecutor, which blocks
+    the dispatcher while its queue is full. Claiming makes every run fire
+    on one node only when several dispatchers share the store. Between
+    batches the dispatcher sleeps until the next run time, a wakeup, or at
+    most ``max_poll_interval`` seconds.
+
+    Jobs due more than ``catch_up_threshold`` seconds ago, after downtime
+    or an overload, are replayed oldest first at no more than
+    ``catch_up_max_rate`` jobs per second (unlimited if 0) while jobs that
+    come due meanwhile run on time. The missed runs of a job are filtered
+    by the misfire policy of its category.
+
+    Exhausted jobs, one-shot jobs in particular, keep their row and lease
+    while their runs are queued or in progress. The leases are renewed and
+    the rows removed once the runs are done, the runs the executor dropped
+    are released to run again. If the node dies, the lease expires and
+    another node runs the job again, so these runs happen at least once.
+    Recurring jobs are released with their next run time before their runs
+    are submitted, a run lost with its node is not repeated.
+    """
+
+    def __init__(
+        self,
+        store: AsyncJobStore,
+        executor: Union[JobExecutor, WorkerPool],
+        timezone: tzinfo,
+        batch_size: int = 500,
+        max_poll_interval: float = 30,
+        catch_up_max_rate: float = 0,
+        catch_up_threshold: float = 60,
+        misfire_policies: Optional[Dict[str, MisfirePolicy]] = None,
+        default_misfire_policy: Optional[MisfirePolicy] = None,
+    ) -> None:
+        self.store = store
+        self.executor = executor
+        self.timezone = timezone
+        self.batch_size = batch_size
+        self.max_poll_interval = max_poll_interval
+        self.catch_up_threshold = catch_up_threshold
+        self.misfire_policies = misfire_policies or {}
+        self.default_misfire_policy = default_misfire_policy or MisfirePolicy()
+
+        self._catch_up_limiter = (
+            TokenBucket(catch_up_max_rate) if catch_up_max_rate > 0 else None
+        )
+        self._catching_up = False
+        self._num_replayed = 0
+        self._num_skipped = 0
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup_event = asyncio.Event()
+        self._next_wakeup: Optional[datetime] = None
+        self._instances: Dict[str, int] = {}
+
+        self._lease_task: Optional[asyncio.Task] = None
+        self._leases: Dict[str, _Lease] = {}
+        # (job id, lease token, run time) of the held jobs that are done
+        self._finished: List[Tuple[str, str, Optional[float]]] = []
+        self._dropped: List[Tuple[str, str]] = []
+        # Monotonic time the loop last made progress, see seconds_idle
+        self._heartbeat = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def seconds_idle(self) -> float:
+        """Seconds since the loop last processed jobs or submitted one."""
+        return time.monotonic() - self._heartbeat
+
+    async def start(self) -> None:
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        self._lease_task = asyncio.create_task(self._keep_leases())
+
+    async def shutdown(self) -> None:
+        """Stops firing jobs, the leases are kept until close()."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def close(self) -> None:
+        """Removes the finished held jobs and releases the others.
+
+        Called after the executor has been shut down.
+        """
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+            await asyncio.gather(self._lease_task, return_exceptions=True)
+            self._lease_task = None
+
+        for job_id, lease in self._leases.items():
+            self._dropped.append((job_id, lease.token))
+        self._leases.clear()
+        try:
+            await self._flush_leases()
+        except Exception:
+            logger.exception("Error releasing the held jobs")
+
+    def catch_up_stats(self) -> Dict[Text, Any]:
+        limiter = self._catch_up_limiter
+        return {
+            "catching_up": self._catching_up,
+            "max_rate": limiter.rate if limiter is not None else None,
+            "threshold": self.catch_up_threshold,
+            "replayed": self._num_replayed,
+            "skipped": self._num_skipped,
+            "policies": {
+                category: str(policy)
+                for category, policy in self.misfire_policies.items()
+            },
+            "default_policy": str(self.default_misfire_policy),
+        }
+
+    def jobs_added(self, jobs: Sequence[StoredJob]) -> None:
+        """Tells the dispatcher about jobs that were just stored."""
+        if jobs:
+            self.wakeup(min(job.next_run_time for job in jobs))
+
+    def jobs_removed(self, job_ids: Sequence[str]) -> None:
+        """Tells the dispatcher about jobs that were just removed."""
+
+    def wakeup(self, next_run_time: Optional[datetime] = None) -> None:
+        """Makes the dispatcher process jobs now.
+
+        With ``next_run_time`` the wakeup only happens if it is earlier than
+        the time the dispatcher is currently sleeping until.
+        """
+        if (
+            next_run_time is None
+            or self._next_wakeup is None
+            or next_run_time < self._next_wakeup
+        ):
+            self._wakeup_event.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._heartbeat = time.monotonic()
+            try:
+                wait_seconds = await self._process_jobs()
+            except Exception:
+                logger.exception("Error processing due jobs")
+                wait_seconds = self.max_poll_interval
+
+            wait_seconds = min(wait_seconds, self.max_poll_interval)
+            self._next_wakeup = datetime.now(self.timezone) + timedelta(
+                seconds=wait_seconds
+            )
+
+            try:
+                await asyncio.wait_for(
+                    self._wakeup_event.wait(), timeout=wait_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup_event.clear()
+
+    async def _process_jobs(self) -> float:
+        """Fires all due jobs of one batch.
+
+        Returns the number of seconds to wait until the next batch.
+        """
+        now = datetime.now(self.timezone)
+        due_jobs = await self._claim_due_jobs(now)
+        await self._fire_jobs(now, due_jobs)
+
+        if len(due_jobs) == self.batch_size:
+            return 0
+
+        # While the backlog is throttled, the jobs that come due on time
+        # still wake the dispatcher at their run time.
+        due_after = None
+        if self._catching_up:
+            due_after = now - timedelta(seconds=self.catch_up_threshold)
+        next_run_time = await self.store.get_next_run_time(due_after=due_after)
+        if next_run_time is None:
+            wait_seconds = self.max_poll_interval
+        else:
+            wait_seconds = max(
+                (next_run_time - datetime.now(self.timezone)).total_seconds(),
+                0,
+            )
+
+        if self._catching_up:
+            wait_seconds = min(
+                wait_seconds, self._catch_up_limiter.seconds_until_available()
+            )
+        return wait_seconds
+
+    async def _claim_due_jobs(
+        self, now: datetime, job_ids: Optional[Sequence[str]] = None
+    ) -> List[StoredJob]:
+        limit = len(job_ids) if job_ids is not None else self.batch_size
+        if self._catch_up_limiter is None:
+            return await self.store.claim_due_jobs(now, limit, job_ids=job_ids)
+
+        late = now - timedelta(seconds=self.catch_up_threshold)
+        due_jobs = await self.store.claim_due_jobs(
+            now, limit, job_ids=job_ids, due_after=late
+        )
+
+        num_late_jobs = self._catch_up_limiter.take(limit - len(due_jobs))
+        if num_late_jobs:
+            late_jobs = await self.store.claim_due_jobs(
+                late, num_late_jobs, job_ids=job_ids
+            )
+            self._catch_up_limiter.give_back(num_late_jobs - len(late_jobs))
+            # Claims by id are the jobs expected to be due, they tell
+            # nothing about the rest of the backlog.
+            if job_ids is None:
+                self._catching_up = len(late_jobs) == num_late_jobs
+            due_jobs.extend(late_jobs)
+
+        return due_jobs
+
+    async def _fire_jobs(
+        self, now: datetime, due_jobs: Sequence[StoredJob]
+    ) -> None:
+        """Submits the due runs of claimed jobs and advances their triggers."""
+        late = now - timedelta(seconds=self.catch_up_threshold)
+        runs: List[Tuple[StoredJob, datetime]] = []
+        updated_jobs: List[StoredJob] = []
+        removed_jobs: List[StoredJob] = []
+
+        for job in due_jobs:
+            due_run_times = job.get_run_times(now)
+            run_times = due_run_times
+
+            if job.misfire_grace_time is not None:
+                run_times = [
+                    run_time
+                    for run_time in run_times
+                    if now - run_time
+                    <= timedelta(seconds=job.misfire_grace_time)
+                ]
+                if len(run_times) < len(due_run_times):
+                    JOB_MISSED_RUNS.inc(
+                        category_label(job.job.job.category),
+                        amount=len(due_run_times) - len(run_times),
+                    )
+                if not run_times:
+                    logger.warning(
+                        f"Run time of job {job.id} was missed by more than "
+                        f"{job.misfire_grace_time}s"
+                    )
+
+            if job.coalesce:
+                run_times = run_times[-1:]
+
+            if run_times and run_times[0] < late:
+                policy = self.misfire_policies.get(
+                    job.job.job.category, self.default_misfire_policy
+                )
+                run_times, num_skipped = policy.apply(run_times, now)
+                if num_skipped:
+                    logger.debug(
+                        "Skipped {} missed runs of job {} by misfire policy {}",
+                        num_skipped,
+                        job.id,
+                        policy,
+                    )
+                    JOB_MISSED_RUNS.inc(
+                        category_label(job.job.job.category),
+                        amount=num_skipped,
+                    )
+                    self._num_skipped += num_skipped
+                self._num_replayed += sum(
+                    run_time < late for run_time in run_times
+                )
+
+            runs.extend((job, run_time) for run_time in run_times)
+
+            next_run_time = (
+                job.get_next_fire_time(due_run_times[-1], now)
+                if due_run_times
+                else job.next_run_time
+            )
+            if next_run_time:
+                job.next_run_time = next_run_time
+                updated_jobs.append(job)
+            else:
+                removed_jobs.append(job)
+
+        # Jobs removed with runs to do are held until the runs are done
+        num_runs: Dict[str, int] = {}
+        for job, _ in runs:
+            num_runs[job.id] = num_runs.get(job.id, 0) + 1
+        held_jobs = [job for job in removed_jobs if job.id in num_runs]
+        removed_jobs = [job for job in removed_jobs if job.id not in num_runs]
+
+        # Store the new schedule before starting any run, so a failed write
+        # cannot fire the same run twice.
+        completed_job_ids = await self.store.complete_jobs(
+            updated_jobs, removed_jobs, held_jobs
+        )
+        for job in held_jobs:
+            if job.id in completed_job_ids:
+                self._leases[job.id] = _Lease(
+                    job.lease_token, num_runs[job.id], job.claimed_run_time
+                )
+
+        for job, run_time in runs:
+            if job.id not in completed_job_ids:
+                logger.warning(
+                    f"Lease of job {job.id} expired before its runs were "
+                    f"submitted -- skipping them"
+                )
+                continue
+            await self._submit(job, run_time)
+
+    async def _submit(self, job: StoredJob, run_time: datetime) -> None:
+        if self._instances.get(job.id, 0) >= job.max_instances:
+            logger.warning(
+                f"Execution of job {job.id} skipped: maximum number of "
+                f"running instances reached ({job.max_instances})"
+            )
+            self._run_done(job, dropped=False)
+            return
+
+        self._instances[job.id] = self._instances.get(job.id, 0) + 1
+        try:
+            done = await self.executor.submit(
+                job.job, scheduled_at=run_time.timestamp()
+            )
+        except BaseException:
+            self._on_done(job, None)
+            raise
+        done.add_done_callback(lambda future: self._on_done(job, future))
+        self._heartbeat = time.monotonic()
+
+    def _on_done(self, job: StoredJob, done: Optional[asyncio.Future]) -> None:
+        self._instances[job.id] -= 1
+        if not self._instances[job.id]:
+            del self._instances[job.id]
+        # Executors cancel the runs they dropped
+        self._run_done(job, dropped=done is None or done.cancelled())
+
+    def _run_done(self, job: StoredJob, dropped: bool) -> None:
+        lease = self._leases.get(job.id)
+        if lease is None or lease.token != job.lease_token:
+            return
+
+        lease.num_runs -= 1
+        lease.dropped = lease.dropped or dropped
+        if lease.num_runs:
+            return
+        del self._leases[job.id]
+        if lease.dropped:
+            self._dropped.append((job.id, lease.token))
+        else:
+            self._finished.append((job.id, lease.token, lease.run_time))
+
+    async def _keep_leases(self) -> None:
+        renew_interval = self.store.lease_duration / 3
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(min(LEASE_FLUSH_INTERVAL, renew_interval))
+            try:
+                await self._flush_leases()
+                if time.monotonic() - renewed_at >= renew_interval:
+                    renewed_at = time.monotonic()
+                    await self.store.renew_leases(
+                        {lease.token for lease in self._leases.values()}
+                    )
+            except Exception:
+                logger.exception("Error updating the held jobs")
+
+    async def _flush_leases(self) -> None:
+        finished, self._finished = self._finished, []
+        dropped, self._dropped = self._dropped, []
+        try:
+            await self.store.finish_jobs(finished)
+            finished = []
+            await self.store.release_jobs(dropped)
+        except BaseException:
+            # Tried again with the next flush
+            self._finished[:0] = finished
+            self._dropped[:0] = dropped
+            raise
+
+
+class TimingWheelDispatcher(Dispatcher):
+    """Fires due jobs from an in-memory timing wheel.
+
+    The run times of the jobs due within the next ``window`` seconds are
+    paged in from the store and kept in a TimingWheel advanced every
+    ``tick`` seconds, so firing a job does not need a query for the earliest
+    run time. Expired jobs are claimed by id. Every ``max_poll_interval``
+    seconds the store is also swept for due jobs the wheel does not know
+    about, added by other nodes or moved by bulk operations. While a
+    backlog of late jobs is replayed, the sweep runs as often as the
+    catch-up rate allows.
+    """
+
+    load_page_size = 10000
+
+    def __init__(
+        self,
+        *args: Any,
+        tick: float = 0.1,
+        window: float = 300,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.tick = tick
+        self.window = window
+
+        self._wheel = TimingWheel(tick=tick, start=time.time())
+        # UTC timestamp up to which the wheel holds all stored jobs
+        self._loaded_until = 0.0
+        self._next_sweep = 0.0
+
+    def jobs_added(self, jobs: Sequence[StoredJob]) -> None:
+        for job in jobs:
+            timestamp = job.next_run_time.timestamp()
+            if timestamp < self._loaded_until:
+                self._wheel.add(job.id, timestamp)
+
+    def jobs_removed(self, job_ids: Sequence[str]) -> None:
+        for job_id in job_ids:
+            self._wheel.remove(job_id)
+
+    def wakeup(self, next_run_time: Optional[datetime] = None) -> None:
+        if next_run_time is None:
+            # Jobs were changed in bulk, page the window in again
+            self._loaded_until = 0.0
+            self._next_sweep = 0.0
+
+    async def _process_jobs(self) -> float:
+        timestamp = time.time()
+
+        if timestamp >= self._next_sweep:
+            now = datetime.now(self.timezone)
+            due_jobs = await self._claim_due_jobs(now)
+            await self._fire_jobs(now, due_jobs)
+            if len(due_jobs) == self.batch_size:
+                self._next_sweep = timestamp
+            elif self._catching_up:
+                self._next_sweep = (
+                    timestamp
+                    + self._catch_up_limiter.seconds_until_available()
+                )
+            else:
+                self._next_sweep = timestamp + self.max_poll_interval
+
+        if timestamp + self.window / 2 >= self._loaded_until:
+            await self._load_window(timestamp + self.window)
+
+        due_job_ids = self._wheel.advance(time.time())
+        for i in range(0, len(due_job_ids), self.batch_size):
+            job_ids = due_job_ids[i : i + self.batch_size]
+            now = datetime.now(self.timezone)
+            due_jobs = await self._claim_due_jobs(now, job_ids=job_ids)
+            await self._fire_jobs(now, due_jobs)
+
+        return self.tick
+
+    async def _fire_jobs(
+        self, now: datetime, due_jobs: Sequence[StoredJob]
+    ) -> None:
+        await super()._fire_jobs(now, due_jobs)
+
+        # Recurring jobs go back onto the wheel with their next run time
+        self.jobs_added([job for job in due_jobs if job.next_run_time > now])
+
+    async def _load_window(self, until: float) -> None:
+        num_jobs = 0
+        # Continues after the jobs loaded before, all of them after a reset
+        after: Optional[Tuple[float, str]] = (self._loaded_until, "")
+        while True:
+            run_times = await self.store.get_run_times(
+                until, after=after, limit=self.load_page_size
+            )
+            for run_time, job_id in run_times:
+                self._wheel.add(job_id, run_time)
+            num_jobs += len(run_times)
+
+            if len(run_times) < self.load_page_size:
+                break
+            after = run_times[-1]
+
+        self._loaded_until = until
+        logger.debug(
+            "Loaded {} jobs due before {} into the wheel", num_jobs, until
+        )
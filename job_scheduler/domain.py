@@ -1,15 +1,200 @@
+import json
 import uuid
-from typing import Any, Dict, Text
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Text,
+    Tuple,
+)
 
 from job_scheduler import scheduler
-from job_scheduler.models import Job, RunnableJob
+from job_scheduler.api_models import (
+    JobSelection,
+    ListExecutions,
+    ListJobs,
+    ShiftJobs,
+)
+from job_scheduler.models import Job, JobAction, RunnableJob
+from job_scheduler.store import StoredJob
+
+DEFAULT_JOBS_PAGE_SIZE = 100
+DEFAULT_EXECUTIONS_PAGE_SIZE = 100
+BULK_CHUNK_SIZE = 1000
 
 
 async def create_job(job: Job) -> Dict[Text, Any]:
-    job_uuid = await scheduler.add_job_to_scheduler(
-        job=RunnableJob(job=job, uuid=str(uuid.uuid4()))
-    )
-    return {"status": "success", "job_uuid": job_uuid}
+    runnable_job = RunnableJob(job=job, uuid=str(uuid.uuid4()))
+    job_uuid = await scheduler.add_job_to_scheduler(job=runnable_job)
+    return {
+        "status": "success",
+        "job_uuid": job_uuid,
+        "duplicate": job_uuid != runnable_job.uuid,
+    }
+
+
+def _template_names(job: Job) -> List[str]:
+    return [
+        action.template
+        for action in (job.action, job.on_success, job.on_failure)
+        if action is not None and action.template
+    ]
+
+
+def _fail(result: Dict[Text, Any], message: str) -> None:
+    result.pop("job_uuid", None)
+    result["status"] = "error"
+    result["message"] = message
+
+
+async def create_jobs(
+    items: AsyncIterable[Any], chunk_size: Optional[int] = None
+) -> Dict[Text, Any]:
+    """Validates the items and stores the valid ones as jobs.
+
+    Items are either decoded JSON objects or raw JSON documents (NDJSON
+    lines). Results are reported per item, in input order.
+
+    All jobs are stored in one transaction. With ``chunk_size`` they are
+    stored as the items arrive instead, in chunks with a transaction each:
+    if a chunk cannot be stored, the chunks before it stay stored and
+    ``atomic`` is false in the response. The dispatcher is woken up once,
+    after the last chunk.
+    """
+    results: List[Dict[Text, Any]] = []
+    chunk: List[Tuple[Dict[Text, Any], StoredJob]] = []
+    added: List[StoredJob] = []
+    known_templates: Set[str] = set()
+    num_chunks = 0
+    index = 0
+
+    try:
+        async for item in items:
+            result: Dict[Text, Any] = {"index": index}
+            results.append(result)
+            index += 1
+            try:
+                if isinstance(item, (bytes, str)):
+                    job = Job.model_validate_json(item)
+                else:
+                    job = Job.model_validate(item)
+                stored_job = scheduler.build_stored_job(
+                    RunnableJob(job=job, uuid=str(uuid.uuid4()))
+                )
+            except ValueError as exp:
+                _fail(result, str(exp))
+                continue
+
+            result.update(status="success", job_uuid=stored_job.id)
+            chunk.append((result, stored_job))
+            if chunk_size is not None and len(chunk) >= chunk_size:
+                num_chunks += 1
+                added += await _store_chunk(
+                    chunk, known_templates, first=num_chunks == 1
+                )
+                chunk = []
+
+        if chunk:
+            num_chunks += 1
+            added += await _store_chunk(
+                chunk, known_templates, first=num_chunks == 1
+            )
+    finally:
+        scheduler.jobs_added(added)
+
+    num_created = num_duplicates = 0
+    for result in results:
+        if result["status"] == "success":
+            num_duplicates += result["duplicate"]
+            num_created += not result["duplicate"]
+
+    return {
+        "status": "success",
+        "atomic": num_chunks <= 1,
+        "num_created": num_created,
+        "num_duplicates": num_duplicates,
+        "num_failed": len(results) - num_created - num_duplicates,
+        "results": results,
+    }
+
+
+async def _store_chunk(
+    chunk: List[Tuple[Dict[Text, Any], StoredJob]],
+    known_templates: Set[str],
+    first: bool,
+) -> List[StoredJob]:
+    """Stores the jobs of a chunk, returns the ones that are new."""
+    # Jobs referencing unknown templates are reported per item instead of
+    # failing the whole chunk.
+    template_names = {
+        name
+        for _, stored_job in chunk
+        for name in _template_names(stored_job.job.job)
+    } - known_templates
+    if template_names:
+        known_templates.update(
+            await scheduler.get_templates(list(template_names))
+        )
+
+    valid: List[Tuple[Dict[Text, Any], StoredJob]] = []
+    for result, stored_job in chunk:
+        unknown_names = [
+            name
+            for name in _template_names(stored_job.job.job)
+            if name not in known_templates
+        ]
+        if unknown_names:
+            _fail(
+                result,
+                f"Unknown action template: {', '.join(unknown_names)}",
+            )
+        else:
+            valid.append((result, stored_job))
+
+    try:
+        job_uuids = await scheduler.add_jobs_to_scheduler(
+            [stored_job for _, stored_job in valid], wakeup=False
+        )
+    except Exception as exp:
+        # Nothing was stored in a single transaction, so the request fails
+        # as a whole and can be retried.
+        if first:
+            raise
+        for result, _ in valid:
+            _fail(
+                result,
+                f"Unable to store the job, the jobs of the chunks before "
+                f"were stored: {exp}",
+            )
+        return []
+
+    # Jobs with an idempotency key that is already taken resolve to the
+    # existing job.
+    added = []
+    for (result, stored_job), job_uuid in zip(valid, job_uuids):
+        result["job_uuid"] = job_uuid
+        result["duplicate"] = job_uuid != stored_job.id
+        if not result["duplicate"]:
+            added.append(stored_job)
+    return added
+
+
+async def iter_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+
+    if buffer.strip():
+        yield buffer
 
 
 async def clear_jobs_from_scheduler() -> Dict[Text, Any]:
@@ -18,20 +203,145 @@ async def clear_jobs_from_scheduler() -> Dict[Text, Any]:
 
 
 async def get_job_from_scheduler(job_uuid: str) -> Dict[Text, Any]:
-    jobs = await scheduler.get_jobs_from_scheduler()
+    job = await scheduler.get_job_from_scheduler(job_uuid=job_uuid)
 
-    for job in jobs:
-        if job["uuid"] == job_uuid:
-            return {"status": "success", "job": job}
+    if job is not None:
+        return {"status": "success", "job": job}
 
     return {"status": "error", "message": "Job not found"}
 
 
-async def get_jobs_from_scheduler() -> Dict[Text, Any]:
-    jobs = await scheduler.get_jobs_from_scheduler()
-    return {"status": "success", "jobs": jobs}
+async def get_jobs_from_scheduler(params: ListJobs) -> Dict[Text, Any]:
+    limit = params.limit or DEFAULT_JOBS_PAGE_SIZE
+    jobs: List[Dict[Text, Any]] = []
+    last_cursor: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+    # One more job than requested is read to tell if there is a next page.
+    async for job_cursor, job in scheduler.iter_jobs_from_scheduler(
+        cursor=params.cursor,
+        category=params.category,
+        name_prefix=params.name_prefix,
+        run_at_from=params.run_at_from,
+        run_at_to=params.run_at_to,
+        paused=params.paused,
+        chunk_size=min(limit + 1, scheduler.JOBS_CHUNK_SIZE),
+    ):
+        if len(jobs) == limit:
+            next_cursor = last_cursor
+            break
+
+        jobs.append(job)
+        last_cursor = job_cursor
+
+    return {"status": "success", "jobs": jobs, "next_cursor": next_cursor}
+
+
+async def stream_jobs_from_scheduler(
+    params: ListJobs,
+) -> AsyncIterator[bytes]:
+    # Rejects an invalid cursor before the response starts streaming.
+    if params.cursor:
+        scheduler.decode_jobs_cursor(params.cursor)
+
+    return _stream_jobs(params=params)
+
+
+async def _stream_jobs(params: ListJobs) -> AsyncIterator[bytes]:
+    num_jobs = 0
+
+    async for _, job in scheduler.iter_jobs_from_scheduler(
+        cursor=params.cursor,
+        category=params.category,
+        name_prefix=params.name_prefix,
+        run_at_from=params.run_at_from,
+        run_at_to=params.run_at_to,
+        paused=params.paused,
+    ):
+        if params.limit is not None and num_jobs == params.limit:
+            return
+
+        yield json.dumps(job).encode() + b"\n"
+        num_jobs += 1
+
+
+async def remove_selected_jobs(params: JobSelection) -> Dict[Text, Any]:
+    num_jobs = await scheduler.remove_selected_jobs_from_scheduler(
+        **params.model_dump()
+    )
+    return {"status": "success", "num_jobs": num_jobs}
+
+
+async def pause_jobs(params: JobSelection) -> Dict[Text, Any]:
+    num_jobs = await scheduler.pause_jobs_in_scheduler(**params.model_dump())
+    return {"status": "success", "num_jobs": num_jobs}
+
+
+async def resume_jobs(params: JobSelection) -> Dict[Text, Any]:
+    num_jobs = await scheduler.resume_jobs_in_scheduler(**params.model_dump())
+    return {"status": "success", "num_jobs": num_jobs}
+
+
+async def shift_jobs(params: ShiftJobs) -> Dict[Text, Any]:
+    num_jobs = await scheduler.shift_jobs_in_scheduler(**params.model_dump())
+    return {"status": "success", "num_jobs": num_jobs}
 
 
 async def remove_job_from_scheduler(job_uuid: str) -> Dict[Text, Any]:
     await scheduler.remove_job_from_scheduler(job_uuid=job_uuid)
     return {"status": "success", "job_uuid": job_uuid}
+
+
+async def put_template(name: str, action: JobAction) -> Dict[Text, Any]:
+    template = await scheduler.put_template(name=name, action=action)
+    return {"status": "success", "template": template.to_dict()}
+
+
+async def get_template(name: str) -> Dict[Text, Any]:
+    templates = await scheduler.get_templates([name])
+
+    if name in templates:
+        return {"status": "success", "template": templates[name].to_dict()}
+
+    return {"status": "error", "message": "Template not found"}
+
+
+async def get_templates() -> Dict[Text, Any]:
+    templates = await scheduler.list_templates()
+    return {
+        "status": "success",
+        "templates": [template.to_dict() for template in templates],
+    }
+
+
+async def remove_template(name: str) -> Dict[Text, Any]:
+    await scheduler.remove_template(name=name)
+    return {"status": "success", "name": name}
+
+
+def get_circuit_breakers() -> Dict[Text, Any]:
+    return {
+        "status": "success",
+        "circuit_breakers": scheduler.get_circuit_breakers(),
+    }
+
+
+async def get_executions(
+    params: ListExecutions, job_uuid: Optional[str] = None
+) -> Dict[Text, Any]:
+    limit = params.limit or DEFAULT_EXECUTIONS_PAGE_SIZE
+    executions = await scheduler.get_executions(
+        job_uuid=job_uuid,
+        category=params.category,
+        started_from=params.started_from,
+        started_to=params.started_to,
+        before_id=params.cursor,
+        limit=limit,
+    )
+    return {
+        "status": "success",
+        "executions": executions,
+        "next_cursor": (
+            executions[-1]["id"] if len(executions) == limit else None
+        ),
+    }
@@ -0,0 +1,256 @@
+import asyncio
+import heapq
+import time
+from collections import defaultdict, deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Text,
+    Tuple,
+)
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from job_scheduler.metrics import JOB_SCHEDULE_LAG, category_label
+from job_scheduler.models import RunnableJob
+from job_scheduler.settings import parse_category_setting
+
+# Job, target host, scheduled run time (UTC timestamp) and completion future
+WorkItem = Tuple[RunnableJob, str, Optional[float], asyncio.Future]
+
+
+def _parse_weight(value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"Invalid category weight: {value}")
+    return int(value)
+
+
+def parse_category_weights(value: str) -> Dict[str, int]:
+    """Parses "category=weight,..." settings."""
+    return parse_category_setting(value, _parse_weight)
+
+
+class FairQueue:
+    """Queue of work items by priority and category.
+
+    Items of a higher priority always come first. Among the categories of
+    one priority, items are taken in weighted round robin: a category with
+    weight n gets n items in a row before the next category's turn, so a
+    large batch in one category does not hold up the others.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None) -> None:
+        self.weights = weights or {}
+
+        # Per priority: queues by category, in turn order
+        self._queues: Dict[int, Dict[Optional[str], Deque[WorkItem]]] = {}
+        # Items the category at the head of the turn order has left
+        self._credits: Dict[int, int] = {}
+        self._size = 0
+        self._items = asyncio.Semaphore(0)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, item: WorkItem) -> None:
+        job = item[0].job
+        queues = self._queues.setdefault(job.priority, {})
+        queue = queues.get(job.category)
+        if queue is None:
+            queue = queues[job.category] = deque()
+            if len(queues) == 1:
+                self._credits[job.priority] = self._weight(job.category)
+        queue.append(item)
+
+        self._size += 1
+        self._items.release()
+
+    async def get(self) -> WorkItem:
+        await self._items.acquire()
+
+        priority = max(self._queues)
+        queues = self._queues[priority]
+        category, queue = next(iter(queues.items()))
+        item = queue.popleft()
+        self._size -= 1
+
+        self._credits[priority] -= 1
+        if not queue or not self._credits[priority]:
+            # Dicts keep their insertion order, the category moves to the
+            # end of the turn order or leaves it.
+            del queues[category]
+            if queue:
+                queues[category] = queue
+            if queues:
+                self._credits[priority] = self._weight(next(iter(queues)))
+            else:
+                del self._queues[priority]
+                del self._credits[priority]
+
+        return item
+
+    def sizes(self) -> Dict[int, int]:
+        return {
+            priority: sum(len(queue) for queue in queues.values())
+            for priority, queues in self._queues.items()
+        }
+
+    def _weight(self, category: Optional[str]) -> int:
+        return self.weights.get(category or "", 1)
+
+
+def get_job_host(job: RunnableJob) -> str:
+    action = job.job.action
+    if action.http:
+        return urlsplit(action.http.url).netloc
+    return ""
+
+
+class JobExecutor:
+    """Runs jobs with a global concurrency cap and per-host limits.
+
+    ``max_concurrency`` workers take jobs from a queue. A job whose target
+    host already has ``max_per_host`` jobs in flight is parked until one of
+    them finishes, so a slow host never blocks the workers for other hosts.
+    At most ``queue_size`` jobs wait at a time, submit() blocks beyond that.
+    Waiting jobs are taken by priority and shared among categories by
+    ``category_weights``, see FairQueue.
+    """
+
+    def __init__(
+        self,
+        run_job: Callable[[RunnableJob, Optional[float]], Awaitable[None]],
+        max_concurrency: int = 100,
+        max_per_host: int = 20,
+        queue_size: int = 10000,
+        category_weights: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.run_job = run_job
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.queue_size = queue_size
+
+        self._queue = FairQueue(category_weights)
+        self._queue_slots = asyncio.Semaphore(queue_size)
+        # Per host a heap of (-priority, sequence number, item)
+        self._parked: Dict[str, List[Tuple[int, int, WorkItem]]] = {}
+        self._park_sequence = 0
+        self._running_per_host: Dict[str, int] = defaultdict(int)
+        self._num_running = 0
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def num_queued(self) -> int:
+        return self.queue_size - self._queue_slots._value
+
+    @property
+    def num_running(self) -> int:
+        return self._num_running
+
+    async def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._work())
+            for _ in range(self.max_concurrency)
+        ]
+
+    async def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self.num_queued:
+            logger.warning(
+                f"Executor stopped with {self.num_queued} queued jobs"
+            )
+
+    async def submit(
+        self, job: RunnableJob, scheduled_at: Optional[float] = None
+    ) -> asyncio.Future:
+        """Queues a job, waiting while the queue is full.
+
+        ``scheduled_at`` is the UTC timestamp the run was due at, to measure
+        the schedule lag. Returns a future that is done once the job has run
+        and cancelled if the run was interrupted.
+        """
+        await self._queue_slots.acquire()
+
+        done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queue.put((job, get_job_host(job), scheduled_at, done))
+        return done
+
+    def stats(self) -> Dict[Text, Any]:
+        return {
+            "queued": self.num_queued,
+            "running": self.num_running,
+            "max_concurrency": self.max_concurrency,
+            "max_per_host": self.max_per_host,
+            "queue_size": self.queue_size,
+            "queued_by_priority": self._queue.sizes(),
+            "hosts": {
+                host: {
+                    "running": self._running_per_host.get(host, 0),
+                    "queued": len(self._parked.get(host, ())),
+                }
+                for host in set(self._running_per_host) | set(self._parked)
+            },
+        }
+
+    async def _work(self) -> None:
+        while True:
+            item = await self._queue.get()
+            host = item[1]
+
+            if self._running_per_host[host] >= self.max_per_host:
+                self._park_sequence += 1
+                heapq.heappush(
+                    self._parked.setdefault(host, []),
+                    (-item[0].job.priority, self._park_sequence, item),
+                )
+                continue
+
+            # Keep serving the host while jobs are parked for it, a slot of
+            # this host has just been freed by the previous run.
+            while True:
+                await self._run(item)
+
+                parked = self._parked.get(host)
+                if not parked:
+                    self._parked.pop(host, None)
+                    break
+                item = heapq.heappop(parked)[2]
+
+    async def _run(self, item: WorkItem) -> None:
+        job, host, scheduled_at, done = item
+
+        self._queue_slots.release()
+        if scheduled_at is not None:
+            JOB_SCHEDULE_LAG.observe(
+                time.time() - scheduled_at, category_label(job.job.category)
+            )
+
+        self._running_per_host[host] += 1
+        self._num_running += 1
+        try:
+            await self.run_job(job, scheduled_at)
+        except Exception as exp:
+            # Saveguard, the job runner handles its own errors
+            logger.exception(f"Uncaught exception running job {job}: {exp}")
+        except asyncio.CancelledError:
+            # Interrupted by shutdown, the run did not happen
+            done.cancel()
+            raise
+        finally:
+            self._num_running -= 1
+            self._running_per_host[host] -= 1
+            if not self._running_per_host[host]:
+                del self._running_per_host[host]
+
+            if not done.done():
+                done.set_result(None)
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Text, Tuple
+
+from loguru import logger
+
+from job_scheduler.commands import CircuitOpenError, Command, HTTPCommand
+from job_scheduler.metrics import JOB_FOLLOW_UPS, category_label
+from job_scheduler.models import RetryPolicy
+
+# Seconds to wait for pending batches on shutdown
+SHUTDOWN_TIMEOUT = 10.0
+
+# Enqueue time (monotonic), kind (on_success or on_failure), job category
+# and the JSON item sent for a follow-up
+FollowUpItem = Tuple[float, str, Optional[str], Dict[Text, Any]]
+
+
+class _Target:
+    def __init__(self, command: HTTPCommand) -> None:
+        self.command = command
+        self.items: Deque[FollowUpItem] = deque()
+        self.batch_full = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class FollowUpBatcher:
+    """Sends follow-up actions of many jobs as batched requests.
+
+    The job contexts of follow-ups with the same target (method, URL,
+    headers and timeout) are collected until ``max_size`` are waiting or the
+    oldest has waited ``max_delay`` seconds, and sent as one JSON array.
+    Batches of a target are sent one after the other in the order the
+    follow-ups were added. A failed batch is retried with exponential
+    backoff up to ``max_attempts`` times before the next one is sent.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 100,
+        max_delay: float = 1.0,
+        max_attempts: int = 5,
+        max_pending: int = 10000,
+    ) -> None:
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.retry_policy = RetryPolicy(max_attempts=max_attempts)
+
+        self._targets: Dict[Tuple, _Target] = {}
+        self._stopping = asyncio.Event()
+
+    @property
+    def num_pending(self) -> int:
+        return sum(len(target.items) for target in self._targets.values())
+
+    def add(
+        self,
+        command: Command,
+        kind: str,
+        category: Optional[str],
+        context: Dict[Text, Any],
+    ) -> None:
+        """Queues a follow-up, raises ValueError if it cannot be batched."""
+        if not isinstance(command, HTTPCommand):
+            raise ValueError(f"Batching is not supported for {command}")
+
+        key = (
+            command.method,
+            command.url,
+            json.dumps(command.headers, sort_keys=True),
+            command.timeout,
+        )
+        target = self._targets.get(key)
+        if target is None:
+            target = self._targets[key] = _Target(command)
+        if len(target.items) >= self.max_pending:
+            raise ValueError(
+                f"Too many pending follow-ups for {command.url} "
+                f"({len(target.items)})"
+            )
+
+        target.items.append(
+            (time.monotonic(), kind, category, {**context, "follow_up": kind})
+        )
+        if len(target.items) >= self.max_size or self._stopping.is_set():
+            target.batch_full.set()
+        if target.task is None:
+            target.task = asyncio.create_task(self._send(key, target))
+
+    async def shutdown(self) -> None:
+        """Sends the pending batches without waiting for them to fill."""
+        self._stopping.set()
+        tasks = []
+        for target in self._targets.values():
+            target.batch_full.set()
+            if target.task is not None:
+                tasks.append(target.task)
+        if not tasks:
+            return
+
+        _, pending = await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT)
+        if pending:
+            logger.warning(
+                f"Dropping {self.num_pending} follow-ups not sent on shutdown"
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _send(self, key: Tuple, target: _Target) -> None:
+        try:
+            while target.items:
+                if (
+                    len(target.items) < self.max_size
+                    and not self._stopping.is_set()
+                ):
+                    timeout = target.items[0][0] + self.max_delay
+                    try:
+                        await asyncio.wait_for(
+                            target.batch_full.wait(),
+                            max(timeout - time.monotonic(), 0),
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                target.batch_full.clear()
+
+                batch = [
+                    target.items.popleft()
+                    for _ in range(min(self.max_size, len(target.items)))
+                ]
+                await self._send_batch(target.command, batch)
+        finally:
+            del self._targets[key]
+
+    async def _send_batch(
+        self, command: HTTPCommand, batch: List[FollowUpItem]
+    ) -> None:
+        batch_command = HTTPCommand(
+            url=command.url,
+            method=command.method,
+            headers={**command.headers, "Content-Type": "application/json"},
+            body=json.dumps([item[3] for item in batch]),
+            timeout=command.timeout,
+        )
+        context = {"job_uuid": f"batch of {len(batch)}", "job_category": None}
+
+        outcome = "failure"
+        attempt = 1
+        while True:
+            try:
+                await batch_command.execute(context=context)
+                outcome = "success"
+                break
+            except Exception as exp:
+                if (
+                    attempt >= self.retry_policy.max_attempts
+                    or self._stopping.is_set()
+                ):
+                    logger.error(
+                        "Error sending {batch_size} follow-ups to {url}: "
+                        "{error}",
+                        batch_size=len(batch),
+                        url=command.url,
+                        error=str(exp),
+                    )
+                    break
+
+                delay = self.retry_policy.get_delay(attempt)
+                if isinstance(exp, CircuitOpenError):
+                    delay = max(delay, exp.retry_after)
+                logger.warning(
+                    "Attempt {attempt} to send {batch_size} follow-ups to "
+                    "{url} failed: {error} -- retrying in {delay:.1f}s",
+                    attempt=attempt,
+                    batch_size=len(batch),
+                    url=command.url,
+                    error=str(exp),
+                    delay=delay,
+                )
+                attempt += 1
+                # On shutdown the last attempt is made right away
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+        for _, kind, category, _ in batch:
+            JOB_FOLLOW_UPS.inc(category_label(category), kind, outcome)
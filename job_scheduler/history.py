@@ -0,0 +1,190 @@
+import asyncio
+import time
+from datetime import datetime, tzinfo
+from typing import Any, Dict, List, Optional, Text
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from job_scheduler.tables import job_executions_t
+
+
+class HistoryRecorder:
+    """Persists the outcomes of job runs in the job_executions table.
+
+    record() only appends to an in-memory buffer. A background task writes
+    the buffer in batches of up to ``batch_size`` rows, every
+    ``flush_interval`` seconds or as soon as a batch is full. If the
+    database is unavailable, the buffer is kept and at most ``max_buffer``
+    records, the newest ones, are retained.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        timezone: tzinfo,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_buffer: int = 100000,
+    ) -> None:
+        self.engine = engine
+        self.timezone = timezone
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+
+        self._buffer: List[Dict[Text, Any]] = []
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception(
+                f"Unable to write {len(self._buffer)} job executions"
+            )
+
+    def record(
+        self,
+        job_uuid: str,
+        category: Optional[str],
+        name: str,
+        attempt: int,
+        scheduled_at: Optional[float],
+        started_at: float,
+        duration: float,
+        outcome: str,
+        status: Optional[int] = None,
+        error: Optional[str] = None,
+        follow_up_outcome: Optional[str] = None,
+        response: Optional[str] = None,
+    ) -> None:
+        self._buffer.append(
+            {
+                "job_uuid": job_uuid,
+                "category": category,
+                "name": name,
+                "attempt": attempt,
+                "scheduled_at": scheduled_at,
+                "started_at": started_at,
+                "duration": duration,
+                "outcome": outcome,
+                "status": status,
+                "error": error,
+                "follow_up_outcome": follow_up_outcome,
+                "response": response,
+            }
+        )
+        if len(self._buffer) >= self.batch_size:
+            self._batch_full.set()
+
+    async def flush(self) -> int:
+        num_records = 0
+        while self._buffer:
+            batch = self._buffer[: self.batch_size]
+            async with self.engine.begin() as conn:
+                await conn.execute(job_executions_t.insert(), batch)
+            del self._buffer[: len(batch)]
+            num_records += len(batch)
+        return num_records
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._batch_full.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._batch_full.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error writing job executions")
+
+                if len(self._buffer) > self.max_buffer:
+                    num_dropped = len(self._buffer) - self.max_buffer
+                    del self._buffer[:num_dropped]
+                    logger.warning(
+                        f"Dropped {num_dropped} unwritten job executions"
+                    )
+
+    async def get_executions(
+        self,
+        job_uuid: Optional[str] = None,
+        category: Optional[str] = None,
+        started_from: Optional[float] = None,
+        started_to: Optional[float] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[Dict[Text, Any]]:
+        """Returns executions, the most recent first.
+
+        ``before_id`` is the id of the last execution of the previous page.
+        """
+        conditions = []
+        if job_uuid is not None:
+            conditions.append(job_executions_t.c.job_uuid == job_uuid)
+        if category is not None:
+            conditions.append(job_executions_t.c.category == category)
+        if started_from is not None:
+            conditions.append(job_executions_t.c.started_at >= started_from)
+        if started_to is not None:
+            conditions.append(job_executions_t.c.started_at < started_to)
+        if before_id is not None:
+            conditions.append(job_executions_t.c.id < before_id)
+
+        async with self.engine.begin() as conn:
+            rows = (
+                await conn.execute(
+                    select(job_executions_t)
+                    .where(*conditions)
+                    .order_by(job_executions_t.c.id.desc())
+                    .limit(limit)
+                )
+            ).all()
+
+        return [self._row_to_dict(row) for row in rows]
+
+    async def prune(self, max_age: float) -> int:
+        """Removes executions that started more than ``max_age`` seconds ago."""
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                job_executions_t.delete().where(
+                    job_executions_t.c.started_at < time.time() - max_age
+                )
+            )
+            return result.rowcount
+
+    def _to_datetime(self, timestamp: Optional[float]) -> Optional[str]:
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, self.timezone).isoformat()
+
+    def _row_to_dict(self, row: Any) -> Dict[Text, Any]:
+        return {
+            "id": row.id,
+            "job_uuid": row.job_uuid,
+            "category": row.category,
+            "name": row.name,
+            "attempt": row.attempt,
+            "scheduled_at": self._to_datetime(row.scheduled_at),
+            "started_at": self._to_datetime(row.started_at),
+            "duration": row.duration,
+            "outcome": row.outcome,
+            "status": row.status,
+            "error": row.error,
+            "follow_up_outcome": row.follow_up_outcome,
+            "response": row.response,
+        }
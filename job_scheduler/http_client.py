@@ -0,0 +1,49 @@
+from typing import Optional
+
+import aiohttp
+from loguru import logger
+
+from job_scheduler.settings import settings
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def start_http_client() -> None:
+    global _session
+
+    if _session is not None and not _session.closed:
+        return
+
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_LIMIT,
+        limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    # Timeouts are set per request from the job data, so the session itself
+    # must not impose one.
+    _session = aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=None)
+    )
+    logger.debug(
+        f"HTTP client started (limit={settings.HTTP_POOL_LIMIT}, "
+        f"limit_per_host={settings.HTTP_POOL_LIMIT_PER_HOST})."
+    )
+
+
+async def stop_http_client() -> None:
+    global _session
+
+    if _session is None:
+        return
+
+    await _session.close()
+    _session = None
+    logger.debug("HTTP client closed.")
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    if _session is None or _session.closed:
+        raise RuntimeError("HTTP client is not running")
+    return _session
@@ -1,49 +1,278 @@
-from datetime import datetime
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Text
 
+import aiohttp
 from loguru import logger
 
-from job_scheduler.commands import Command
-from job_scheduler.models import RunnableJob
+from job_scheduler.commands import CircuitOpenError, Command, HTTPCommandError
+from job_scheduler.follow_ups import FollowUpBatcher
+from job_scheduler.history import HistoryRecorder
+from job_scheduler.log import sample_success
+from job_scheduler.metrics import JOB_FOLLOW_UPS, JOB_RUNS, category_label
+from job_scheduler.models import JobAction, RetryPolicy, RunnableJob
+from job_scheduler.settings import settings
+
+
+def is_retryable(policy: RetryPolicy, exp: Exception) -> bool:
+    if isinstance(exp, HTTPCommandError):
+        return exp.status in policy.retry_on_status
+    if isinstance(exp, asyncio.TimeoutError):
+        return policy.retry_on_timeout
+    if isinstance(exp, (aiohttp.ClientConnectionError, CircuitOpenError)):
+        return policy.retry_on_connection_error
+    return False
+
+
+class ExecutionResult:
+    def __init__(self) -> None:
+        # success, failure, retry, deferred or cancelled
+        self.outcome = "failure"
+        self.status: Optional[int] = None
+        self.error: Optional[str] = None
+        self.duration = 0.0
+        self.follow_up_outcome: Optional[str] = None
+        self.response: Optional[str] = None
+
+    def set_error(self, exp: Exception) -> None:
+        self.error = str(exp) or type(exp).__name__
+        if isinstance(exp, HTTPCommandError):
+            self.status = exp.status
+            self.response = exp.response
 
 
 class JobRunner:
-    async def run_job(self, job: RunnableJob) -> None:
+    def __init__(
+        self,
+        reschedule_job: Optional[
+            Callable[[RunnableJob, float], Awaitable[None]]
+        ] = None,
+        history: Optional[HistoryRecorder] = None,
+        follow_up_batcher: Optional[FollowUpBatcher] = None,
+    ) -> None:
+        # Stores a job to run again after the given seconds
+        self.reschedule_job = reschedule_job
+        self.history = history
+        self.follow_up_batcher = follow_up_batcher
+
+    async def run_job(
+        self, job: RunnableJob, scheduled_at: Optional[float] = None
+    ) -> None:
+        result = ExecutionResult()
+        started_at = time.time()
+        context = job.to_context()
         try:
             try:
-                logger.debug(f"Running job {job} at {datetime.now()}...")
+                logger.debug(
+                    "Running job {job_uuid} ({job_name}), attempt {attempt}",
+                    attempt=job.attempt,
+                    **context,
+                )
 
                 command = Command.get_command(job.job.action)
 
-                await command.execute(context=job.to_context())
+                try:
+                    command_result = await command.execute(context=context)
+                    result.status = command_result.status
+                    result.response = command_result.response
+                finally:
+                    result.duration = time.time() - started_at
 
+            except CircuitOpenError as exp:
+                result.set_error(exp)
+                if await self._defer(job, exp):
+                    result.outcome = "deferred"
+                    JOB_RUNS.inc(category_label(job.job.category), "deferred")
+                    return
+                await self._handle_failure(job, exp, result)
             except Exception as exp:
-                logger.error(f"Error running job {job}: {exp}")
-
-                if job.job.on_failure:
-                    try:
-                        failure_command = Command.get_command(
-                            job.job.on_failure
-                        )
-                        await failure_command.execute(context=job.to_context())
-                    except Exception as exp:
-                        logger.error(
-                            f"Error running failure follow-up action for job {job}: {exp}"
-                        )
+                result.set_error(exp)
+                await self._handle_failure(job, exp, result)
             else:
-                logger.debug(
-                    f"Job {job} completed successfully at {datetime.now()}"
-                )
+                if sample_success(job.job.category):
+                    logger.info(
+                        "Job {job_uuid} ({job_name}) completed successfully "
+                        "in {duration:.3f}s",
+                        duration=result.duration,
+                        **context,
+                    )
+                category = category_label(job.job.category)
+                result.outcome = "success"
+                JOB_RUNS.inc(category, "success")
 
                 try:
                     if job.job.on_success:
-                        success_command = Command.get_command(
-                            job.job.on_success
-                        )
-                        await success_command.execute(context=job.to_context())
+                        if self._batch_follow_up(
+                            job, job.job.on_success, "on_success", context
+                        ):
+                            result.follow_up_outcome = "batched"
+                        else:
+                            success_command = Command.get_command(
+                                job.job.on_success
+                            )
+                            await success_command.execute(context=context)
+                            JOB_FOLLOW_UPS.inc(
+                                category, "on_success", "success"
+                            )
+                            result.follow_up_outcome = "success"
                 except Exception as exp:
+                    JOB_FOLLOW_UPS.inc(category, "on_success", "failure")
+                    result.follow_up_outcome = "failure"
                     logger.error(
-                        f"Error running success follow-up action for job {job}: {exp}"
+                        "Error running success follow-up action for job "
+                        "{job_uuid}: {error}",
+                        error=str(exp),
+                        **context,
                     )
+        except asyncio.CancelledError:
+            result.outcome = "cancelled"
+            raise
         except Exception as exp:
             # Saveguard to prevent crashing the scheduler
-            logger.exception(f"Uncaught exception in job runner: {exp}")
+            logger.exception(
+                "Uncaught exception running job {job_uuid}: {error}",
+                error=str(exp),
+                **context,
+            )
+        finally:
+            if self.history is not None:
+                self.history.record(
+                    job_uuid=job.uuid,
+                    category=job.job.category,
+                    name=job.job.name,
+                    attempt=job.attempt,
+                    scheduled_at=scheduled_at,
+                    started_at=started_at,
+                    duration=result.duration,
+                    outcome=result.outcome,
+                    status=result.status,
+                    error=result.error,
+                    follow_up_outcome=result.follow_up_outcome,
+                    response=result.response,
+                )
+
+    async def _handle_failure(
+        self, job: RunnableJob, exp: Exception, result: ExecutionResult
+    ) -> None:
+        category = category_label(job.job.category)
+        context = job.to_context()
+
+        if await self._retry(job, exp):
+            result.outcome = "retry"
+            JOB_RUNS.inc(category, "retry")
+            return
+
+        logger.error(
+            "Error running job {job_uuid} ({job_name}): {error}",
+            error=str(exp),
+            **context,
+        )
+        JOB_RUNS.inc(category, "failure")
+
+        if job.job.on_failure:
+            try:
+                if self._batch_follow_up(
+                    job, job.job.on_failure, "on_failure", context
+                ):
+                    result.follow_up_outcome = "batched"
+                else:
+                    failure_command = Command.get_command(job.job.on_failure)
+                    await failure_command.execute(context=context)
+                    JOB_FOLLOW_UPS.inc(category, "on_failure", "success")
+                    result.follow_up_outcome = "success"
+            except Exception as exp:
+                JOB_FOLLOW_UPS.inc(category, "on_failure", "failure")
+                result.follow_up_outcome = "failure"
+                logger.error(
+                    "Error running failure follow-up action for job "
+                    "{job_uuid}: {error}",
+                    error=str(exp),
+                    **context,
+                )
+
+    def _batch_follow_up(
+        self,
+        job: RunnableJob,
+        action: JobAction,
+        kind: str,
+        context: Dict[Text, Any],
+    ) -> bool:
+        """Queues a follow-up action to be sent in a batch if it opted in.
+
+        Returns whether the action was queued, its outcome is counted once
+        the batch is sent.
+        """
+        if not action.batch or self.follow_up_batcher is None:
+            return False
+        self.follow_up_batcher.add(
+            Command.get_command(action), kind, job.job.category, context
+        )
+        return True
+
+    async def _defer(self, job: RunnableJob, exp: CircuitOpenError) -> bool:
+        """Postpones a job whose host has an open circuit breaker.
+
+        The attempt is not counted. Deferred jobs are spread over the open
+        duration, so they do not all hit the host once the circuit closes.
+        Returns whether the job was deferred.
+        """
+        # Recurring jobs keep their row, their next run is the next fire
+        # time of their schedule.
+        if (
+            settings.CIRCUIT_BREAKER_OPEN_ACTION != "defer"
+            or self.reschedule_job is None
+            or job.job.schedule is not None
+        ):
+            return False
+
+        delay = exp.retry_after + random.uniform(
+            0, settings.CIRCUIT_BREAKER_OPEN_DURATION
+        )
+        try:
+            await self.reschedule_job(job, delay)
+        except Exception:
+            logger.exception("Unable to defer job {}", job.uuid)
+            return False
+
+        logger.info(
+            "Deferred job {job_uuid} by {delay:.1f}s: {error}",
+            delay=delay,
+            error=str(exp),
+            **job.to_context(),
+        )
+        return True
+
+    async def _retry(self, job: RunnableJob, exp: Exception) -> bool:
+        """Schedules the next attempt of a failed job if its policy allows.
+
+        Returns whether a retry was scheduled.
+        """
+        policy = job.job.retry
+        if (
+            policy is None
+            or self.reschedule_job is None
+            or job.job.schedule is not None
+            or job.attempt >= policy.max_attempts
+            or not is_retryable(policy, exp)
+        ):
+            return False
+
+        delay = policy.get_delay(job.attempt)
+        try:
+            await self.reschedule_job(
+                job.model_copy(update={"attempt": job.attempt + 1}), delay
+            )
+        except Exception:
+            logger.exception("Unable to schedule a retry of job {}", job.uuid)
+            return False
+
+        logger.warning(
+            "Attempt {attempt} of job {job_uuid} failed: {error} -- "
+            "retrying in {delay:.1f}s",
+            attempt=job.attempt,
+            delay=delay,
+            error=str(exp),
+            **job.to_context(),
+        )
+        return True
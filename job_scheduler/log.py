@@ -0,0 +1,65 @@
+import random
+import sys
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from job_scheduler.settings import parse_category_setting, settings
+
+REDACTED_HEADERS = {
+    "authorization",
+    "cookie",
+    "proxy-authorization",
+    "set-cookie",
+    "x-api-key",
+    "x-token",
+} | {
+    name.strip().lower()
+    for name in settings.LOG_REDACT_HEADERS.split(",")
+    if name.strip()
+}
+
+_success_sample_rates = parse_category_setting(
+    settings.LOG_SUCCESS_SAMPLE_RATES, float
+)
+
+
+def configure_logging() -> None:
+    """Replaces loguru's default handler with a queue-backed one.
+
+    Records are put on a queue and written to stderr by a background
+    thread, so the event loop does not wait for the writes.
+    """
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=settings.LOGURU_LEVEL,
+        serialize=settings.LOG_FORMAT == "json",
+        enqueue=True,
+    )
+
+
+def sample_success(category: Optional[str]) -> bool:
+    """Returns whether to log a successful run of a job in the category."""
+    rate = _success_sample_rates.get(
+        category or "", settings.LOG_SUCCESS_SAMPLE_RATE
+    )
+    return rate >= 1 or random.random() < rate
+
+
+def truncate(text: Optional[str]) -> Optional[str]:
+    """Cuts the text to LOG_MAX_BODY_SIZE characters."""
+    if text is not None and len(text) > settings.LOG_MAX_BODY_SIZE:
+        return text[: settings.LOG_MAX_BODY_SIZE] + "..."
+    return text
+
+
+def redact_headers(
+    headers: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    if not headers:
+        return headers
+    return {
+        name: "***" if name.lower() in REDACTED_HEADERS else value
+        for name, value in headers.items()
+    }
@@ -1,31 +1,54 @@
 import logging
 from contextlib import asynccontextmanager
-from typing import Any, Dict, Text
-
-from fastapi import Depends, FastAPI, Header, HTTPException
-from fastapi.responses import JSONResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Text
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from loguru import logger
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from job_scheduler import domain
-from job_scheduler.api_models import CreateJob
+from job_scheduler import domain, metrics
+from job_scheduler.api_models import (
+    CreateJob,
+    JobSelection,
+    ListExecutions,
+    ListJobs,
+    PutTemplate,
+    ShiftJobs,
+)
+from job_scheduler.http_client import start_http_client, stop_http_client
+from job_scheduler.log import configure_logging
 from job_scheduler.scheduler import (
-    get_num_apscheduler_jobs,
-    start_apscheduler,
-    stop_apscheduler,
+    check_readiness,
+    get_catch_up_progress,
+    get_executor_stats,
+    get_num_jobs_in_scheduler,
+    start_scheduler,
+    stop_scheduler,
+    update_job_counts,
 )
 from job_scheduler.settings import settings
 
+configure_logging()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting up the application...")
-    await start_apscheduler()
+    await start_http_client()
+    await start_scheduler()
 
     yield
 
     logger.info("Shutting down the application...")
-    await stop_apscheduler()
+    await stop_scheduler()
+    await stop_http_client()
+    await logger.complete()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -35,7 +58,9 @@ class CustomLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Any, call_next: Any):
         response = await call_next(request)
 
-        if request.url.path == "/health":
+        if request.url.path.startswith("/health") or (
+            request.url.path == "/metrics"
+        ):
             logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 
         return response
@@ -52,41 +77,45 @@ def verify_token(x_token: str = Header(None)):
         )
 
 
-@app.get("/health", response_class=JSONResponse)
-async def health_check() -> JSONResponse:
+@app.get("/health/live", response_class=JSONResponse)
+async def liveness_check() -> JSONResponse:
+    # Answering at all shows the event loop is responsive.
+    return JSONResponse(content={"status": "alive"})
+
+
+@app.get("/health/ready", response_class=JSONResponse)
+async def readiness_check() -> JSONResponse:
     try:
-        try:
-            await get_num_apscheduler_jobs()
-        except Exception:
-            data = {
-                "status": "unhealthy",
-            }
-            return JSONResponse(content=data, status_code=500)
-        else:
-            data = {
-                "status": "healthy",
-            }
-            return JSONResponse(content=data)
-    except ValueError as exp:
+        checks = await check_readiness()
+        if all(check["ok"] for check in checks.values()):
+            return JSONResponse(content={"status": "healthy", **checks})
         return JSONResponse(
-            content={"error_type": "client", "error_message": str(exp)},
-            status_code=400,
+            content={"status": "unhealthy", **checks}, status_code=503
         )
     except Exception as exp:
-        logger.exception("Error in health check")
+        logger.exception("Error in readiness check")
         return JSONResponse(
             content={"error_type": "server", "error_message": str(exp)},
             status_code=500,
         )
 
 
+@app.get("/health", response_class=JSONResponse)
+async def health_check() -> JSONResponse:
+    return await readiness_check()
+
+
 @app.post("/jobs/create", response_class=JSONResponse)
 async def create_job(
     params: CreateJob,
     token: str = Depends(verify_token),
 ) -> JSONResponse:
     try:
-        logger.debug(f"Create job called with params: {params}")
+        logger.debug(
+            "Create job called for {job_name} in category {job_category}.",
+            job_name=params.job.name,
+            job_category=params.job.category,
+        )
 
         return JSONResponse(content=await domain.create_job(job=params.job))
     except ValueError as exp:
@@ -102,6 +131,55 @@ async def create_job(
         )
 
 
+async def _iter_list(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+@app.post("/jobs/bulk", response_class=JSONResponse)
+async def create_jobs(
+    request: Request,
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    """Accepts a JSON array or an NDJSON stream of jobs.
+
+    The jobs of a JSON array are stored in one transaction. NDJSON streams
+    are stored as they arrive, in chunks of 1000 jobs with a transaction
+    each. If a chunk cannot be stored, its jobs are reported as errors
+    while the chunks before stay stored, and ``atomic`` is false in the
+    response. Retry such uploads with idempotency keys to avoid duplicates.
+    """
+    try:
+        logger.debug("Bulk create jobs called.")
+
+        if "ndjson" in request.headers.get("content-type", ""):
+            items = domain.iter_ndjson(request.stream())
+            chunk_size: Optional[int] = domain.BULK_CHUNK_SIZE
+        else:
+            body = await request.json()
+            if not isinstance(body, list):
+                raise ValueError("Expected a JSON array of jobs")
+            items = _iter_list(body)
+            chunk_size = None
+
+        return JSONResponse(
+            content=await domain.create_jobs(
+                items=items, chunk_size=chunk_size
+            )
+        )
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in bulk create jobs")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
 @app.delete("/jobs", response_class=JSONResponse)
 async def clear_jobs(token: str = Depends(verify_token)) -> JSONResponse:
     try:
@@ -121,12 +199,114 @@ async def clear_jobs(token: str = Depends(verify_token)) -> JSONResponse:
         )
 
 
+@app.post("/jobs/delete", response_class=JSONResponse)
+async def remove_selected_jobs(
+    params: JobSelection,
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        logger.opt(lazy=True).debug(
+            "Remove selected jobs called with params: {}",
+            lambda: params.model_dump(mode="json", exclude_none=True),
+        )
+
+        return JSONResponse(
+            content=await domain.remove_selected_jobs(params=params)
+        )
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in remove selected jobs")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.post("/jobs/pause", response_class=JSONResponse)
+async def pause_jobs(
+    params: JobSelection,
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        logger.opt(lazy=True).debug(
+            "Pause jobs called with params: {}",
+            lambda: params.model_dump(mode="json", exclude_none=True),
+        )
+
+        return JSONResponse(content=await domain.pause_jobs(params=params))
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in pause jobs")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.post("/jobs/resume", response_class=JSONResponse)
+async def resume_jobs(
+    params: JobSelection,
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        logger.opt(lazy=True).debug(
+            "Resume jobs called with params: {}",
+            lambda: params.model_dump(mode="json", exclude_none=True),
+        )
+
+        return JSONResponse(content=await domain.resume_jobs(params=params))
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in resume jobs")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.post("/jobs/shift", response_class=JSONResponse)
+async def shift_jobs(
+    params: ShiftJobs,
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        logger.opt(lazy=True).debug(
+            "Shift jobs called with params: {}",
+            lambda: params.model_dump(mode="json", exclude_none=True),
+        )
+
+        return JSONResponse(content=await domain.shift_jobs(params=params))
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in shift jobs")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
 @app.delete("/jobs/{job_uuid}", response_class=JSONResponse)
 async def remove_job(
     job_uuid: str, token: str = Depends(verify_token)
 ) -> JSONResponse:
     try:
-        logger.debug(f"Remove job called with job_uuid={job_uuid}.")
+        logger.debug("Remove job called with job_uuid={}.", job_uuid)
 
         return JSONResponse(
             content=await domain.remove_job_from_scheduler(job_uuid=job_uuid)
@@ -148,7 +328,7 @@ async def remove_job(
 async def get_num_jobs(token: str = Depends(verify_token)) -> JSONResponse:
     try:
         data: Dict[Text, Any] = {
-            "num_jobs": await get_num_apscheduler_jobs(),
+            "num_jobs": await get_num_jobs_in_scheduler(),
         }
         return JSONResponse(content=data)
     except ValueError as exp:
@@ -164,12 +344,59 @@ async def get_num_jobs(token: str = Depends(verify_token)) -> JSONResponse:
         )
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    await update_job_counts()
+    return PlainTextResponse(
+        content=metrics.registry.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/executor", response_class=JSONResponse)
+async def get_executor(token: str = Depends(verify_token)) -> JSONResponse:
+    try:
+        return JSONResponse(content=get_executor_stats())
+    except Exception as exp:
+        logger.exception("Error in get executor")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.get("/catch-up", response_class=JSONResponse)
+async def get_catch_up(token: str = Depends(verify_token)) -> JSONResponse:
+    try:
+        return JSONResponse(content=await get_catch_up_progress())
+    except Exception as exp:
+        logger.exception("Error in get catch-up")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
 @app.get("/jobs", response_class=JSONResponse)
-async def get_jobs(token: str = Depends(verify_token)) -> JSONResponse:
+async def get_jobs(
+    params: ListJobs = Depends(),
+    token: str = Depends(verify_token),
+) -> Response:
     try:
-        logger.debug("Get all jobs called.")
+        logger.opt(lazy=True).debug(
+            "Get jobs called with params: {}",
+            lambda: params.model_dump(mode="json", exclude_none=True),
+        )
+
+        if params.stream:
+            return StreamingResponse(
+                await domain.stream_jobs_from_scheduler(params=params),
+                media_type="application/x-ndjson",
+            )
 
-        return JSONResponse(content=await domain.get_jobs_from_scheduler())
+        return JSONResponse(
+            content=await domain.get_jobs_from_scheduler(params=params)
+        )
     except ValueError as exp:
         return JSONResponse(
             content={"error_type": "client", "error_message": str(exp)},
@@ -183,6 +410,62 @@ async def get_jobs(token: str = Depends(verify_token)) -> JSONResponse:
         )
 
 
+@app.get("/jobs/{job_uuid}/executions", response_class=JSONResponse)
+async def get_job_executions(
+    job_uuid: str,
+    params: ListExecutions = Depends(),
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        logger.opt(lazy=True).debug(
+            "Get job executions called with uuid={}, params: {}",
+            lambda: job_uuid,
+            lambda: params.model_dump(mode="json", exclude_none=True),
+        )
+
+        return JSONResponse(
+            content=await domain.get_executions(
+                params=params, job_uuid=job_uuid
+            )
+        )
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in get job executions")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.get("/executions", response_class=JSONResponse)
+async def get_executions(
+    params: ListExecutions = Depends(),
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        logger.opt(lazy=True).debug(
+            "Get executions called with params: {}",
+            lambda: params.model_dump(mode="json", exclude_none=True),
+        )
+
+        return JSONResponse(content=await domain.get_executions(params=params))
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in get executions")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
 @app.get("/jobs/{job_uuid}", response_class=JSONResponse)
 async def get_job(
     job_uuid: str, token: str = Depends(verify_token)
@@ -204,3 +487,103 @@ async def get_job(
             content={"error_type": "server", "error_message": str(exp)},
             status_code=500,
         )
+
+
+@app.put("/templates/{name}", response_class=JSONResponse)
+async def put_template(
+    name: str,
+    params: PutTemplate,
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        logger.debug("Put template called with name={}.", name)
+
+        return JSONResponse(
+            content=await domain.put_template(name=name, action=params.action)
+        )
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in put template")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.get("/templates", response_class=JSONResponse)
+async def get_templates(token: str = Depends(verify_token)) -> JSONResponse:
+    try:
+        logger.debug("Get templates called.")
+
+        return JSONResponse(content=await domain.get_templates())
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in get templates")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.get("/templates/{name}", response_class=JSONResponse)
+async def get_template(
+    name: str, token: str = Depends(verify_token)
+) -> JSONResponse:
+    try:
+        logger.debug("Get template called with name={}.", name)
+
+        return JSONResponse(content=await domain.get_template(name=name))
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in get template")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.delete("/templates/{name}", response_class=JSONResponse)
+async def remove_template(
+    name: str, token: str = Depends(verify_token)
+) -> JSONResponse:
+    try:
+        logger.debug("Remove template called with name={}.", name)
+
+        return JSONResponse(content=await domain.remove_template(name=name))
+    except ValueError as exp:
+        return JSONResponse(
+            content={"error_type": "client", "error_message": str(exp)},
+            status_code=400,
+        )
+    except Exception as exp:
+        logger.exception("Error in remove template")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
+
+
+@app.get("/circuit-breakers", response_class=JSONResponse)
+async def get_circuit_breakers(
+    token: str = Depends(verify_token),
+) -> JSONResponse:
+    try:
+        return JSONResponse(content=domain.get_circuit_breakers())
+    except Exception as exp:
+        logger.exception("Error in get circuit breakers")
+        return JSONResponse(
+            content={"error_type": "server", "error_message": str(exp)},
+            status_code=500,
+        )
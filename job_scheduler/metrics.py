@@ -0,0 +1,292 @@
+import abc
+import math
+from bisect import bisect_left
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Text,
+    Tuple,
+    TypeVar,
+)
+
+# Seconds, from sub-millisecond HTTP calls to jobs firing minutes late
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    300,
+    900,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(
+    labelnames: Sequence[str],
+    labelvalues: Sequence[str],
+    extra: Optional[Tuple[str, str]] = None,
+) -> str:
+    pairs = list(zip(labelnames, labelvalues))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+        + "}"
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric(metaclass=abc.ABCMeta):
+    """A metric in the Prometheus text exposition format.
+
+    Samples are recorded with their label values as positional arguments,
+    recording one is a dict lookup and an addition.
+    """
+
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self._render_samples(),
+        ]
+
+    @abc.abstractmethod
+    def _render_samples(self) -> List[str]:
+        """Returns the sample lines of the metric."""
+
+    def take_samples(self) -> Optional[Dict[Tuple[str, ...], Any]]:
+        """Returns and resets the recorded samples, None if not supported.
+
+        Used to move samples recorded in worker processes to the metrics of
+        the main process, see merge_samples().
+        """
+        return None
+
+    @abc.abstractmethod
+    def merge_samples(self, samples: Dict[Tuple[str, ...], Any]) -> None:
+        """Adds samples returned by take_samples() to the metric."""
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def take_samples(self) -> Dict[Tuple[str, ...], float]:
+        samples, self._values = self._values, {}
+        return samples
+
+    def merge_samples(self, samples: Dict[Tuple[str, ...], float]) -> None:
+        for labelvalues, value in samples.items():
+            self.inc(*labelvalues, amount=value)
+
+    def _render_samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues)} "
+            f"{_format_value(value)}"
+            for labelvalues, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """A gauge read from ``function`` whenever the metrics are rendered."""
+
+    type = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, function: Callable[[], float]
+    ) -> None:
+        super().__init__(name, documentation)
+        self.function = function
+
+    def merge_samples(self, samples: Dict[Tuple[str, ...], Any]) -> None:
+        # Gauges are read in the process that renders them
+        raise ValueError(f"Samples of gauge {self.name} cannot be merged")
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.function())}"]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label values: count per bucket (not cumulative) and the sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        values = self._values.get(labelvalues)
+        if values is None:
+            values = self._values[labelvalues] = (
+                [0] * len(self.buckets),
+                [0.0],
+            )
+        values[0][bisect_left(self.buckets, value)] += 1
+        values[1][0] += value
+
+    def take_samples(
+        self,
+    ) -> Dict[Tuple[str, ...], Tuple[List[int], List[float]]]:
+        samples, self._values = self._values, {}
+        return samples
+
+    def merge_samples(
+        self, samples: Dict[Tuple[str, ...], Tuple[List[int], List[float]]]
+    ) -> None:
+        for labelvalues, (counts, total) in samples.items():
+            values = self._values.get(labelvalues)
+            if values is None:
+                self._values[labelvalues] = (list(counts), list(total))
+                continue
+            for index, count in enumerate(counts):
+                values[0][index] += count
+            values[1][0] += total[0]
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for labelvalues, (counts, total) in self._values.items():
+            cumulative = 0
+            for bucket, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, labelvalues, ("le", _format_value(bucket))
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+MetricT = TypeVar("MetricT", bound=Metric)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: MetricT) -> MetricT:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def take_samples(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        samples = {}
+        for name, metric in self._metrics.items():
+            metric_samples = metric.take_samples()
+            if metric_samples:
+                samples[name] = metric_samples
+        return samples
+
+    def merge_samples(
+        self, samples: Dict[str, Dict[Tuple[str, ...], Any]]
+    ) -> None:
+        for name, metric_samples in samples.items():
+            self._metrics[name].merge_samples(metric_samples)
+
+    def render(self) -> Text:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+JOB_SCHEDULE_LAG = registry.register(
+    Histogram(
+        "job_schedule_lag_seconds",
+        "Delay between the scheduled run time of a job and its start.",
+        ["category"],
+    )
+)
+JOB_RUNS = registry.register(
+    Counter(
+        "job_runs_total",
+        "Finished job runs by outcome (success, failure, retry, deferred).",
+        ["category", "outcome"],
+    )
+)
+JOB_FOLLOW_UPS = registry.register(
+    Counter(
+        "job_follow_ups_total",
+        "Follow-up actions by kind (on_success, on_failure) and outcome.",
+        ["category", "kind", "outcome"],
+    )
+)
+JOB_MISSED_RUNS = registry.register(
+    Counter(
+        "job_missed_runs_total",
+        "Runs dropped by the misfire grace time or misfire policy.",
+        ["category"],
+    )
+)
+HTTP_COMMAND_DURATION = registry.register(
+    Histogram(
+        "http_command_duration_seconds",
+        "Duration of HTTP commands, including failed ones.",
+        ["category"],
+    )
+)
+HTTP_COMMAND_RESPONSES = registry.register(
+    Counter(
+        "http_command_responses_total",
+        "HTTP commands by response status, or timeout, error or "
+        "circuit_open if there was no response.",
+        ["category", "status"],
+    )
+)
+
+
+def category_label(category: Optional[str]) -> str:
+    return category or ""
@@ -1,7 +1,12 @@
-from datetime import datetime
-from typing import Any, Dict, Optional, Text
+import abc
+import random
+from datetime import datetime, tzinfo
+from typing import Any, Dict, List, Literal, Optional, Text, Union
 
 import pydantic
+from apscheduler.triggers.base import BaseTrigger  # type: ignore
+from apscheduler.triggers.cron import CronTrigger  # type: ignore
+from apscheduler.triggers.interval import IntervalTrigger  # type: ignore
 
 
 class HTTPJobData(pydantic.BaseModel):
@@ -11,35 +16,255 @@ class HTTPJobData(pydantic.BaseModel):
     body: Optional[str] = None
     timeout: Optional[int] = None
 
+    # Handling of the response body: "discard" drains it without keeping it,
+    # "read" reads up to response_max_bytes into the debug log and "capture"
+    # also keeps them in the job's execution history
+    response_mode: Literal["discard", "read", "capture"] = "discard"
+    response_max_bytes: int = pydantic.Field(default=1024, ge=0, le=65536)
+
 
 class JobAction(pydantic.BaseModel):
     """Supported command types"""
 
     http: Optional[HTTPJobData] = None
 
+    # Name of a stored action template to use instead of an inline command
+    template: Optional[str] = None
+
+    # For on_success and on_failure actions: send the job context together
+    # with those of other jobs for the same target as one JSON array request,
+    # see FollowUpBatcher
+    batch: bool = False
+
+    # Command built from this action, see Command.get_command()
+    _command: Any = pydantic.PrivateAttr(default=None)
+
+    @pydantic.model_validator(mode="after")
+    def check_batch(self) -> "JobAction":
+        if self.template and self.batch:
+            raise ValueError(
+                "Actions using a template take batch from the template"
+            )
+        return self
+
+
+class RetryPolicy(pydantic.BaseModel):
+    """Retries of a failed job action with exponential backoff"""
+
+    # Total number of attempts, including the first one
+    max_attempts: int = pydantic.Field(default=3, ge=1)
+
+    # Seconds to wait before the first retry, doubled for every further one
+    # up to backoff_cap
+    backoff_base: float = pydantic.Field(default=1.0, gt=0)
+    backoff_cap: float = pydantic.Field(default=300.0, gt=0)
+
+    # Fraction of the backoff that is randomized, 1 is full jitter
+    jitter: float = pydantic.Field(default=1.0, ge=0, le=1)
+
+    retry_on_status: List[int] = [408, 425, 429, 500, 502, 503, 504]
+    retry_on_timeout: bool = True
+    retry_on_connection_error: bool = True
+
+    def get_delay(self, attempt: int) -> float:
+        """Returns the seconds to wait after the given failed attempt."""
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class Schedule(pydantic.BaseModel):
+    """Common fields of recurring job schedules"""
+
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+    # Timezone of the schedule, the scheduler's timezone by default
+    timezone: Optional[str] = None
+
+    # Handling of concurrent and missed runs, the defaults are the
+    # scheduler's job defaults
+    coalesce: bool = False
+    max_instances: int = pydantic.Field(default=3, ge=1)
+    misfire_grace_time: Optional[int] = pydantic.Field(default=1, ge=1)
+
+    @pydantic.model_validator(mode="after")
+    def check_trigger(self) -> "Schedule":
+        try:
+            self.build_trigger()
+        except ValueError:
+            raise
+        except Exception as exp:
+            # e.g. unknown timezones
+            raise ValueError(f"Invalid schedule: {exp!r}") from exp
+        return self
+
+    # The pydantic model metaclass is derived from abc.ABCMeta
+    @abc.abstractmethod
+    def build_trigger(
+        self, default_timezone: Optional[tzinfo] = None
+    ) -> BaseTrigger:
+        """Returns the trigger, raises ValueError for invalid schedules."""
+
+
+class CronSchedule(Schedule):
+    type: Literal["cron"] = "cron"
+
+    # A crontab expression like "*/5 * * * *" or the separate fields below
+    expression: Optional[str] = None
+
+    year: Optional[Union[int, str]] = None
+    month: Optional[Union[int, str]] = None
+    day: Optional[Union[int, str]] = None
+    week: Optional[Union[int, str]] = None
+    day_of_week: Optional[Union[int, str]] = None
+    hour: Optional[Union[int, str]] = None
+    minute: Optional[Union[int, str]] = None
+    second: Optional[Union[int, str]] = None
+
+    def build_trigger(
+        self, default_timezone: Optional[tzinfo] = None
+    ) -> BaseTrigger:
+        fields = {
+            "year": self.year,
+            "month": self.month,
+            "day": self.day,
+            "week": self.week,
+            "day_of_week": self.day_of_week,
+            "hour": self.hour,
+            "minute": self.minute,
+            "second": self.second,
+        }
+
+        if self.expression is not None:
+            if any(value is not None for value in fields.values()):
+                raise ValueError(
+                    "A cron schedule takes either an expression or fields"
+                )
+            values = self.expression.split()
+            if len(values) != 5:
+                raise ValueError(
+                    f"Wrong number of fields in cron expression: "
+                    f"got {len(values)}, expected 5"
+                )
+            fields = dict(
+                zip(("minute", "hour", "day", "month", "day_of_week"), values)
+            )
+
+        return CronTrigger(
+            **fields,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            timezone=self.timezone or default_timezone,
+        )
+
+
+class IntervalSchedule(Schedule):
+    type: Literal["interval"] = "interval"
+
+    weeks: int = pydantic.Field(default=0, ge=0)
+    days: int = pydantic.Field(default=0, ge=0)
+    hours: int = pydantic.Field(default=0, ge=0)
+    minutes: int = pydantic.Field(default=0, ge=0)
+    seconds: int = pydantic.Field(default=0, ge=0)
+
+    def build_trigger(
+        self, default_timezone: Optional[tzinfo] = None
+    ) -> BaseTrigger:
+        if not (
+            self.weeks
+            or self.days
+            or self.hours
+            or self.minutes
+            or self.seconds
+        ):
+            raise ValueError("The interval of a schedule must not be zero")
+
+        return IntervalTrigger(
+            weeks=self.weeks,
+            days=self.days,
+            hours=self.hours,
+            minutes=self.minutes,
+            seconds=self.seconds,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            timezone=self.timezone or default_timezone,
+        )
+
+
+JobSchedule = Union[CronSchedule, IntervalSchedule]
+
 
 class Job(pydantic.BaseModel):
     name: str
     category: Optional[str] = None
 
-    run_at: datetime
+    # Client-supplied key, creating a job with a key that was used before
+    # returns the existing job instead of adding another one
+    idempotency_key: Optional[str] = pydantic.Field(
+        default=None, min_length=1, max_length=255
+    )
+
+    # Due jobs with a higher priority run first, jobs of the same priority
+    # share the executor among their categories
+    priority: int = pydantic.Field(default=0, ge=0, le=9)
+
+    # Time of the (first) run. Jobs with a schedule run at the schedule's
+    # fire times from run_at on, run_at is set to their first run if it is
+    # not given.
+    run_at: Optional[datetime] = None
+    schedule: Optional[JobSchedule] = pydantic.Field(
+        default=None, discriminator="type"
+    )
 
     action: JobAction
     on_success: Optional[JobAction] = None
     on_failure: Optional[JobAction] = None
 
+    # Retries only apply to one-shot jobs, a failed run of a recurring job is
+    # followed by its next scheduled run.
+    retry: Optional[RetryPolicy] = None
+
+    @pydantic.model_validator(mode="after")
+    def check_batch(self) -> "Job":
+        if self.action.batch:
+            raise ValueError(
+                "Only on_success and on_failure actions can be batched"
+            )
+        return self
+
+    @pydantic.model_validator(mode="after")
+    def check_run_at(self) -> "Job":
+        if self.schedule is None:
+            if self.run_at is None:
+                raise ValueError(
+                    "run_at is required for jobs without a schedule"
+                )
+        else:
+            trigger = self.schedule.build_trigger()
+            now = datetime.now(trigger.timezone)
+            if trigger.get_next_fire_time(None, now) is None:
+                raise ValueError("The schedule has no future run times")
+        return self
+
     @pydantic.field_serializer("run_at")
-    def serialize_run_at(self, run_at: datetime) -> str:
-        return run_at.isoformat()
+    def serialize_run_at(self, run_at: Optional[datetime]) -> Optional[str]:
+        return run_at.isoformat() if run_at is not None else None
 
 
 class RunnableJob(pydantic.BaseModel):
     job: Job
     uuid: str
 
+    # Number of the current attempt, see Job.retry
+    attempt: int = 1
+
     def to_context(self) -> Dict[Text, Any]:
-        return {
+        context: Dict[Text, Any] = {
             "job_category": self.job.category,
             "job_name": self.job.name,
             "job_uuid": self.uuid,
         }
+        # Only jobs that are retried have more than one attempt
+        if self.job.retry is not None:
+            context["job_attempt"] = self.attempt
+        return context
@@ -1,7 +1,14 @@
-from typing import Any, Dict, List, Text
+import asyncio
+import base64
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Text, Tuple, Union
 
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore  # type: ignore
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
+from apscheduler.util import (  # type: ignore
+    astimezone,
+    convert_to_datetime,
+    datetime_to_utc_timestamp,
+)
 from loguru import logger
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
@@ -11,69 +18,447 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
+from job_scheduler import metrics
+from job_scheduler.catch_up import MisfirePolicy, parse_misfire_policies
+from job_scheduler.commands import circuit_breakers, merge_circuit_breakers
+from job_scheduler.dispatcher import Dispatcher, TimingWheelDispatcher
+from job_scheduler.executor import JobExecutor, parse_category_weights
+from job_scheduler.follow_ups import FollowUpBatcher
+from job_scheduler.history import HistoryRecorder
 from job_scheduler.job_runner import JobRunner
-from job_scheduler.models import RunnableJob
+from job_scheduler.models import JobAction, RunnableJob
 from job_scheduler.settings import settings
+from job_scheduler.store import AsyncJobStore, StoredJob, schedule_options
+from job_scheduler.templates import ActionTemplate, TemplateRegistry
+from job_scheduler.workers import WorkerPool
 
-DATABASE_URL = f"{settings.DB_SCHEMA_APSCHEDULER}://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+DATABASE_URL = (
+    settings.DATABASE_URL
+    or f"{settings.DB_SCHEMA}://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+)
 
 
 engine: AsyncEngine = create_async_engine(
-    DATABASE_URL, echo=False, future=True
+    DATABASE_URL,
+    echo=False,
+    future=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
 )
 async_session = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 
-scheduler = AsyncIOScheduler(
-    jobstores={"default": SQLAlchemyJobStore(url=DATABASE_URL)},
-    job_defaults={"coalesce": False, "max_instances": 3},
-    timezone=settings.TIMEZONE,
+timezone = astimezone(settings.TIMEZONE)
+
+
+async def _reschedule_job(job: RunnableJob, delay: float) -> None:
+    # The dispatcher keeps the row of a one-shot job until its run is done.
+    # A job removed meanwhile is stored again as a new row with the uuid.
+    stored_job = StoredJob(
+        job=job,
+        next_run_time=datetime.now(timezone) + timedelta(seconds=delay),
+    )
+    if not await job_store.reschedule_job(stored_job):
+        await job_store.add_jobs([stored_job])
+    dispatcher.jobs_added([stored_job])
+
+
+history = HistoryRecorder(
+    engine=engine,
+    timezone=timezone,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+    max_buffer=settings.HISTORY_MAX_BUFFER,
+)
+
+follow_up_batcher = FollowUpBatcher(
+    max_size=settings.FOLLOW_UP_BATCH_MAX_SIZE,
+    max_delay=settings.FOLLOW_UP_BATCH_MAX_DELAY,
+    max_attempts=settings.FOLLOW_UP_BATCH_MAX_ATTEMPTS,
+    max_pending=settings.FOLLOW_UP_BATCH_MAX_PENDING,
+)
+
+job_runner = JobRunner(
+    reschedule_job=_reschedule_job,
+    history=history if settings.HISTORY_ENABLED else None,
+    follow_up_batcher=follow_up_batcher,
+)
+
+job_executor: Union[JobExecutor, WorkerPool]
+if settings.EXECUTOR_WORKERS > 0:
+    job_executor = WorkerPool(
+        num_workers=settings.EXECUTOR_WORKERS,
+        reschedule_job=_reschedule_job,
+        history=history if settings.HISTORY_ENABLED else None,
+        queue_size=settings.EXECUTOR_QUEUE_SIZE,
+    )
+else:
+    job_executor = JobExecutor(
+        run_job=job_runner.run_job,
+        max_concurrency=settings.EXECUTOR_MAX_CONCURRENCY,
+        max_per_host=settings.EXECUTOR_MAX_PER_HOST,
+        queue_size=settings.EXECUTOR_QUEUE_SIZE,
+        category_weights=parse_category_weights(
+            settings.EXECUTOR_CATEGORY_WEIGHTS
+        ),
+    )
+
+metrics.registry.register(
+    metrics.Gauge(
+        "executor_jobs_queued",
+        "Due jobs waiting in the executor queue.",
+        lambda: job_executor.num_queued,
+    )
+)
+metrics.registry.register(
+    metrics.Gauge(
+        "executor_jobs_running",
+        "Jobs currently running.",
+        lambda: job_executor.num_running,
+    )
+)
+
+template_registry = TemplateRegistry(
+    engine=engine, cache_size=settings.TEMPLATE_CACHE_SIZE
+)
+
+job_store = AsyncJobStore(
+    engine=engine,
+    timezone=timezone,
+    templates=template_registry,
+    node_id=settings.NODE_ID,
+    lease_duration=settings.SCHEDULER_LEASE_DURATION,
 )
 
-job_runner = JobRunner()
+dispatcher_options: Dict[Text, Any] = {
+    "store": job_store,
+    "executor": job_executor,
+    "timezone": timezone,
+    "max_poll_interval": settings.SCHEDULER_MAX_POLL_INTERVAL,
+    "catch_up_max_rate": settings.CATCH_UP_MAX_RATE,
+    "catch_up_threshold": settings.CATCH_UP_THRESHOLD,
+    "misfire_policies": parse_misfire_policies(settings.MISFIRE_POLICIES),
+    "default_misfire_policy": MisfirePolicy.parse(
+        settings.MISFIRE_DEFAULT_POLICY
+    ),
+}
+dispatcher: Dispatcher
+if settings.SCHEDULER_ENGINE == "timing_wheel":
+    dispatcher = TimingWheelDispatcher(
+        tick=settings.SCHEDULER_WHEEL_TICK,
+        window=settings.SCHEDULER_WHEEL_WINDOW,
+        **dispatcher_options,
+    )
+elif settings.SCHEDULER_ENGINE == "poll":
+    dispatcher = Dispatcher(**dispatcher_options)
+else:
+    raise ValueError(f"Unknown scheduler engine: {settings.SCHEDULER_ENGINE}")
+
+JOBS_CHUNK_SIZE = 500
+JOBS_INSERT_BATCH_SIZE = 1000
 
+_background_tasks: List[asyncio.Task] = []
+
+# Job count and the monotonic time it expires at
+_job_count_cache: Tuple[Optional[int], float] = (None, 0.0)
+# Number of due jobs and the monotonic time it expires at
+_due_job_count_cache: Tuple[Optional[int], float] = (None, 0.0)
+
+metrics.registry.register(
+    metrics.Gauge(
+        "scheduler_jobs_stored",
+        "Jobs in the job store, as of the last count.",
+        lambda: _job_count_cache[0] or 0,
+    )
+)
+metrics.registry.register(
+    metrics.Gauge(
+        "scheduler_jobs_due",
+        "Active jobs whose run time has passed and that have not finished, "
+        "as of the last count.",
+        lambda: _due_job_count_cache[0] or 0,
+    )
+)
 
-async def start_apscheduler():
+
+async def start_scheduler():
     try:
         async with engine.begin() as conn:
-            await conn.run_sync(lambda conn: conn.execute(text("SELECT 1")))
+            await conn.execute(text("SELECT 1"))
         logger.debug("Database connection successful.")
     except SQLAlchemyError as e:
         logger.exception("Database connection failed.")
         raise e
 
-    logger.debug("Starting APScheduler...")
-    scheduler.start()  # type: ignore
+    await job_store.start()
+    await history.start()
+
+    logger.debug("Starting scheduler...")
+    await job_executor.start()
+    await dispatcher.start()
+
+    _background_tasks.append(
+        asyncio.create_task(_prune_templates_periodically())
+    )
+    _background_tasks.append(
+        asyncio.create_task(_prune_history_periodically())
+    )
+    _background_tasks.append(
+        asyncio.create_task(_prune_idempotency_keys_periodically())
+    )
+
 
+async def stop_scheduler():
+    logger.debug("Stopping scheduler...")
+    await dispatcher.shutdown()
+    await job_executor.shutdown()
+    await dispatcher.close()
+    await follow_up_batcher.shutdown()
+
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+    await history.shutdown()
 
-async def stop_apscheduler():
-    logger.debug("Stopping APScheduler...")
-    scheduler.shutdown(wait=False)  # type: ignore
     await engine.dispose()
-    logger.debug("APScheduler and database connections closed...")
+    logger.debug("Scheduler and database connections closed...")
+
 
+async def _prune_templates_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.TEMPLATE_PRUNE_INTERVAL)
+        try:
+            num_templates = await template_registry.prune(
+                min_age=settings.TEMPLATE_PRUNE_INTERVAL
+            )
+            logger.debug("Pruned {} unused action templates.", num_templates)
+        except Exception:
+            logger.exception("Error pruning action templates")
+
+
+async def _prune_history_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.HISTORY_PRUNE_INTERVAL)
+        try:
+            num_executions = await history.prune(
+                max_age=settings.HISTORY_RETENTION_DAYS * 24 * 3600
+            )
+            logger.debug("Pruned {} old job executions.", num_executions)
+        except Exception:
+            logger.exception("Error pruning job executions")
+
+
+async def _prune_idempotency_keys_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_KEY_PRUNE_INTERVAL)
+        try:
+            num_keys = await job_store.prune_idempotency_keys(
+                max_age=settings.IDEMPOTENCY_KEY_TTL
+            )
+            logger.debug("Pruned {} expired idempotency keys.", num_keys)
+        except Exception:
+            logger.exception("Error pruning idempotency keys")
+
+
+def get_executor_stats() -> Dict[Text, Any]:
+    return job_executor.stats()
+
+
+def get_circuit_breakers() -> List[Dict[Text, Any]]:
+    """Returns the circuit breakers per host, see merge_circuit_breakers().
+
+    The breakers are merged with a single process as well, so the result
+    has the same keys with and without worker processes.
+    """
+    snapshots = [[breaker.to_dict() for breaker in circuit_breakers.list()]]
+    if isinstance(job_executor, WorkerPool):
+        # Jobs run in the workers, each with circuit breakers of its own
+        snapshots.extend(job_executor.circuit_breakers())
+    return merge_circuit_breakers(snapshots)
+
+
+async def get_catch_up_progress() -> Dict[Text, Any]:
+    stats = dispatcher.catch_up_stats()
+    num_jobs, oldest_run_time = await job_store.get_backlog(
+        datetime.now(timezone) - timedelta(seconds=settings.CATCH_UP_THRESHOLD)
+    )
+    stats["backlog"] = num_jobs
+    stats["oldest_run_time"] = (
+        oldest_run_time.isoformat() if oldest_run_time is not None else None
+    )
+    return stats
+
+
+async def get_num_jobs_in_scheduler() -> int:
+    """Returns the number of stored jobs, cached for JOB_COUNT_CACHE_TTL."""
+    global _job_count_cache
+
+    num_jobs, expires_at = _job_count_cache
+    if num_jobs is None or time.monotonic() >= expires_at:
+        num_jobs = await job_store.count_jobs()
+        _job_count_cache = (
+            num_jobs,
+            time.monotonic() + settings.JOB_COUNT_CACHE_TTL,
+        )
+    return num_jobs
+
+
+async def get_num_due_jobs() -> int:
+    """Returns the number of due jobs, cached for JOB_COUNT_CACHE_TTL."""
+    global _due_job_count_cache
+
+    num_jobs, expires_at = _due_job_count_cache
+    if num_jobs is None or time.monotonic() >= expires_at:
+        num_jobs, _ = await job_store.get_backlog(datetime.now(timezone))
+        _due_job_count_cache = (
+            num_jobs,
+            time.monotonic() + settings.JOB_COUNT_CACHE_TTL,
+        )
+    return num_jobs
+
+
+async def update_job_counts() -> None:
+    """Refreshes the expired job counts read by the metrics gauges."""
+    try:
+        await get_num_jobs_in_scheduler()
+        await get_num_due_jobs()
+    except SQLAlchemyError as exp:
+        logger.warning(f"Unable to count the jobs for the metrics: {exp}")
+
+
+async def check_readiness() -> Dict[Text, Any]:
+    """Checks the database and the scheduler loop in constant time."""
+    checks: Dict[Text, Any] = {}
+
+    try:
+        async with engine.connect() as conn:
+            await asyncio.wait_for(
+                conn.execute(text("SELECT 1")),
+                timeout=settings.HEALTH_CHECK_DB_TIMEOUT,
+            )
+    except Exception as exp:
+        checks["database"] = {"ok": False, "error": repr(exp)}
+    else:
+        checks["database"] = {"ok": True}
+    checks["database"]["pool"] = engine.pool.status()
+
+    seconds_idle = dispatcher.seconds_idle
+    checks["scheduler"] = {
+        "ok": dispatcher.running
+        and seconds_idle
+        <= settings.SCHEDULER_MAX_POLL_INTERVAL
+        + settings.SCHEDULER_STALL_TIMEOUT,
+        "running": dispatcher.running,
+        "seconds_idle": seconds_idle,
+    }
 
-async def get_num_apscheduler_jobs():
-    return len(scheduler.get_jobs())  # type: ignore
+    return checks
+
+
+def build_stored_job(job: RunnableJob) -> StoredJob:
+    """Returns the job with its first run time.
+
+    Raises ValueError if the job's schedule is invalid or has no run times.
+    """
+    schedule = job.job.schedule
+    if schedule is None:
+        return StoredJob(
+            job=job,
+            next_run_time=convert_to_datetime(
+                job.job.run_at, timezone, "run_at"
+            ),
+        )
+
+    trigger = schedule.build_trigger(timezone)
+    now = datetime.now(timezone)
+    if job.job.run_at is not None:
+        now = max(now, convert_to_datetime(job.job.run_at, timezone, "run_at"))
+
+    next_run_time = trigger.get_next_fire_time(None, now)
+    if next_run_time is None:
+        raise ValueError(f"The schedule of job {job.uuid} has no run times")
+    job.job.run_at = next_run_time
+
+    return StoredJob(
+        job=job,
+        next_run_time=next_run_time,
+        **schedule_options(schedule, trigger),
+    )
 
 
 async def add_job_to_scheduler(job: RunnableJob) -> str:
     try:
-        scheduler.add_job(job_runner.run_job, "date", run_date=job.job.run_at, args=[job], id=job.uuid, misfire_grace_time=None, max_instances=1)  # type: ignore
+        stored_job = build_stored_job(job)
+        (job_uuid,) = await job_store.add_jobs([stored_job])
+        if job_uuid != job.uuid:
+            logger.debug(
+                "Job with idempotency key {} already exists as {}.",
+                job.job.idempotency_key,
+                job_uuid,
+            )
+            return job_uuid
+
+        dispatcher.jobs_added([stored_job])
         logger.debug(
-            f"Added job {job.uuid} to the scheduler to run at date={job.job.run_at}."
+            "Added job {job_uuid} to the scheduler to run at {run_at}.",
+            job_uuid=job.uuid,
+            run_at=job.job.run_at,
         )
-        return job.uuid
+        return job_uuid
     except Exception as exp:
-        logger.error(f"Error adding job {job.uuid} to the scheduler: {exp}")
+        logger.error(
+            "Error adding job {job_uuid} to the scheduler: {error}",
+            job_uuid=job.uuid,
+            error=str(exp),
+        )
         raise exp
 
 
+async def add_jobs_to_scheduler(
+    stored_jobs: List[StoredJob], wakeup: bool = True
+) -> List[str]:
+    """Writes all jobs to the store in a single transaction.
+
+    The jobs are built by build_stored_job(). Rows are inserted in
+    multi-row batches of ``JOBS_INSERT_BATCH_SIZE`` and the dispatcher is
+    woken up once afterwards. Without ``wakeup`` the caller does that with
+    jobs_added(), e.g. after storing several transactions.
+    """
+    try:
+        job_uuids = await job_store.add_jobs(
+            stored_jobs, batch_size=JOBS_INSERT_BATCH_SIZE
+        )
+        if wakeup:
+            jobs_added(
+                [
+                    stored_job
+                    for stored_job, job_uuid in zip(stored_jobs, job_uuids)
+                    if job_uuid == stored_job.id
+                ]
+            )
+
+        logger.debug("Added {} jobs to the scheduler.", len(stored_jobs))
+        return job_uuids
+    except Exception as exp:
+        logger.error(
+            f"Error adding {len(stored_jobs)} jobs to the scheduler: {exp}"
+        )
+        raise exp
+
+
+def jobs_added(stored_jobs: List[StoredJob]) -> None:
+    """Wakes up the dispatcher for newly stored jobs."""
+    dispatcher.jobs_added(stored_jobs)
+
+
 async def clear_jobs_from_scheduler() -> int:
     try:
-        num_jobs = len(scheduler.get_jobs())  # type: ignore
-        scheduler.remove_all_jobs()  # type: ignore
-        logger.debug(f"Removed {num_jobs} unscheduled jobs from scheduler.")
+        num_jobs = await job_store.remove_all_jobs()
+        logger.debug("Removed {} unscheduled jobs from scheduler.", num_jobs)
         return num_jobs
     except Exception as exp:
         logger.error(
@@ -82,29 +467,183 @@ async def clear_jobs_from_scheduler() -> int:
         raise exp
 
 
-def job_to_dict(job: Any) -> Dict[Text, Any]:
+def _to_timestamp(value: Optional[datetime], name: str) -> Optional[float]:
+    # Naive datetimes are in the scheduler's timezone.
+    if value is None:
+        return None
+    return datetime_to_utc_timestamp(
+        convert_to_datetime(value, timezone, name)
+    )
+
+
+def encode_jobs_cursor(next_run_time: float, job_uuid: str) -> str:
+    return base64.urlsafe_b64encode(
+        f"{next_run_time!r}:{job_uuid}".encode()
+    ).decode()
+
+
+def decode_jobs_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        next_run_time, job_uuid = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+        )
+        return float(next_run_time), job_uuid
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+async def iter_jobs_from_scheduler(
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    run_at_from: Optional[datetime] = None,
+    run_at_to: Optional[datetime] = None,
+    paused: Optional[bool] = None,
+    chunk_size: int = JOBS_CHUNK_SIZE,
+) -> AsyncIterator[Tuple[str, Dict[Text, Any]]]:
+    """Yields (cursor, job) pairs ordered by next run time.
+
+    Rows are read from the job store in chunks of ``chunk_size``, the
+    returned cursor points right after the yielded job.
+    """
+    after = decode_jobs_cursor(cursor) if cursor else None
+    run_at_from_ts = _to_timestamp(run_at_from, "run_at_from")
+    run_at_to_ts = _to_timestamp(run_at_to, "run_at_to")
+
+    while True:
+        chunk = await job_store.get_jobs(
+            after=after,
+            category=category,
+            name_prefix=name_prefix,
+            run_at_from=run_at_from_ts,
+            run_at_to=run_at_to_ts,
+            paused=paused,
+            limit=chunk_size,
+        )
+
+        for stored_job in chunk:
+            after = (
+                datetime_to_utc_timestamp(stored_job.next_run_time),
+                stored_job.id,
+            )
+            yield encode_jobs_cursor(*after), _job_to_dict(stored_job)
+
+        if len(chunk) < chunk_size:
+            return
+
+
+async def get_job_from_scheduler(job_uuid: str) -> Optional[Dict[Text, Any]]:
+    # Looks the job up by its primary key, so only a single row is loaded.
+    stored_job = await job_store.lookup_job(job_uuid)
+    return _job_to_dict(stored_job) if stored_job else None
+
+
+def _job_to_dict(stored_job: StoredJob) -> Dict[Text, Any]:
+    return {**stored_job.job.dict(), "paused": stored_job.paused}
+
+
+def _job_selection(
+    category: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    run_at_from: Optional[datetime] = None,
+    run_at_to: Optional[datetime] = None,
+) -> Dict[Text, Any]:
     return {
-        "id": job.id,
-        "name": job.name,
-        "trigger": str(job.trigger),
-        "next_run_time": job.next_run_time.isoformat()
-        if job.next_run_time
-        else None,
-        "args": job.args[1],
-        "kwargs": job.kwargs,
-        "misfire_grace_time": job.misfire_grace_time,
-        "max_instances": job.max_instances,
+        "category": category,
+        "name_prefix": name_prefix,
+        "run_at_from": _to_timestamp(run_at_from, "run_at_from"),
+        "run_at_to": _to_timestamp(run_at_to, "run_at_to"),
     }
 
 
-async def get_jobs_from_scheduler() -> List[Any]:
-    return [job.args[1].dict() for job in scheduler.get_jobs()]  # type: ignore
+async def remove_selected_jobs_from_scheduler(**selection: Any) -> int:
+    num_jobs = await job_store.remove_selected_jobs(
+        **_job_selection(**selection)
+    )
+    logger.debug("Removed {} jobs selected by {}.", num_jobs, selection)
+    return num_jobs
+
+
+async def pause_jobs_in_scheduler(**selection: Any) -> int:
+    num_jobs = await job_store.update_selected_jobs(
+        {"paused": True}, paused=False, **_job_selection(**selection)
+    )
+    logger.debug("Paused {} jobs selected by {}.", num_jobs, selection)
+    return num_jobs
+
+
+async def resume_jobs_in_scheduler(**selection: Any) -> int:
+    # Resumed jobs that are overdue run right away, or according to the
+    # misfire settings of their schedule.
+    num_jobs = await job_store.update_selected_jobs(
+        {"paused": False}, paused=True, **_job_selection(**selection)
+    )
+    dispatcher.wakeup()
+    logger.debug("Resumed {} jobs selected by {}.", num_jobs, selection)
+    return num_jobs
+
+
+async def shift_jobs_in_scheduler(seconds: float, **selection: Any) -> int:
+    num_jobs = await job_store.shift_selected_jobs(
+        seconds, **_job_selection(**selection)
+    )
+    dispatcher.wakeup()
+    logger.debug(
+        "Shifted {} jobs selected by {} by {}s.", num_jobs, selection, seconds
+    )
+    return num_jobs
 
 
 async def remove_job_from_scheduler(job_uuid: str) -> None:
     try:
-        scheduler.remove_job(job_uuid)  # type: ignore
-        logger.debug(f"Removed job {job_uuid} from scheduler.")
+        if not await job_store.remove_jobs([job_uuid]):
+            raise ValueError(f"No job by the id of {job_uuid} was found")
+        dispatcher.jobs_removed([job_uuid])
+        logger.debug("Removed job {} from scheduler.", job_uuid)
     except Exception as exp:
         logger.error(f"Error removing job {job_uuid} from scheduler: {exp}")
         raise exp
+
+
+async def put_template(name: str, action: JobAction) -> ActionTemplate:
+    if action.template:
+        raise ValueError("Templates cannot reference other templates")
+    if not action.http:
+        raise ValueError(f"Unsupported job action: {action}")
+
+    template = await template_registry.put_named(name=name, action=action)
+    logger.debug("Stored action template {}.", template)
+    return template
+
+
+async def get_templates(names: List[str]) -> Dict[str, ActionTemplate]:
+    async with engine.begin() as conn:
+        return await template_registry.get_named(conn, names)
+
+
+async def list_templates() -> List[ActionTemplate]:
+    return await template_registry.list_named()
+
+
+async def remove_template(name: str) -> None:
+    if not await template_registry.remove_named(name):
+        raise ValueError(f"No template by the name of {name} was found")
+    logger.debug("Removed action template {}.", name)
+
+
+async def get_executions(
+    job_uuid: Optional[str] = None,
+    category: Optional[str] = None,
+    started_from: Optional[datetime] = None,
+    started_to: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = 100,
+) -> List[Dict[Text, Any]]:
+    return await history.get_executions(
+        job_uuid=job_uuid,
+        category=category,
+        started_from=_to_timestamp(started_from, "started_from"),
+        started_to=_to_timestamp(started_to, "started_to"),
+        before_id=before_id,
+        limit=limit,
+    )
@@ -0,0 +1,426 @@
+"""Load test of the scheduler API and of job execution.
+
+Runs the app with uvicorn in a child process against a fresh SQLite file
+or the database given by --database-url, which is cleared first. Jobs call a stub HTTP server run by the benchmark itself.
+The results are written as JSON, so runs of different commits can be
+compared, e.g.
+
+    job-scheduler-benchmark --output bench-$(git rev-parse --short HEAD).json
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Annotated,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Text,
+)
+
+import aiohttp
+import typer
+from aiohttp import web
+
+app = typer.Typer(context_settings={"help_option_names": ["-h", "--help"]})
+
+API_TOKEN = "benchmark"
+BULK_SIZE = 1000
+
+
+def summarize(values: List[float]) -> Dict[Text, Any]:
+    """Returns the distribution of the given seconds in milliseconds."""
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def percentile(p: float) -> float:
+        return values[min(int(p * len(values)), len(values) - 1)] * 1000
+
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "max_ms": values[-1] * 1000,
+    }
+
+
+class StubTarget:
+    """HTTP server the benchmark jobs call, records the arrival times."""
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self.arrivals: List[float] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.arrivals.append(time.time())
+        return web.Response(text="ok")
+
+    async def start(self) -> None:
+        stub_app = web.Application()
+        stub_app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(stub_app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def start_app(
+    database_url: str, port: int, app_env: Dict[Text, str]
+) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("LOGURU_LEVEL", "WARNING")
+    env.update(DATABASE_URL=database_url, API_TOKEN=API_TOKEN, TIMEZONE="UTC")
+    env.update(app_env)
+
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "job_scheduler.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=env,
+    )
+
+
+def stop_app(process: subprocess.Popen) -> Optional[int]:
+    """Stops the app and returns its peak RSS in KiB."""
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+class Benchmark:
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        base_url: str,
+        target: StubTarget,
+        concurrency: int,
+    ) -> None:
+        self.session = session
+        self.base_url = base_url
+        self.target = target
+        self.concurrency = concurrency
+        self.job_uuids: List[str] = []
+
+    async def wait_until_ready(self, timeout: float = 60) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                async with self.session.get(
+                    f"{self.base_url}/health/ready"
+                ) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientConnectionError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError("The app did not become ready")
+
+    def make_job(
+        self, name: str, run_at: datetime, category: str = "benchmark"
+    ) -> Dict[Text, Any]:
+        return {
+            "name": name,
+            "category": category,
+            "run_at": run_at.isoformat(),
+            "action": {"http": {"url": f"{self.target.url}/hit"}},
+        }
+
+    async def request(
+        self, method: str, path: str, **kwargs: Any
+    ) -> Dict[Text, Any]:
+        async with self.session.request(
+            method,
+            f"{self.base_url}{path}",
+            headers={"x-token": API_TOKEN},
+            **kwargs,
+        ) as response:
+            data = await response.json()
+            if response.status != 200:
+                raise RuntimeError(f"{method} {path} failed: {data}")
+            return data
+
+    async def timed(
+        self, num_requests: int, make_request: Callable[[int], Awaitable]
+    ) -> Dict[Text, Any]:
+        """Sends the requests with bounded concurrency, timing each one."""
+        durations: List[float] = []
+        num_errors = 0
+        counter = iter(range(num_requests))
+
+        async def worker() -> None:
+            nonlocal num_errors
+            for index in counter:
+                started_at = time.perf_counter()
+                try:
+                    await make_request(index)
+                except Exception:
+                    num_errors += 1
+                else:
+                    durations.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        await asyncio.gather(
+            *(worker() for _ in range(min(self.concurrency, num_requests)))
+        )
+        elapsed = time.perf_counter() - started_at
+
+        return {
+            "requests": num_requests,
+            "errors": num_errors,
+            "seconds": elapsed,
+            "per_second": len(durations) / elapsed if elapsed else None,
+            "latency": summarize(durations),
+        }
+
+    async def bulk_create(self, jobs: List[Dict[Text, Any]]) -> None:
+        for start in range(0, len(jobs), BULK_SIZE):
+            data = await self.request(
+                "POST", "/jobs/bulk", json=jobs[start : start + BULK_SIZE]
+            )
+            self.job_uuids.extend(
+                result["job_uuid"]
+                for result in data["results"]
+                if result["status"] == "success"
+            )
+
+    async def run_create(self, num_jobs: int) -> Dict[Text, Any]:
+        run_at = datetime.now(timezone.utc) + timedelta(days=1)
+
+        async def create(index: int) -> None:
+            data = await self.request(
+                "POST",
+                "/jobs/create",
+                json={"job": self.make_job(f"create-{index}", run_at)},
+            )
+            self.job_uuids.append(data["job_uuid"])
+
+        return await self.timed(num_jobs, create)
+
+    async def run_lookups(
+        self, store_sizes: List[int], num_requests: int
+    ) -> List[Dict[Text, Any]]:
+        run_at = datetime.now(timezone.utc) + timedelta(days=1)
+        results = []
+        for store_size in sorted(store_sizes):
+            missing = store_size - len(self.job_uuids)
+            if missing > 0:
+                await self.bulk_create(
+                    [
+                        self.make_job(f"fill-{index}", run_at)
+                        for index in range(missing)
+                    ]
+                )
+            job_uuids = list(self.job_uuids)
+
+            async def get_job(index: int) -> None:
+                await self.request("GET", f"/jobs/{random.choice(job_uuids)}")
+
+            async def list_jobs(index: int) -> None:
+                await self.request(
+                    "GET",
+                    "/jobs",
+                    params={"limit": 100, "category": "benchmark"},
+                )
+
+            results.append(
+                {
+                    "store_size": len(job_uuids),
+                    "get_job": await self.timed(num_requests, get_job),
+                    "list_jobs": await self.timed(num_requests, list_jobs),
+                }
+            )
+        return results
+
+    async def run_schedule_lag(
+        self, num_jobs: int, due_in: float, timeout: float
+    ) -> Dict[Text, Any]:
+        """Creates jobs that are all due at the same moment."""
+        due_at = datetime.now(timezone.utc) + timedelta(seconds=due_in)
+        await self.bulk_create(
+            [
+                self.make_job(f"due-{index}", due_at, category="due")
+                for index in range(num_jobs)
+            ]
+        )
+        if datetime.now(timezone.utc) >= due_at:
+            raise RuntimeError("Creating the due jobs took longer than due_in")
+
+        self.target.arrivals.clear()
+        deadline = due_at.timestamp() + timeout
+        while len(self.target.arrivals) < num_jobs and time.time() < deadline:
+            await asyncio.sleep(0.1)
+
+        lags = [
+            arrival - due_at.timestamp() for arrival in self.target.arrivals
+        ]
+        return {
+            "jobs": num_jobs,
+            "executed": len(lags),
+            "lag": summarize(lags),
+        }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(
+    database_url: str,
+    port: int,
+    target_port: int,
+    app_env: Dict[Text, str],
+    create_jobs: int,
+    concurrency: int,
+    store_sizes: List[int],
+    lookups: int,
+    due_jobs: int,
+    due_in: float,
+    lag_timeout: float,
+) -> Dict[Text, Any]:
+    target = StubTarget(target_port)
+    await target.start()
+    process = start_app(database_url, port, app_env)
+    results: Dict[Text, Any] = {}
+    try:
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency)
+        ) as session:
+            benchmark = Benchmark(
+                session, f"http://127.0.0.1:{port}", target, concurrency
+            )
+            await benchmark.wait_until_ready()
+            await benchmark.request("DELETE", "/jobs")
+
+            results["create"] = await benchmark.run_create(create_jobs)
+            results["lookup"] = await benchmark.run_lookups(
+                store_sizes, lookups
+            )
+            results["schedule_lag"] = await benchmark.run_schedule_lag(
+                due_jobs, due_in, lag_timeout
+            )
+    finally:
+        results["peak_rss_kib"] = stop_app(process)
+        await target.stop()
+    return results
+
+
+@app.command()
+def run(
+    database_url: Annotated[
+        Optional[str],
+        typer.Option(help="Database to use, a temporary SQLite by default"),
+    ] = None,
+    output: Annotated[
+        Optional[str], typer.Option("--output", "-o", help="JSON file")
+    ] = None,
+    app_env: Annotated[
+        Optional[List[str]],
+        typer.Option(help="Setting of the app as NAME=VALUE, repeatable"),
+    ] = None,
+    port: int = 8177,
+    target_port: int = 8178,
+    create_jobs: int = 2000,
+    concurrency: int = 50,
+    store_sizes: str = "1000,10000,50000",
+    lookups: int = 500,
+    due_jobs: int = 2000,
+    due_in: float = 15,
+    lag_timeout: float = 120,
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config: Dict[Text, Any] = {
+            "database": (database_url or "sqlite").split(":", 1)[0],
+            "app_env": dict(
+                setting.split("=", 1) for setting in app_env or []
+            ),
+            "create_jobs": create_jobs,
+            "concurrency": concurrency,
+            "store_sizes": [int(size) for size in store_sizes.split(",")],
+            "lookups": lookups,
+            "due_jobs": due_jobs,
+            "due_in": due_in,
+        }
+        started_at = datetime.now(timezone.utc)
+        results = asyncio.run(
+            run_benchmark(
+                database_url=database_url
+                or f"sqlite+aiosqlite:///{tmp_dir}/benchmark.db",
+                port=port,
+                target_port=target_port,
+                app_env=config["app_env"],
+                create_jobs=create_jobs,
+                concurrency=concurrency,
+                store_sizes=config["store_sizes"],
+                lookups=lookups,
+                due_jobs=due_jobs,
+                due_in=due_in,
+                lag_timeout=lag_timeout,
+            )
+        )
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        typer.echo(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    app()
@@ -71,6 +71,24 @@ def create_http_job(
     typer.echo(response.json())
 
 
+@app.command(help="Streams a file with one JSON job per line")
+def create_http_jobs(
+    from_file: Annotated[typer.FileBinaryRead, typer.Option(...)],
+    server_token: Annotated[str, typer.Option(..., "--token", "-t")],
+    server_url: str = DEFAULT_URL,
+    server_port: int = DEFAULT_PORT,
+) -> None:
+    response = requests.post(
+        f"{server_url}:{server_port}/jobs/bulk",
+        data=from_file,
+        headers={
+            "x-token": server_token,
+            "content-type": "application/x-ndjson",
+        },
+    )
+    typer.echo(json.dumps(response.json(), indent=2))
+
+
 @app.command()
 def remove_job(
     job_uuid: str,
@@ -85,17 +103,64 @@ def remove_job(
     typer.echo(response.json())
 
 
-@app.command()
+@app.command(help="Prints the jobs as a JSON array or one per line")
 def get_all_jobs(
     server_token: Annotated[str, typer.Option(..., "--token", "-t")],
     server_url: str = DEFAULT_URL,
     server_port: int = DEFAULT_PORT,
+    category: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    run_after: Annotated[
+        Optional[str], typer.Option(help="Jobs running at or after")
+    ] = None,
+    run_before: Annotated[
+        Optional[str], typer.Option(help="Jobs running before")
+    ] = None,
+    ndjson: Annotated[
+        bool, typer.Option("--ndjson", help="One JSON job per line")
+    ] = False,
+    page_size: int = 100,
 ) -> None:
-    response = requests.get(
-        f"{server_url}:{server_port}/jobs",
-        headers={"x-token": server_token},
-    )
-    typer.echo(json.dumps(response.json(), indent=2))
+    params: Dict[Text, Any] = {"limit": page_size}
+    if category is not None:
+        params["category"] = category
+    if name_prefix is not None:
+        params["name_prefix"] = name_prefix
+    if run_after is not None:
+        params["run_at_from"] = datetime.fromisoformat(run_after).isoformat()
+    if run_before is not None:
+        params["run_at_to"] = datetime.fromisoformat(run_before).isoformat()
+
+    # The array is written as the pages arrive
+    separator = "["
+    while True:
+        response = requests.get(
+            f"{server_url}:{server_port}/jobs",
+            params=params,
+            headers={"x-token": server_token},
+        )
+        data = response.json()
+
+        if data.get("status") != "success":
+            if separator != "[":
+                typer.echo("]")
+            typer.echo(json.dumps(data, indent=2), err=True)
+            raise typer.Exit(code=1)
+
+        for job in data["jobs"]:
+            if ndjson:
+                typer.echo(json.dumps(job, indent=None))
+            else:
+                typer.echo(separator + json.dumps(job, indent=None), nl=False)
+                separator = ",\n"
+
+        if not data.get("next_cursor"):
+            break
+
+        params["cursor"] = data["next_cursor"]
+
+    if not ndjson:
+        typer.echo("[]" if separator == "[" else "]")
 
 
 @app.command()
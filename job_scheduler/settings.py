@@ -1,34 +1,233 @@
 import os
+import socket
+from typing import Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+def parse_category_setting(
+    value: str, parse: Callable[[str], T]
+) -> Dict[str, T]:
+    """Parses "category=value,..." settings, the values with ``parse``."""
+    values = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        category, separator, item_value = item.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid setting: {item}")
+        values[category.strip()] = parse(item_value.strip())
+    return values
 
 
 class Settings:
     def __init__(self):
-        self.LOGURU_LEVEL = os.getenv("LOGURU_LEVEL", "DEBUG")
+        self.LOGURU_LEVEL = os.getenv("LOGURU_LEVEL", "INFO")
+        # "text" or "json", one JSON object per record
+        self.LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+        # Share of successful job runs that are logged, per category as
+        # "category=rate,..." and LOG_SUCCESS_SAMPLE_RATE for the others
+        self.LOG_SUCCESS_SAMPLE_RATE = float(
+            os.getenv("LOG_SUCCESS_SAMPLE_RATE", "1")
+        )
+        self.LOG_SUCCESS_SAMPLE_RATES = os.getenv(
+            "LOG_SUCCESS_SAMPLE_RATES", ""
+        )
+        # Request and response bodies are cut to this many characters in
+        # logs, the values of these headers (besides the usual credentials)
+        # are masked
+        self.LOG_MAX_BODY_SIZE = int(os.getenv("LOG_MAX_BODY_SIZE", "1024"))
+        self.LOG_REDACT_HEADERS = os.getenv("LOG_REDACT_HEADERS", "")
         self.DB_SCHEMA = os.getenv("DB_SCHEMA")
-        self.DB_SCHEMA_APSCHEDULER = os.getenv("DB_SCHEMA_APSCHEDULER")
         self.DB_HOST = os.getenv("DB_HOST")
         self.DB_PORT = os.getenv("DB_PORT")
         self.DB_NAME = os.getenv("DB_NAME")
         self.DB_USER = os.getenv("DB_USER")
         self.DB_PASSWORD = os.getenv("DB_PASSWORD")
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        # Overrides the DB_* connection settings, e.g.
+        # sqlite+aiosqlite:///jobs.db to run local nodes without Postgres
+        self.DATABASE_URL = os.getenv("DATABASE_URL")
         self.API_TOKEN = os.getenv("API_TOKEN")
         self.TIMEZONE = os.getenv("TIMEZONE", "Europe/Berlin")
+        self.SCHEDULER_MAX_POLL_INTERVAL = float(
+            os.getenv("SCHEDULER_MAX_POLL_INTERVAL", "30")
+        )
+
+        # "poll" queries the store for the earliest run time, "timing_wheel"
+        # keeps the jobs due within SCHEDULER_WHEEL_WINDOW seconds in memory
+        # and fires them on ticks of SCHEDULER_WHEEL_TICK seconds
+        self.SCHEDULER_ENGINE = os.getenv("SCHEDULER_ENGINE", "poll")
+        self.SCHEDULER_WHEEL_TICK = float(
+            os.getenv("SCHEDULER_WHEEL_TICK", "0.1")
+        )
+        self.SCHEDULER_WHEEL_WINDOW = float(
+            os.getenv("SCHEDULER_WHEEL_WINDOW", "300")
+        )
+
+        # Jobs due more than CATCH_UP_THRESHOLD seconds ago are replayed at
+        # no more than CATCH_UP_MAX_RATE jobs per second, 0 disables the limit
+        self.CATCH_UP_MAX_RATE = float(os.getenv("CATCH_UP_MAX_RATE", "0"))
+        self.CATCH_UP_THRESHOLD = float(os.getenv("CATCH_UP_THRESHOLD", "60"))
+        # What to do with missed runs, per category as
+        # "category=policy,...": all, latest or skip_older_than:<seconds>
+        self.MISFIRE_POLICIES = os.getenv("MISFIRE_POLICIES", "")
+        self.MISFIRE_DEFAULT_POLICY = os.getenv(
+            "MISFIRE_DEFAULT_POLICY", "all"
+        )
+
+        # Identifies this scheduler node in the job leases, must be unique
+        # among the nodes sharing a database
+        self.NODE_ID = os.getenv(
+            "NODE_ID", f"{socket.gethostname()}-{os.getpid()}"
+        )
+        # Seconds a node holds the due jobs it claimed before other nodes
+        # may take them over, renewed while one-shot jobs run
+        self.SCHEDULER_LEASE_DURATION = float(
+            os.getenv("SCHEDULER_LEASE_DURATION", "30")
+        )
+
+        # The scheduler loop counts as stalled if it made no progress for this
+        # many seconds longer than SCHEDULER_MAX_POLL_INTERVAL
+        self.SCHEDULER_STALL_TIMEOUT = float(
+            os.getenv("SCHEDULER_STALL_TIMEOUT", "60")
+        )
+        self.JOB_COUNT_CACHE_TTL = float(os.getenv("JOB_COUNT_CACHE_TTL", "5"))
+        self.HEALTH_CHECK_DB_TIMEOUT = float(
+            os.getenv("HEALTH_CHECK_DB_TIMEOUT", "2")
+        )
+
+        self.EXECUTOR_MAX_CONCURRENCY = int(
+            os.getenv("EXECUTOR_MAX_CONCURRENCY", "100")
+        )
+        self.EXECUTOR_MAX_PER_HOST = int(
+            os.getenv("EXECUTOR_MAX_PER_HOST", "20")
+        )
+        self.EXECUTOR_QUEUE_SIZE = int(
+            os.getenv("EXECUTOR_QUEUE_SIZE", "10000")
+        )
+        # Share of the executor per category among queued jobs of the same
+        # priority, as "category=weight,...". Categories default to 1.
+        self.EXECUTOR_CATEGORY_WEIGHTS = os.getenv(
+            "EXECUTOR_CATEGORY_WEIGHTS", ""
+        )
+        # Number of worker processes running the jobs, sharded by job uuid,
+        # 0 runs them in the API process. EXECUTOR_QUEUE_SIZE limits the jobs
+        # handed to all workers, the other executor settings apply per worker.
+        self.EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", "0"))
+
+        # Batched follow-up actions (JobAction.batch) are sent once
+        # FOLLOW_UP_BATCH_MAX_SIZE contexts are collected for a target or the
+        # oldest has waited FOLLOW_UP_BATCH_MAX_DELAY seconds
+        self.FOLLOW_UP_BATCH_MAX_SIZE = int(
+            os.getenv("FOLLOW_UP_BATCH_MAX_SIZE", "100")
+        )
+        self.FOLLOW_UP_BATCH_MAX_DELAY = float(
+            os.getenv("FOLLOW_UP_BATCH_MAX_DELAY", "1")
+        )
+        self.FOLLOW_UP_BATCH_MAX_ATTEMPTS = int(
+            os.getenv("FOLLOW_UP_BATCH_MAX_ATTEMPTS", "5")
+        )
+        # Contexts waiting per target, further follow-ups fail
+        self.FOLLOW_UP_BATCH_MAX_PENDING = int(
+            os.getenv("FOLLOW_UP_BATCH_MAX_PENDING", "10000")
+        )
+
+        self.CIRCUIT_BREAKER_ENABLED = os.getenv(
+            "CIRCUIT_BREAKER_ENABLED", "true"
+        ).lower() in ("1", "true", "yes")
+        self.CIRCUIT_BREAKER_FAILURE_RATE = float(
+            os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5")
+        )
+        self.CIRCUIT_BREAKER_MIN_CALLS = int(
+            os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "20")
+        )
+        self.CIRCUIT_BREAKER_WINDOW_SIZE = int(
+            os.getenv("CIRCUIT_BREAKER_WINDOW_SIZE", "100")
+        )
+        self.CIRCUIT_BREAKER_SLOW_CALL_DURATION = float(
+            os.getenv("CIRCUIT_BREAKER_SLOW_CALL_DURATION", "60")
+        )
+        self.CIRCUIT_BREAKER_OPEN_DURATION = float(
+            os.getenv("CIRCUIT_BREAKER_OPEN_DURATION", "30")
+        )
+        # What to do with jobs whose host has an open circuit: "defer" them
+        # until the circuit half-opens or "fail" them right away
+        self.CIRCUIT_BREAKER_OPEN_ACTION = os.getenv(
+            "CIRCUIT_BREAKER_OPEN_ACTION", "defer"
+        )
+
+        self.HISTORY_ENABLED = os.getenv(
+            "HISTORY_ENABLED", "true"
+        ).lower() in ("1", "true", "yes")
+        self.HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "500"))
+        self.HISTORY_FLUSH_INTERVAL = float(
+            os.getenv("HISTORY_FLUSH_INTERVAL", "1")
+        )
+        self.HISTORY_MAX_BUFFER = int(
+            os.getenv("HISTORY_MAX_BUFFER", "100000")
+        )
+        self.HISTORY_RETENTION_DAYS = float(
+            os.getenv("HISTORY_RETENTION_DAYS", "30")
+        )
+        self.HISTORY_PRUNE_INTERVAL = float(
+            os.getenv("HISTORY_PRUNE_INTERVAL", "3600")
+        )
+
+        # Seconds an idempotency key is remembered after its job was created
+        self.IDEMPOTENCY_KEY_TTL = float(
+            os.getenv("IDEMPOTENCY_KEY_TTL", "86400")
+        )
+        self.IDEMPOTENCY_KEY_PRUNE_INTERVAL = float(
+            os.getenv("IDEMPOTENCY_KEY_PRUNE_INTERVAL", "3600")
+        )
+
+        self.TEMPLATE_CACHE_SIZE = int(
+            os.getenv("TEMPLATE_CACHE_SIZE", "10000")
+        )
+        self.TEMPLATE_PRUNE_INTERVAL = float(
+            os.getenv("TEMPLATE_PRUNE_INTERVAL", "3600")
+        )
+
+        self.HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+        self.HTTP_POOL_LIMIT_PER_HOST = int(
+            os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20")
+        )
+        self.HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+        self.HTTP_KEEPALIVE_TIMEOUT = float(
+            os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30")
+        )
+        # Discarded response bodies up to this size are drained to reuse the
+        # connection, the connection of larger ones is closed instead
+        self.HTTP_DRAIN_MAX_BYTES = int(
+            os.getenv("HTTP_DRAIN_MAX_BYTES", "65536")
+        )
 
-        self._REQUIRED_ENV_VARS = [
+        self._REQUIRED_ENV_VARS = ["API_TOKEN", "TIMEZONE"]
+        # Only needed to connect without DATABASE_URL
+        self._DB_ENV_VARS = [
             "DB_SCHEMA",
-            "DB_SCHEMA_APSCHEDULER",
             "DB_HOST",
             "DB_PORT",
             "DB_NAME",
             "DB_USER",
             "DB_PASSWORD",
-            "API_TOKEN",
-            "TIMEZONE",
         ]
+        if self.DATABASE_URL is None:
+            self._REQUIRED_ENV_VARS += self._DB_ENV_VARS
 
         for env_var in self._REQUIRED_ENV_VARS:
             if self.__dict__[env_var] is None:
-                raise ValueError(f"Missing environment variable: {env_var}")
+                raise ValueError(
+                    f"Missing environment variable: {env_var}"
+                    + (
+                        " (or set DATABASE_URL)"
+                        if env_var in self._DB_ENV_VARS
+                        else ""
+                    )
+                )
 
 
 settings = Settings()
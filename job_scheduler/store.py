@@ -0,0 +1,1035 @@
+import json
+import pickle
+import time
+import uuid
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Set, Text, Tuple
+
+import pydantic
+from apscheduler.triggers.base import BaseTrigger  # type: ignore
+from apscheduler.util import (  # type: ignore
+    convert_to_datetime,
+    datetime_to_utc_timestamp,
+    utc_timestamp_to_datetime,
+)
+from loguru import logger
+from sqlalchemy import and_, false, func, inspect, literal, or_, select, true
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from job_scheduler.models import (
+    HTTPJobData,
+    Job,
+    JobAction,
+    JobSchedule,
+    RetryPolicy,
+    RunnableJob,
+)
+from job_scheduler.tables import (
+    create_or_upgrade_tables,
+    dialect_insert,
+    idempotency_keys_t,
+    jobs_t,
+    legacy_jobs_t,
+)
+from job_scheduler.templates import ActionTemplate, TemplateRegistry
+
+
+class StoredJob:
+    def __init__(
+        self,
+        job: RunnableJob,
+        next_run_time: Optional[datetime],
+        trigger: Optional[BaseTrigger] = None,
+        misfire_grace_time: Optional[int] = None,
+        coalesce: bool = False,
+        max_instances: int = 1,
+        paused: bool = False,
+        lease_token: Optional[str] = None,
+        claimed_run_time: Optional[float] = None,
+    ) -> None:
+        self.job = job
+        self.next_run_time = next_run_time
+        # One-shot jobs have no trigger, they run once at next_run_time.
+        self.trigger = trigger
+        self.misfire_grace_time = misfire_grace_time
+        self.coalesce = coalesce
+        self.max_instances = max_instances
+        self.paused = paused
+        # Token of the claim that leased the job and the stored next run
+        # time it was claimed at, see claim_due_jobs()
+        self.lease_token = lease_token
+        self.claimed_run_time = claimed_run_time
+
+    @property
+    def id(self) -> str:
+        return self.job.uuid
+
+    def __str__(self) -> str:
+        return f"StoredJob<{self.id}, {self.trigger}, {self.next_run_time}>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def get_next_fire_time(
+        self, previous_fire_time: datetime, now: datetime
+    ) -> Optional[datetime]:
+        if self.trigger is None:
+            return None
+        return self.trigger.get_next_fire_time(previous_fire_time, now)
+
+    def get_run_times(self, now: datetime) -> List[datetime]:
+        run_times = []
+        next_run_time = self.next_run_time
+
+        while next_run_time and next_run_time <= now:
+            run_times.append(next_run_time)
+            next_run_time = self.get_next_fire_time(next_run_time, now)
+
+        return run_times
+
+
+def _model_to_dict(value: Any) -> Any:
+    if isinstance(value, pydantic.BaseModel):
+        return {
+            key: _model_to_dict(field_value)
+            for key, field_value in value.__dict__.items()
+        }
+    return value
+
+
+def _load_inline_action(
+    data: Optional[Dict[Text, Any]]
+) -> Optional[JobAction]:
+    # Jobs stored before action templates existed keep their actions inline
+    # in the payload.
+    if data is None:
+        return None
+    http = data.get("http")
+    return JobAction.model_construct(
+        http=HTTPJobData.model_construct(**http) if http else None
+    )
+
+
+def _load_action(
+    template_hash: Optional[str],
+    inline_data: Optional[Dict[Text, Any]],
+    templates: Dict[str, ActionTemplate],
+) -> Optional[JobAction]:
+    if template_hash is not None:
+        return templates[template_hash].action
+    return _load_inline_action(inline_data)
+
+
+_schedule_adapter: pydantic.TypeAdapter = pydantic.TypeAdapter(JobSchedule)
+
+
+@lru_cache(maxsize=10000)
+def load_schedule(
+    payload: Text, timezone: tzinfo
+) -> Tuple[JobSchedule, BaseTrigger]:
+    """Returns the schedule and its trigger from their stored JSON.
+
+    Triggers are immutable, so all jobs with the same schedule share one.
+    """
+    schedule = _schedule_adapter.validate_json(payload)
+    return schedule, schedule.build_trigger(timezone)
+
+
+def _dump_payload(job: Job) -> Text:
+    payload: Dict[Text, Any] = {}
+    if job.retry is not None:
+        payload["r"] = job.retry.model_dump(exclude_defaults=True)
+    if job.schedule is not None:
+        payload["t"] = job.schedule.model_dump(mode="json", exclude_none=True)
+    if job.idempotency_key is not None:
+        payload["k"] = job.idempotency_key
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True)
+
+
+def row_to_job(
+    row: Any, timezone: tzinfo, templates: Dict[str, ActionTemplate]
+) -> StoredJob:
+    # The job was validated when it was created, so the models are built
+    # without running pydantic validation again. Actions are the shared
+    # instances of the cached templates.
+    payload = json.loads(row.payload)
+
+    schedule, trigger = None, None
+    if "t" in payload:
+        schedule, trigger = load_schedule(
+            json.dumps(payload["t"], separators=(",", ":"), sort_keys=True),
+            timezone,
+        )
+
+    job = Job.model_construct(
+        name=row.name,
+        category=row.category,
+        run_at=datetime.fromtimestamp(row.run_at, timezone),
+        action=_load_action(row.action_template, payload.get("a"), templates),
+        on_success=_load_action(
+            row.on_success_template, payload.get("s"), templates
+        ),
+        on_failure=_load_action(
+            row.on_failure_template, payload.get("f"), templates
+        ),
+        retry=(
+            RetryPolicy.model_construct(**payload["r"])
+            if "r" in payload
+            else None
+        ),
+        schedule=schedule,
+        idempotency_key=payload.get("k"),
+        priority=row.priority,
+    )
+    return StoredJob(
+        job=RunnableJob.model_construct(
+            job=job, uuid=row.uuid, attempt=row.attempt
+        ),
+        next_run_time=(
+            datetime.fromtimestamp(row.next_run_time, timezone)
+            if row.next_run_time is not None
+            else None
+        ),
+        paused=row.paused,
+        **schedule_options(schedule, trigger),
+    )
+
+
+def schedule_options(
+    schedule: Optional[JobSchedule], trigger: Optional[BaseTrigger]
+) -> Dict[Text, Any]:
+    """Returns the StoredJob arguments for a job's schedule."""
+    if schedule is None:
+        return {}
+    return {
+        "trigger": trigger,
+        "coalesce": schedule.coalesce,
+        "max_instances": schedule.max_instances,
+        "misfire_grace_time": schedule.misfire_grace_time,
+    }
+
+
+class AsyncJobStore:
+    """Job store on an async SQLAlchemy engine.
+
+    Jobs are stored with a fixed schema: the fields used for lookups and
+    filtering are indexed columns, the actions references to action
+    templates and everything else a compact JSON payload.
+
+    Several nodes can share the store. Due jobs are claimed with a lease of
+    ``lease_duration`` seconds under the ``node_id``, other nodes skip them
+    until the claiming node completes them or the lease expires. Every
+    claim has a random lease token, so a node only completes the jobs of
+    its own claims.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        timezone: tzinfo,
+        templates: TemplateRegistry,
+        node_id: str = "default",
+        lease_duration: float = 30,
+    ) -> None:
+        self.engine = engine
+        self.timezone = timezone
+        self.templates = templates
+        self.node_id = node_id
+        self.lease_duration = lease_duration
+
+    async def start(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.run_sync(create_or_upgrade_tables)
+
+        await self.migrate_legacy_jobs()
+
+    async def migrate_legacy_jobs(self, batch_size: int = 1000) -> int:
+        """Moves pickled jobs from APScheduler's table into this store.
+
+        Every batch is copied and deleted in its own transaction, so the
+        migration can be interrupted and resumed.
+        """
+        async with self.engine.begin() as conn:
+            has_legacy_table = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).has_table(
+                    legacy_jobs_t.name
+                )
+            )
+        if not has_legacy_table:
+            return 0
+
+        num_jobs = 0
+        while True:
+            async with self.engine.begin() as conn:
+                rows = (
+                    await conn.execute(
+                        select(
+                            legacy_jobs_t.c.id, legacy_jobs_t.c.job_state
+                        ).limit(batch_size)
+                    )
+                ).all()
+                if not rows:
+                    break
+
+                jobs = []
+                for row in rows:
+                    try:
+                        jobs.append(self._load_legacy_job(row.job_state))
+                    except Exception:
+                        logger.exception(
+                            f"Unable to migrate job {row.id} -- removing it"
+                        )
+                new_rows = await self._write_templates(conn, jobs)
+
+                if new_rows:
+                    existing = set(
+                        (
+                            await conn.execute(
+                                select(jobs_t.c.uuid).where(
+                                    jobs_t.c.uuid.in_(
+                                        [row["uuid"] for row in new_rows]
+                                    )
+                                )
+                            )
+                        ).scalars()
+                    )
+                    new_rows = [
+                        row for row in new_rows if row["uuid"] not in existing
+                    ]
+                if new_rows:
+                    await conn.execute(jobs_t.insert(), new_rows)
+
+                await conn.execute(
+                    legacy_jobs_t.delete().where(
+                        legacy_jobs_t.c.id.in_([row.id for row in rows])
+                    )
+                )
+                num_jobs += len(new_rows)
+
+        if num_jobs:
+            logger.info(f"Migrated {num_jobs} pickled jobs to the job store.")
+        return num_jobs
+
+    @staticmethod
+    def _load_legacy_job(job_state: bytes) -> StoredJob:
+        state = pickle.loads(job_state)
+        # The bound JobRunner instance is pickled as the first positional
+        # argument, so the RunnableJob is the last one. It was pickled with
+        # an older version of the models, so it is validated again from its
+        # plain field values.
+        return StoredJob(
+            job=RunnableJob.model_validate(_model_to_dict(state["args"][-1])),
+            next_run_time=state["next_run_time"],
+        )
+
+    async def _write_templates(
+        self, conn: AsyncConnection, jobs: Sequence[StoredJob]
+    ) -> List[Dict[Text, Any]]:
+        """Stores the action templates of the jobs and returns the job rows.
+
+        Actions referencing a named template are resolved to it, all other
+        actions are deduplicated into anonymous templates.
+        """
+        named_templates = await self.templates.get_named(
+            conn,
+            (
+                action.template
+                for job in jobs
+                for action in (
+                    job.job.job.action,
+                    job.job.job.on_success,
+                    job.job.job.on_failure,
+                )
+                if action is not None and action.template
+            ),
+        )
+
+        templates: Dict[str, ActionTemplate] = {}
+        used_named_templates: Dict[str, ActionTemplate] = {}
+
+        def template_hash(action: Optional[JobAction]) -> Optional[str]:
+            if action is None:
+                return None
+
+            if action.template:
+                if action.template not in named_templates:
+                    raise ValueError(
+                        f"Unknown action template: {action.template}"
+                    )
+                template = named_templates[action.template]
+                used_named_templates[template.hash] = template
+            else:
+                template = self.templates.intern(action)
+                templates[template.hash] = template
+
+            return template.hash
+
+        rows = [
+            {
+                "uuid": job.id,
+                "category": job.job.job.category,
+                "name": job.job.job.name,
+                "run_at": datetime_to_utc_timestamp(
+                    convert_to_datetime(
+                        job.job.job.run_at, self.timezone, "run_at"
+                    )
+                ),
+                "next_run_time": datetime_to_utc_timestamp(job.next_run_time),
+                "payload": _dump_payload(job.job.job),
+                "action_template": template_hash(job.job.job.action),
+                "on_success_template": template_hash(job.job.job.on_success),
+                "on_failure_template": template_hash(job.job.job.on_failure),
+                "attempt": job.job.attempt,
+                "paused": job.paused,
+                "priority": job.job.job.priority,
+            }
+            for job in jobs
+        ]
+
+        await self.templates.save(conn, templates.values())
+        # The named templates may be renamed and pruned meanwhile
+        await self.templates.touch(conn, used_named_templates.values())
+        return rows
+
+    async def _load_rows(
+        self, conn: AsyncConnection, rows: Sequence[Any]
+    ) -> List[StoredJob]:
+        jobs = []
+        failed_job_ids = set()
+
+        template_hashes: Set[str] = set()
+        for row in rows:
+            template_hashes.update(
+                template_hash
+                for template_hash in (
+                    row.action_template,
+                    row.on_success_template,
+                    row.on_failure_template,
+                )
+                if template_hash is not None
+            )
+        templates = await self.templates.load(conn, template_hashes)
+
+        for row in rows:
+            missing_hashes = [
+                template_hash
+                for template_hash in (
+                    row.action_template,
+                    row.on_success_template,
+                    row.on_failure_template,
+                )
+                if template_hash is not None and template_hash not in templates
+            ]
+            if missing_hashes:
+                # Kept, storing the same template again restores the job
+                logger.error(
+                    f"Action templates {', '.join(missing_hashes)} of job "
+                    f"{row.uuid} are missing -- skipping the job"
+                )
+                continue
+
+            try:
+                jobs.append(row_to_job(row, self.timezone, templates))
+            except Exception:
+                logger.exception(
+                    f"Unable to restore job {row.uuid} -- removing it"
+                )
+                failed_job_ids.add(row.uuid)
+
+        if failed_job_ids:
+            await conn.execute(
+                jobs_t.delete().where(jobs_t.c.uuid.in_(failed_job_ids))
+            )
+
+        return jobs
+
+    async def add_jobs(
+        self, jobs: Sequence[StoredJob], batch_size: int = 1000
+    ) -> List[str]:
+        """Stores jobs and returns the uuid of every job.
+
+        A job with an idempotency key that was used before is not stored,
+        the uuid of the job created with the key is returned instead.
+        """
+        async with self.engine.begin() as conn:
+            job_uuids = await self._claim_idempotency_keys(
+                conn, jobs, batch_size
+            )
+            new_jobs = [
+                job
+                for job, job_uuid in zip(jobs, job_uuids)
+                if job_uuid == job.id
+            ]
+
+            rows = await self._write_templates(conn, new_jobs)
+            for i in range(0, len(rows), batch_size):
+                await conn.execute(jobs_t.insert(), rows[i : i + batch_size])
+
+        return job_uuids
+
+    async def _claim_idempotency_keys(
+        self,
+        conn: AsyncConnection,
+        jobs: Sequence[StoredJob],
+        batch_size: int,
+    ) -> List[str]:
+        # The first job with a key claims it, within the batch as well.
+        claims: Dict[str, str] = {}
+        for job in jobs:
+            key = job.job.job.idempotency_key
+            if key is not None:
+                claims.setdefault(key, job.id)
+        if not claims:
+            return [job.id for job in jobs]
+
+        now = time.time()
+        keys = list(claims)
+        owners: Dict[str, str] = {}
+        for i in range(0, len(keys), batch_size):
+            batch = keys[i : i + batch_size]
+            # Concurrent claims of a key wait for each other on the primary
+            # key, the losing insert does nothing.
+            await conn.execute(
+                dialect_insert(
+                    conn, idempotency_keys_t
+                ).on_conflict_do_nothing(
+                    index_elements=[idempotency_keys_t.c.key]
+                ),
+                [
+                    {"key": key, "job_uuid": claims[key], "created_at": now}
+                    for key in batch
+                ],
+            )
+            owners.update(
+                (
+                    await conn.execute(
+                        select(
+                            idempotency_keys_t.c.key,
+                            idempotency_keys_t.c.job_uuid,
+                        ).where(idempotency_keys_t.c.key.in_(batch))
+                    )
+                ).all()
+            )
+
+        return [
+            owners[job.job.job.idempotency_key]
+            if job.job.job.idempotency_key is not None
+            else job.id
+            for job in jobs
+        ]
+
+    async def prune_idempotency_keys(self, max_age: float) -> int:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                idempotency_keys_t.delete().where(
+                    idempotency_keys_t.c.created_at < time.time() - max_age
+                )
+            )
+            return result.rowcount
+
+    async def lookup_job(self, job_id: str) -> Optional[StoredJob]:
+        async with self.engine.begin() as conn:
+            rows = (
+                await conn.execute(
+                    select(jobs_t).where(jobs_t.c.uuid == job_id)
+                )
+            ).all()
+            jobs = await self._load_rows(conn, rows)
+
+        return jobs[0] if jobs else None
+
+    @staticmethod
+    def _unclaimed(now: float) -> Any:
+        return or_(
+            jobs_t.c.locked_until.is_(None), jobs_t.c.locked_until < now
+        )
+
+    async def claim_due_jobs(
+        self,
+        now: datetime,
+        limit: int,
+        job_ids: Optional[Sequence[str]] = None,
+        due_after: Optional[datetime] = None,
+    ) -> List[StoredJob]:
+        """Leases up to ``limit`` due jobs to this node and returns them,
+        the ones with the highest priority first.
+
+        ``job_ids`` restricts the claim to these jobs, ``due_after`` to the
+        jobs that were due after that time. Claimed jobs must be passed to
+        complete_jobs() once their next run time is known.
+        """
+        timestamp = time.time()
+        lease_token = uuid.uuid4().hex
+
+        conditions = [
+            jobs_t.c.paused == false(),
+            jobs_t.c.next_run_time <= datetime_to_utc_timestamp(now),
+            self._unclaimed(timestamp),
+        ]
+        if job_ids is not None:
+            conditions.append(jobs_t.c.uuid.in_(job_ids))
+        if due_after is not None:
+            conditions.append(
+                jobs_t.c.next_run_time > datetime_to_utc_timestamp(due_after)
+            )
+
+        async with self.engine.begin() as conn:
+            due_uuids = (
+                select(jobs_t.c.uuid)
+                .where(*conditions)
+                .order_by(jobs_t.c.priority.desc(), jobs_t.c.next_run_time)
+                .limit(limit)
+            )
+            # Nodes claiming at the same time skip each other's rows instead
+            # of waiting for them. SQLite serializes writers anyway.
+            if conn.dialect.name == "postgresql":
+                due_uuids = due_uuids.with_for_update(skip_locked=True)
+
+            claim = (
+                jobs_t.update()
+                .where(
+                    jobs_t.c.uuid.in_(due_uuids.scalar_subquery()),
+                    self._unclaimed(timestamp),
+                )
+                .values(
+                    locked_by=self.node_id,
+                    locked_until=timestamp + self.lease_duration,
+                    lease_token=lease_token,
+                )
+            )
+            if conn.dialect.update_returning:
+                rows = (await conn.execute(claim.returning(*jobs_t.c))).all()
+                rows.sort(key=lambda row: (-row.priority, row.next_run_time))
+            else:
+                await conn.execute(claim)
+                rows = (
+                    await conn.execute(
+                        select(jobs_t)
+                        .where(jobs_t.c.lease_token == lease_token)
+                        .order_by(
+                            jobs_t.c.priority.desc(), jobs_t.c.next_run_time
+                        )
+                    )
+                ).all()
+            jobs = await self._load_rows(conn, rows)
+
+        run_times = {row.uuid: row.next_run_time for row in rows}
+        for job in jobs:
+            job.lease_token = lease_token
+            job.claimed_run_time = run_times[job.id]
+        return jobs
+
+    async def complete_jobs(
+        self,
+        updated_jobs: Sequence[StoredJob],
+        removed_jobs: Sequence[StoredJob],
+        held_jobs: Sequence[StoredJob] = (),
+    ) -> Set[str]:
+        """Stores the next run times of claimed jobs and releases them.
+
+        Exhausted jobs are removed. The jobs in ``held_jobs`` have runs left
+        to finish before they are removed, their lease is extended instead
+        and they stay claimed until finish_jobs() or release_jobs().
+        Returns the ids of the jobs that were still claimed by this node,
+        the others have been taken over by another node after the lease
+        expired and must not run here.
+
+        Jobs shifted since they were claimed keep the shift: the next run
+        time of recurring jobs moves by as much, exhausted jobs are kept.
+        Recurring jobs store their next run time as ``run_at`` as well.
+        """
+        completed_job_ids: Set[str] = set()
+        if not updated_jobs and not removed_jobs and not held_jobs:
+            return completed_job_ids
+
+        async with self.engine.begin() as conn:
+            for job in updated_jobs:
+                next_run_time: Any = datetime_to_utc_timestamp(
+                    job.next_run_time
+                )
+                if job.claimed_run_time is not None:
+                    next_run_time = literal(next_run_time) + (
+                        jobs_t.c.next_run_time - job.claimed_run_time
+                    )
+                values: Dict[Text, Any] = {"next_run_time": next_run_time}
+                if job.trigger is not None:
+                    values["run_at"] = next_run_time
+
+                result = await conn.execute(
+                    jobs_t.update()
+                    .values(
+                        **values,
+                        locked_by=None,
+                        locked_until=None,
+                        lease_token=None,
+                    )
+                    .where(
+                        jobs_t.c.uuid == job.id,
+                        jobs_t.c.lease_token == job.lease_token,
+                    )
+                )
+                if result.rowcount:
+                    completed_job_ids.add(job.id)
+
+            if removed_jobs:
+                completed_job_ids.update(
+                    await self._remove_unshifted(
+                        conn,
+                        [
+                            (job.id, job.lease_token, job.claimed_run_time)
+                            for job in removed_jobs
+                        ],
+                    )
+                )
+
+            if held_jobs:
+                completed_job_ids.update(
+                    (
+                        await conn.execute(
+                            jobs_t.update()
+                            .values(
+                                locked_until=time.time() + self.lease_duration
+                            )
+                            .where(self._leased_by(held_jobs))
+                            .returning(jobs_t.c.uuid)
+                        )
+                    ).scalars()
+                )
+
+        return completed_job_ids
+
+    @staticmethod
+    def _leased_by(jobs: Sequence[Any]) -> Any:
+        """Matches the rows of jobs under the lease of their own claim.
+
+        Takes StoredJobs or (job id, lease token) pairs. Tokens are unique
+        per claim, a job only matches the token of the claim that leased it.
+        """
+        pairs = [
+            (job.id, job.lease_token) if isinstance(job, StoredJob) else job
+            for job in jobs
+        ]
+        return and_(
+            jobs_t.c.uuid.in_([job_id for job_id, _ in pairs]),
+            jobs_t.c.lease_token.in_({token for _, token in pairs}),
+        )
+
+    async def renew_leases(self, lease_tokens: Set[str]) -> int:
+        """Extends the leases of held jobs, returns the number of jobs."""
+        if not lease_tokens:
+            return 0
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                jobs_t.update()
+                .values(locked_until=time.time() + self.lease_duration)
+                .where(jobs_t.c.lease_token.in_(lease_tokens))
+            )
+            return result.rowcount
+
+    async def finish_jobs(
+        self, leases: Sequence[Tuple[str, str, Optional[float]]]
+    ) -> int:
+        """Removes held jobs whose runs are done.
+
+        ``leases`` are (job id, lease token, claimed run time) tuples, see
+        StoredJob. Jobs that were released or rescheduled meanwhile are
+        kept, jobs that were shifted are kept and released.
+        """
+        if not leases:
+            return 0
+        async with self.engine.begin() as conn:
+            return len(await self._remove_unshifted(conn, leases))
+
+    async def _remove_unshifted(
+        self,
+        conn: AsyncConnection,
+        leases: Sequence[Tuple[str, str, Optional[float]]],
+    ) -> List[str]:
+        """Removes the leased jobs still due at their claimed run time and
+        releases the others. Returns the ids of both.
+        """
+        pairs = [(job_id, token) for job_id, token, _ in leases]
+        run_times = {job_id: run_time for job_id, _, run_time in leases}
+        rows = await conn.execute(
+            select(jobs_t.c.uuid, jobs_t.c.next_run_time)
+            .where(self._leased_by(pairs))
+            .with_for_update()
+        )
+        job_ids, shifted_job_ids = [], []
+        for job_id, next_run_time in rows:
+            job_ids.append(job_id)
+            if run_times[job_id] not in (None, next_run_time):
+                shifted_job_ids.append(job_id)
+
+        if shifted_job_ids:
+            await conn.execute(
+                jobs_t.update()
+                .values(locked_by=None, locked_until=None, lease_token=None)
+                .where(jobs_t.c.uuid.in_(shifted_job_ids))
+            )
+        removed_job_ids = set(job_ids) - set(shifted_job_ids)
+        if removed_job_ids:
+            await conn.execute(
+                jobs_t.delete().where(jobs_t.c.uuid.in_(removed_job_ids))
+            )
+        return job_ids
+
+    async def release_jobs(self, leases: Sequence[Tuple[str, str]]) -> int:
+        """Releases held jobs whose runs were not done.
+
+        They are due again, so any node runs them as soon as it claims.
+        """
+        if not leases:
+            return 0
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                jobs_t.update()
+                .values(locked_by=None, locked_until=None, lease_token=None)
+                .where(self._leased_by(leases))
+            )
+            return result.rowcount
+
+    async def reschedule_job(self, job: StoredJob) -> bool:
+        """Moves the next run time and attempt of a stored job.
+
+        Recurring jobs store it as ``run_at`` as well. The job is released
+        from any lease. Returns False if the job is not stored.
+        """
+        next_run_time = datetime_to_utc_timestamp(job.next_run_time)
+        values: Dict[Text, Any] = {"next_run_time": next_run_time}
+        if job.trigger is not None:
+            values["run_at"] = next_run_time
+
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                jobs_t.update()
+                .values(
+                    **values,
+                    attempt=job.job.attempt,
+                    locked_by=None,
+                    locked_until=None,
+                    lease_token=None,
+                )
+                .where(jobs_t.c.uuid == job.id)
+            )
+            return bool(result.rowcount)
+
+    async def get_next_run_time(
+        self, due_after: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """Returns the earliest time a job may be claimed.
+
+        Jobs under a lease count as due when the lease expires, so the jobs
+        of a node that died are taken over without waiting for a poll.
+        ``due_after`` leaves out the jobs due at or before that time.
+        """
+        timestamp = time.time()
+        conditions = [
+            jobs_t.c.paused == false(),
+            jobs_t.c.next_run_time.is_not(None),
+            self._unclaimed(timestamp),
+        ]
+        if due_after is not None:
+            conditions.append(
+                jobs_t.c.next_run_time > datetime_to_utc_timestamp(due_after)
+            )
+        async with self.engine.begin() as conn:
+            next_run_time = (
+                await conn.execute(
+                    select(func.min(jobs_t.c.next_run_time)).where(*conditions)
+                )
+            ).scalar()
+            lease_expiry = (
+                await conn.execute(
+                    select(func.min(jobs_t.c.locked_until)).where(
+                        jobs_t.c.locked_until >= timestamp
+                    )
+                )
+            ).scalar()
+
+        if next_run_time is None or (
+            lease_expiry is not None and lease_expiry < next_run_time
+        ):
+            next_run_time = lease_expiry
+        return utc_timestamp_to_datetime(next_run_time)
+
+    async def get_backlog(
+        self, due_before: datetime
+    ) -> Tuple[int, Optional[datetime]]:
+        """Returns the number of active jobs that were due before
+        ``due_before`` and the earliest of their run times.
+        """
+        async with self.engine.begin() as conn:
+            num_jobs, next_run_time = (
+                await conn.execute(
+                    select(
+                        func.count(), func.min(jobs_t.c.next_run_time)
+                    ).where(
+                        jobs_t.c.paused == false(),
+                        jobs_t.c.next_run_time
+                        <= datetime_to_utc_timestamp(due_before),
+                    )
+                )
+            ).one()
+
+        return num_jobs, utc_timestamp_to_datetime(next_run_time)
+
+    async def get_run_times(
+        self,
+        until: float,
+        after: Optional[Tuple[float, str]] = None,
+        limit: int = 10000,
+    ) -> List[Tuple[float, str]]:
+        """Returns the (next_run_time, uuid) keys of active jobs due before
+        ``until``, ordered and paged like get_jobs().
+        """
+        conditions = [
+            jobs_t.c.paused == false(),
+            jobs_t.c.next_run_time < until,
+        ]
+        if after is not None:
+            conditions.append(
+                or_(
+                    jobs_t.c.next_run_time > after[0],
+                    and_(
+                        jobs_t.c.next_run_time == after[0],
+                        jobs_t.c.uuid > after[1],
+                    ),
+                )
+            )
+
+        async with self.engine.begin() as conn:
+            rows = (
+                await conn.execute(
+                    select(jobs_t.c.next_run_time, jobs_t.c.uuid)
+                    .where(and_(*conditions))
+                    .order_by(jobs_t.c.next_run_time, jobs_t.c.uuid)
+                    .limit(limit)
+                )
+            ).all()
+            return [(row.next_run_time, row.uuid) for row in rows]
+
+    async def get_jobs(
+        self,
+        after: Optional[Tuple[float, str]] = None,
+        category: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        run_at_from: Optional[float] = None,
+        run_at_to: Optional[float] = None,
+        paused: Optional[bool] = None,
+        limit: int = 500,
+    ) -> List[StoredJob]:
+        """Returns up to ``limit`` jobs ordered by (next_run_time, uuid).
+
+        ``after`` is the (next_run_time, uuid) key of the last job of the
+        previous chunk.
+        """
+        conditions = [
+            jobs_t.c.next_run_time.is_not(None),
+            *self._selection_conditions(
+                category, name_prefix, run_at_from, run_at_to, paused
+            ),
+        ]
+
+        if after is not None:
+            conditions.append(
+                or_(
+                    jobs_t.c.next_run_time > after[0],
+                    and_(
+                        jobs_t.c.next_run_time == after[0],
+                        jobs_t.c.uuid > after[1],
+                    ),
+                )
+            )
+
+        async with self.engine.begin() as conn:
+            rows = (
+                await conn.execute(
+                    select(jobs_t)
+                    .where(and_(*conditions))
+                    .order_by(jobs_t.c.next_run_time, jobs_t.c.uuid)
+                    .limit(limit)
+                )
+            ).all()
+            return await self._load_rows(conn, rows)
+
+    @staticmethod
+    def _selection_conditions(
+        category: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        run_at_from: Optional[float] = None,
+        run_at_to: Optional[float] = None,
+        paused: Optional[bool] = None,
+    ) -> List[Any]:
+        conditions = []
+        if category is not None:
+            conditions.append(jobs_t.c.category == category)
+        if name_prefix:
+            conditions.append(
+                jobs_t.c.name.startswith(name_prefix, autoescape=True)
+            )
+        if run_at_from is not None:
+            conditions.append(jobs_t.c.run_at >= run_at_from)
+        if run_at_to is not None:
+            conditions.append(jobs_t.c.run_at < run_at_to)
+        if paused is not None:
+            conditions.append(jobs_t.c.paused == paused)
+        return conditions
+
+    async def update_selected_jobs(
+        self, values: Dict[Text, Any], **selection: Any
+    ) -> int:
+        """Updates all jobs matching the selection in one statement.
+
+        The selection takes the filters of get_jobs(), returns the number
+        of updated jobs.
+        """
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                jobs_t.update()
+                .values(**values)
+                .where(and_(true(), *self._selection_conditions(**selection)))
+            )
+            return result.rowcount
+
+    async def shift_selected_jobs(
+        self, seconds: float, **selection: Any
+    ) -> int:
+        return await self.update_selected_jobs(
+            {
+                "run_at": jobs_t.c.run_at + seconds,
+                "next_run_time": jobs_t.c.next_run_time + seconds,
+            },
+            **selection,
+        )
+
+    async def remove_selected_jobs(self, **selection: Any) -> int:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                jobs_t.delete().where(
+                    and_(true(), *self._selection_conditions(**selection))
+                )
+            )
+            return result.rowcount
+
+    async def count_jobs(self) -> int:
+        async with self.engine.begin() as conn:
+            return (
+                await conn.execute(select(func.count()).select_from(jobs_t))
+            ).scalar_one()
+
+    async def remove_jobs(self, job_ids: Sequence[str]) -> int:
+        if not job_ids:
+            return 0
+
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                jobs_t.delete().where(jobs_t.c.uuid.in_(job_ids))
+            )
+            return result.rowcount
+
+    async def remove_all_jobs(self) -> int:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(jobs_t.delete())
+            return result.rowcount
@@ -0,0 +1,189 @@
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Float,
+    Index,
+    Integer,
+    LargeBinary,
+    MetaData,
+    SmallInteger,
+    String,
+    Table,
+    Text,
+    Unicode,
+    false,
+    inspect,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+metadata = MetaData()
+
+jobs_t = Table(
+    "scheduled_jobs",
+    metadata,
+    Column("uuid", String(36), primary_key=True),
+    Column("category", Unicode(255), index=True),
+    Column("name", Unicode(255), nullable=False, index=True),
+    Column("run_at", Float(25), nullable=False, index=True),
+    Column("next_run_time", Float(25), index=True),
+    Column("payload", Text, nullable=False),
+    Column("action_template", String(32), index=True),
+    Column("on_success_template", String(32), index=True),
+    Column("on_failure_template", String(32), index=True),
+    Column("attempt", Integer, nullable=False, server_default="1"),
+    Column("paused", Boolean, nullable=False, server_default=false()),
+    Column("priority", SmallInteger, nullable=False, server_default="0"),
+    # Node that claimed the due job and until when (UTC timestamp), so
+    # several scheduler nodes can share the table
+    Column("locked_by", Unicode(255)),
+    Column("locked_until", Float(25), index=True),
+    # Random token of the claim, identifies the rows it leased
+    Column("lease_token", String(32)),
+    # Due jobs are looked up among the jobs that are not paused
+    Index("ix_scheduled_jobs_paused_next_run_time", "paused", "next_run_time"),
+)
+
+action_templates_t = Table(
+    "action_templates",
+    metadata,
+    Column("hash", String(32), primary_key=True),
+    Column("name", Unicode(255), unique=True),
+    Column("payload", Text, nullable=False),
+    Column("touched_at", Float(25), nullable=False),
+)
+
+# Idempotency keys of created jobs. They outlive the one-shot jobs they
+# created, so a retried request is deduplicated even after the job ran.
+idempotency_keys_t = Table(
+    "idempotency_keys",
+    metadata,
+    Column("key", Unicode(255), primary_key=True),
+    Column("job_uuid", String(36), nullable=False),
+    Column("created_at", Float(25), nullable=False, index=True),
+)
+
+job_executions_t = Table(
+    "job_executions",
+    metadata,
+    Column(
+        "id",
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    ),
+    Column("job_uuid", String(36), nullable=False, index=True),
+    Column("category", Unicode(255)),
+    Column("name", Unicode(255), nullable=False),
+    Column("attempt", Integer, nullable=False),
+    # Scheduled run time, actual start and duration of the run
+    Column("scheduled_at", Float(25)),
+    Column("started_at", Float(25), nullable=False, index=True),
+    Column("duration", Float(25), nullable=False),
+    # success, failure, retry or deferred
+    Column("outcome", String(16), nullable=False),
+    Column("status", Integer),
+    Column("error", Text),
+    # Excerpt of the response body, see HTTPJobData.response_mode
+    Column("response", Text),
+    # Outcome of the on_success or on_failure action, if the job has one:
+    # success, failure or batched (see JobAction.batch)
+    Column("follow_up_outcome", String(16)),
+    Index("ix_job_executions_category_started_at", "category", "started_at"),
+)
+
+# Table of APScheduler's SQLAlchemyJobStore, only read to migrate its pickled
+# jobs (see AsyncJobStore.migrate_legacy_jobs).
+legacy_jobs_t = Table(
+    "apscheduler_jobs",
+    MetaData(),
+    Column("id", Unicode(191), primary_key=True),
+    Column("next_run_time", Float(25), index=True),
+    Column("job_state", LargeBinary, nullable=False),
+)
+
+
+# Key of the PostgreSQL advisory lock taken while changing the schema
+SCHEMA_LOCK_KEY = 0x6A6F625F736368
+
+# Attempts to bring the schema up to date while other nodes change it
+SCHEMA_UPGRADE_ATTEMPTS = 5
+
+
+def create_or_upgrade_tables(conn: Any) -> None:
+    """Creates missing tables and adds missing columns and indexes.
+
+    There are no migrations, so columns added to an existing table must be
+    nullable or have a server default.
+
+    Nodes starting at the same time take turns on PostgreSQL, through an
+    advisory lock held until the transaction ends. Elsewhere a table, column
+    or index created by another node in between fails the statement, and
+    the schema is checked again.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(
+            f"SELECT pg_advisory_xact_lock({SCHEMA_LOCK_KEY})"
+        )
+        _create_or_upgrade_tables(conn)
+        return
+
+    for attempt in range(1, SCHEMA_UPGRADE_ATTEMPTS + 1):
+        try:
+            _create_or_upgrade_tables(conn)
+            return
+        except DBAPIError as exp:
+            message = str(exp.orig).lower()
+            if attempt == SCHEMA_UPGRADE_ATTEMPTS or not (
+                "already exists" in message or "duplicate column" in message
+            ):
+                raise
+            logger.info(f"Schema changed concurrently, checking again: {exp}")
+
+
+def _create_or_upgrade_tables(conn: Any) -> None:
+    metadata.create_all(conn)
+
+    inspector = inspect(conn)
+    for table in metadata.sorted_tables:
+        existing_columns = {
+            column["name"] for column in inspector.get_columns(table.name)
+        }
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            column_type = column.type.compile(dialect=conn.dialect)
+            default = ""
+            if column.server_default is not None:
+                default_value = column.server_default.arg
+                if not isinstance(default_value, str):
+                    default_value = default_value.compile(dialect=conn.dialect)
+                default = f" DEFAULT {default_value}"
+            logger.info(f"Adding column {table.name}.{column.name}")
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table.name} "
+                f"ADD COLUMN {column.name} {column_type}{default}"
+            )
+
+        existing_indexes = {
+            index["name"] for index in inspector.get_indexes(table.name)
+        }
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                logger.info(f"Creating index {index.name}")
+                conn.execute(CreateIndex(index))
+
+
+def dialect_insert(conn: Any, table: Table) -> Any:
+    """Returns an INSERT supporting ON CONFLICT clauses for the connection."""
+    if conn.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    if conn.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    raise ValueError(f"Unsupported database dialect: {conn.dialect.name}")
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Text
+
+from sqlalchemy import and_, func, not_, or_, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from job_scheduler.commands import Command
+from job_scheduler.models import HTTPJobData, JobAction
+from job_scheduler.tables import action_templates_t, dialect_insert, jobs_t
+
+
+def dump_action(action: JobAction) -> Text:
+    return json.dumps(
+        action.model_dump(exclude_defaults=True, exclude={"template"}),
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+
+def load_action(payload: Text) -> JobAction:
+    # Template payloads were validated when they were stored, so the models
+    # are built without running pydantic validation again.
+    data = json.loads(payload)
+    http = data.get("http")
+    return JobAction.model_construct(
+        http=HTTPJobData.model_construct(**http) if http else None,
+        batch=data.get("batch", False),
+    )
+
+
+class ActionTemplate:
+    """A stored, immutable job action.
+
+    Templates are addressed by a hash of their content (and name, for named
+    templates), so jobs with identical actions share one template.
+    """
+
+    def __init__(
+        self,
+        action: JobAction,
+        name: Optional[str] = None,
+        payload: Optional[Text] = None,
+    ) -> None:
+        self.action = action
+        self.name = name
+        self.payload = payload if payload is not None else dump_action(action)
+        self.hash = hashlib.sha256(
+            f"{name or ''}\0{self.payload}".encode()
+        ).hexdigest()[:32]
+
+    def __str__(self) -> str:
+        return f"ActionTemplate<{self.hash}, {self.name}>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    @property
+    def command(self) -> Command:
+        return Command.get_command(self.action)
+
+    def to_dict(self) -> Dict[Text, Any]:
+        return {
+            "name": self.name,
+            "hash": self.hash,
+            "action": self.action.dict(exclude={"template"}),
+        }
+
+
+class TemplateRegistry:
+    """Stores action templates and caches them in parsed form.
+
+    The cache is an LRU of ``cache_size`` templates. Since templates never
+    change, cached entries never go stale.
+    """
+
+    def __init__(self, engine: AsyncEngine, cache_size: int = 10000) -> None:
+        self.engine = engine
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, ActionTemplate] = OrderedDict()
+
+    def _cache_template(self, template: ActionTemplate) -> ActionTemplate:
+        cached = self._cache.get(template.hash)
+        if cached is not None:
+            self._cache.move_to_end(template.hash)
+            return cached
+
+        self._cache[template.hash] = template
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return template
+
+    def intern(self, action: JobAction) -> ActionTemplate:
+        """Returns the (cached) anonymous template for an action."""
+        return self._cache_template(ActionTemplate(action))
+
+    async def load(
+        self, conn: AsyncConnection, hashes: Iterable[str]
+    ) -> Dict[str, ActionTemplate]:
+        templates = {}
+        missing = []
+
+        for template_hash in set(hashes):
+            template = self._cache.get(template_hash)
+            if template is None:
+                missing.append(template_hash)
+            else:
+                templates[template_hash] = template
+
+        if missing:
+            rows = await conn.execute(
+                select(action_templates_t).where(
+                    action_templates_t.c.hash.in_(missing)
+                )
+            )
+            for row in rows:
+                template = self._cache_template(self._from_row(row))
+                templates[template.hash] = template
+
+        return templates
+
+    async def save(
+        self, conn: AsyncConnection, templates: Iterable[ActionTemplate]
+    ) -> None:
+        now = time.time()
+        rows = {
+            template.hash: {
+                "hash": template.hash,
+                "name": template.name,
+                "payload": template.payload,
+                "touched_at": now,
+            }
+            for template in templates
+        }
+        if not rows:
+            return
+
+        # Touching existing templates keeps prune() from removing them while
+        # the jobs referencing them are being inserted. A named template
+        # whose name was removed or moved to other content gets it back.
+        insert = dialect_insert(conn, action_templates_t)
+        await conn.execute(
+            insert.on_conflict_do_update(
+                index_elements=[action_templates_t.c.hash],
+                set_={
+                    "touched_at": insert.excluded.touched_at,
+                    "name": func.coalesce(
+                        insert.excluded.name, action_templates_t.c.name
+                    ),
+                },
+            ),
+            list(rows.values()),
+        )
+
+    async def touch(
+        self, conn: AsyncConnection, templates: Iterable[ActionTemplate]
+    ) -> None:
+        """Keeps prune() from removing templates that jobs are inserted with.
+
+        A template that was pruned since it was looked up is stored again.
+        Without its name, which may belong to another template by now.
+        """
+        rows = {
+            template.hash: {
+                "hash": template.hash,
+                "name": None,
+                "payload": template.payload,
+                "touched_at": time.time(),
+            }
+            for template in templates
+        }
+        if not rows:
+            return
+
+        insert = dialect_insert(conn, action_templates_t)
+        await conn.execute(
+            insert.on_conflict_do_update(
+                index_elements=[action_templates_t.c.hash],
+                set_={"touched_at": insert.excluded.touched_at},
+            ),
+            list(rows.values()),
+        )
+
+    async def get_named(
+        self, conn: AsyncConnection, names: Iterable[str]
+    ) -> Dict[str, ActionTemplate]:
+        names = set(names)
+        if not names:
+            return {}
+
+        rows = await conn.execute(
+            select(action_templates_t).where(
+                action_templates_t.c.name.in_(names)
+            )
+        )
+        return {
+            row.name: self._cache_template(self._from_row(row)) for row in rows
+        }
+
+    async def put_named(self, name: str, action: JobAction) -> ActionTemplate:
+        template = ActionTemplate(action, name=name)
+
+        async with self.engine.begin() as conn:
+            # Jobs keep referencing the previous version of the template by
+            # its hash, only the name moves to the new version.
+            await conn.execute(
+                action_templates_t.update()
+                .values(name=None)
+                .where(
+                    and_(
+                        action_templates_t.c.name == name,
+                        action_templates_t.c.hash != template.hash,
+                    )
+                )
+            )
+            await self.save(conn, [template])
+
+        return self._cache_template(template)
+
+    async def remove_named(self, name: str) -> bool:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                action_templates_t.update()
+                .values(name=None)
+                .where(action_templates_t.c.name == name)
+            )
+            return result.rowcount > 0
+
+    async def list_named(self) -> List[ActionTemplate]:
+        async with self.engine.begin() as conn:
+            rows = await conn.execute(
+                select(action_templates_t)
+                .where(action_templates_t.c.name.is_not(None))
+                .order_by(action_templates_t.c.name)
+            )
+            return [self._from_row(row) for row in rows]
+
+    async def prune(self, min_age: float = 3600) -> int:
+        """Removes anonymous templates that no job references anymore.
+
+        Templates used within the last ``min_age`` seconds are kept, so jobs
+        that are being inserted concurrently never lose their template.
+        """
+        hash_c = action_templates_t.c.hash
+
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                action_templates_t.delete().where(
+                    and_(
+                        action_templates_t.c.name.is_(None),
+                        action_templates_t.c.touched_at
+                        < time.time() - min_age,
+                        not_(
+                            select(jobs_t.c.uuid)
+                            .where(
+                                or_(
+                                    jobs_t.c.action_template == hash_c,
+                                    jobs_t.c.on_success_template == hash_c,
+                                    jobs_t.c.on_failure_template == hash_c,
+                                )
+                            )
+                            .exists()
+                        ),
+                    )
+                )
+            )
+
+        return result.rowcount
+
+    @staticmethod
+    def _from_row(row: Any) -> ActionTemplate:
+        template = ActionTemplate(
+            load_action(row.payload), name=row.name, payload=row.payload
+        )
+        # Renamed templates keep the hash they were stored with.
+        template.hash = row.hash
+        return template
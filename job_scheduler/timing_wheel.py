@@ -0,0 +1,118 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+
+class TimingWheel:
+    """Hierarchical timing wheel of keys and their deadlines.
+
+    Level 0 has ``slots`` slots of ``tick`` seconds, every higher level
+    ``slots`` slots spanning a full revolution of the level below. Adding
+    and removing a key is O(1), advancing by a tick is O(1) plus the keys
+    that expire or move down a level. Deadlines beyond the span of the
+    highest level are parked in its last slot and placed again as it
+    comes around.
+    """
+
+    def __init__(
+        self, tick: float, start: float, slots: int = 256, levels: int = 3
+    ) -> None:
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+
+        self._current = int(start / tick)
+        self._wheels: List[List[Dict[str, float]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        # Level and slot of every key, None for keys that are already due
+        self._positions: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._due: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    def add(self, key: str, deadline: float) -> None:
+        """Adds the key or moves it to a new deadline (UTC timestamp)."""
+        self.remove(key)
+        self._place(key, deadline)
+
+    def remove(self, key: str) -> None:
+        if key not in self._positions:
+            return
+
+        position = self._positions.pop(key)
+        if position is None:
+            del self._due[key]
+        else:
+            level, slot = position
+            del self._wheels[level][slot][key]
+
+    def advance(self, now: float) -> List[str]:
+        """Moves the wheel to ``now`` and returns the keys that expired."""
+        expired = []
+        target = int(now / self.tick)
+        if not self._positions:
+            self._current = max(self._current, target)
+
+        while self._current < target:
+            self._current += 1
+
+            # Higher levels first, their keys may move into the slots that
+            # are cascaded or expired next.
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots**level
+                if self._current % span == 0:
+                    self._cascade(level, (self._current // span) % self.slots)
+
+            slot = self._current % self.slots
+            bucket = self._wheels[0][slot]
+            if bucket:
+                self._wheels[0][slot] = {}
+                for key, deadline in bucket.items():
+                    if math.ceil(deadline / self.tick) > self._current:
+                        # Parked beyond the span of a single level wheel
+                        self._place(key, deadline)
+                    else:
+                        del self._positions[key]
+                        expired.append(key)
+
+        # Keys added past their deadline or cascaded onto the current tick
+        for key in self._due:
+            del self._positions[key]
+        expired.extend(self._due)
+        self._due.clear()
+
+        return expired
+
+    def _cascade(self, level: int, slot: int) -> None:
+        bucket = self._wheels[level][slot]
+        if not bucket:
+            return
+
+        self._wheels[level][slot] = {}
+        for key, deadline in bucket.items():
+            self._place(key, deadline)
+
+    def _place(self, key: str, deadline: float) -> None:
+        # Keys expire on the first tick at or after their deadline
+        ticks = math.ceil(deadline / self.tick)
+        delta = ticks - self._current
+        if delta <= 0:
+            self._positions[key] = None
+            self._due[key] = deadline
+            return
+
+        level = 0
+        span = self.slots
+        while delta >= span and level < self.levels - 1:
+            level += 1
+            span *= self.slots
+        if delta >= span:
+            ticks = self._current + span - 1
+
+        slot = (ticks // self.slots**level) % self.slots
+        self._wheels[level][slot][key] = deadline
+        self._positions[key] = (level, slot)
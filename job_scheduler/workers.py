@@ -0,0 +1,438 @@
+import asyncio
+import multiprocessing
+import queue
+import signal
+import threading
+import uuid
+import zlib
+from multiprocessing.process import BaseProcess
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Text,
+    Tuple,
+)
+
+from loguru import logger
+
+from job_scheduler import metrics
+from job_scheduler.commands import circuit_breakers
+from job_scheduler.executor import JobExecutor, parse_category_weights
+from job_scheduler.follow_ups import FollowUpBatcher
+from job_scheduler.history import HistoryRecorder
+from job_scheduler.http_client import start_http_client, stop_http_client
+from job_scheduler.job_runner import JobRunner
+from job_scheduler.log import configure_logging
+from job_scheduler.models import RunnableJob
+from job_scheduler.settings import settings
+
+# Seconds between the metrics reports of a worker
+REPORT_INTERVAL = 1.0
+
+# Seconds to wait for a worker to stop before it is terminated
+SHUTDOWN_TIMEOUT = 10.0
+
+# Workers are started fresh instead of forking the API process with its
+# event loop and database connections.
+_mp_context = multiprocessing.get_context("spawn")
+
+
+def get_job_shard(job_uuid: str, num_shards: int) -> int:
+    return zlib.crc32(job_uuid.encode()) % num_shards
+
+
+class _RemoteHistory:
+    """Passes the execution records of a worker to the main process."""
+
+    def __init__(self, index: int, results: Any) -> None:
+        self.index = index
+        self.results = results
+
+    def record(self, **execution: Any) -> None:
+        self.results.put(("history", self.index, execution))
+
+
+def _get_message(jobs: Any) -> Any:
+    """Waits for the next message to the worker, None if the main process
+    is gone.
+    """
+    while True:
+        try:
+            return jobs.get(timeout=1)
+        except queue.Empty:
+            parent = multiprocessing.parent_process()
+            if parent is not None and not parent.is_alive():
+                return None
+
+
+async def _serve(index: int, jobs: Any, results: Any) -> None:
+    await start_http_client()
+    loop = asyncio.get_running_loop()
+
+    # Reschedules waiting for the main process to store them, by request id
+    reschedules: Dict[str, asyncio.Future] = {}
+
+    async def reschedule_job(job: RunnableJob, delay: float) -> None:
+        request_id = uuid.uuid4().hex
+        stored = reschedules[request_id] = loop.create_future()
+        results.put(("reschedule", index, (request_id, job, delay)))
+        try:
+            error = await stored
+        finally:
+            del reschedules[request_id]
+        if error is not None:
+            raise RuntimeError(error)
+
+    follow_up_batcher = FollowUpBatcher(
+        max_size=settings.FOLLOW_UP_BATCH_MAX_SIZE,
+        max_delay=settings.FOLLOW_UP_BATCH_MAX_DELAY,
+        max_attempts=settings.FOLLOW_UP_BATCH_MAX_ATTEMPTS,
+        max_pending=settings.FOLLOW_UP_BATCH_MAX_PENDING,
+    )
+    job_runner = JobRunner(
+        reschedule_job=reschedule_job,
+        history=(
+            _RemoteHistory(index, results)  # type: ignore[arg-type]
+            if settings.HISTORY_ENABLED
+            else None
+        ),
+        follow_up_batcher=follow_up_batcher,
+    )
+    executor = JobExecutor(
+        run_job=job_runner.run_job,
+        max_concurrency=settings.EXECUTOR_MAX_CONCURRENCY,
+        max_per_host=settings.EXECUTOR_MAX_PER_HOST,
+        queue_size=settings.EXECUTOR_QUEUE_SIZE,
+        category_weights=parse_category_weights(
+            settings.EXECUTOR_CATEGORY_WEIGHTS
+        ),
+    )
+    await executor.start()
+
+    def report() -> None:
+        results.put(
+            (
+                "report",
+                index,
+                (
+                    metrics.registry.take_samples(),
+                    executor.num_running,
+                    [breaker.to_dict() for breaker in circuit_breakers.list()],
+                ),
+            )
+        )
+
+    async def report_periodically() -> None:
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL)
+            report()
+
+    # Messages are read apart from submitting the jobs, which waits while
+    # the executor is full, so runs waiting for a reschedule get the answer.
+    runs: asyncio.Queue = asyncio.Queue()
+
+    async def read_messages() -> None:
+        while True:
+            message = await loop.run_in_executor(None, _get_message, jobs)
+            if message is None:
+                runs.put_nowait(None)
+                return
+
+            kind, data = message
+            if kind == "stop":
+                runs.put_nowait(None)
+                return
+            if kind == "run":
+                runs.put_nowait(data)
+            elif kind == "rescheduled":
+                request_id, error = data
+                stored = reschedules.get(request_id)
+                if stored is not None and not stored.done():
+                    stored.set_result(error)
+
+    reporter = asyncio.create_task(report_periodically())
+    reader = asyncio.create_task(read_messages())
+    try:
+        while True:
+            run = await runs.get()
+            if run is None:
+                break
+
+            task_id, job, scheduled_at = run
+            done = await executor.submit(job, scheduled_at)
+            done.add_done_callback(
+                lambda future, task_id=task_id: results.put(
+                    ("done", index, (task_id, future.cancelled()))
+                )
+            )
+    finally:
+        reporter.cancel()
+        reader.cancel()
+        await executor.shutdown()
+        await follow_up_batcher.shutdown()
+        await stop_http_client()
+        report()
+
+
+def _run_worker(index: int, jobs: Any, results: Any) -> None:
+    # The main process stops the workers, on Ctrl-C as well
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_logging()
+    try:
+        asyncio.run(_serve(index, jobs, results))
+    finally:
+        # Stops the logging thread and frees its queue
+        logger.remove()
+
+
+class WorkerPool:
+    """Runs jobs in worker processes, sharded by job uuid.
+
+    Each worker runs its own JobExecutor, JobRunner, HTTP client and circuit
+    breakers, the executor settings apply per worker. Jobs are sent to the worker of their
+    shard through a queue. Workers report finished runs, execution records,
+    retries and their metrics back to the pool. A run that retries or
+    defers its job waits until the pool has stored it, so the outcome is
+    only recorded if the store succeeded. At most ``queue_size`` runs
+    are handed to the workers and not finished, submit() blocks beyond that.
+
+    A worker that dies is restarted. The runs it had been given are
+    cancelled like the runs still unfinished on shutdown, see
+    JobExecutor.submit().
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        reschedule_job: Callable[[RunnableJob, float], Awaitable[None]],
+        history: Optional[HistoryRecorder] = None,
+        queue_size: int = 10000,
+    ) -> None:
+        self.num_workers = num_workers
+        self.reschedule_job = reschedule_job
+        self.history = history
+        self.queue_size = queue_size
+
+        self._queue_slots = asyncio.Semaphore(queue_size)
+        self._processes: List[BaseProcess] = []
+        self._job_queues: List[Any] = []
+        self._results: Any = None
+        self._reader: Optional[threading.Thread] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Per task id the worker index and the completion future
+        self._tasks: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._task_sequence = 0
+        self._num_running = [0] * num_workers
+        # Circuit breakers of each worker, see CircuitBreaker.to_dict()
+        self._circuit_breakers: List[List[Dict[Text, Any]]] = [
+            [] for _ in range(num_workers)
+        ]
+        self._num_restarts = [0] * num_workers
+        self._reschedules: Set[asyncio.Task] = set()
+
+    @property
+    def num_queued(self) -> int:
+        return max(len(self._tasks) - self.num_running, 0)
+
+    @property
+    def num_running(self) -> int:
+        return sum(self._num_running)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._results = _mp_context.Queue()
+        self._reader = threading.Thread(
+            target=self._read_results, name="worker-results", daemon=True
+        )
+        self._reader.start()
+
+        for index in range(self.num_workers):
+            process, job_queue = self._start_worker(index)
+            self._processes.append(process)
+            self._job_queues.append(job_queue)
+        self._monitor = asyncio.create_task(self._monitor_workers())
+
+    async def shutdown(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+
+        loop = asyncio.get_running_loop()
+        for job_queue in self._job_queues:
+            job_queue.put(("stop", None))
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Terminating worker process {process.pid}")
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+
+        # Handle the last reports of the workers
+        if self._reader is not None:
+            self._results.put(None)
+            await loop.run_in_executor(None, self._reader.join)
+            await asyncio.sleep(0)
+        await asyncio.gather(*self._reschedules, return_exceptions=True)
+
+        if self._tasks:
+            logger.warning(
+                f"Worker pool stopped with {len(self._tasks)} unfinished jobs"
+            )
+            for task_id in list(self._tasks):
+                self._finish(task_id, cancel=True)
+
+        for job_queue in self._job_queues:
+            job_queue.close()
+        if self._results is not None:
+            self._results.close()
+        self._processes = []
+        self._job_queues = []
+        self._results = None
+        self._reader = None
+
+    async def submit(
+        self, job: RunnableJob, scheduled_at: Optional[float] = None
+    ) -> asyncio.Future:
+        """Hands a job to its worker, see JobExecutor.submit()."""
+        await self._queue_slots.acquire()
+
+        index = get_job_shard(job.uuid, self.num_workers)
+        self._task_sequence += 1
+        done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._tasks[self._task_sequence] = (index, done)
+        self._job_queues[index].put(
+            ("run", (self._task_sequence, job, scheduled_at))
+        )
+        return done
+
+    def stats(self) -> Dict[Text, Any]:
+        in_flight = [0] * self.num_workers
+        for index, _ in self._tasks.values():
+            in_flight[index] += 1
+
+        return {
+            "queued": self.num_queued,
+            "running": self.num_running,
+            "max_concurrency": settings.EXECUTOR_MAX_CONCURRENCY,
+            "max_per_host": settings.EXECUTOR_MAX_PER_HOST,
+            "queue_size": self.queue_size,
+            "workers": [
+                {
+                    "pid": process.pid,
+                    "alive": process.is_alive(),
+                    "jobs": in_flight[index],
+                    "running": self._num_running[index],
+                    "restarts": self._num_restarts[index],
+                }
+                for index, process in enumerate(self._processes)
+            ],
+        }
+
+    def circuit_breakers(self) -> List[List[Dict[Text, Any]]]:
+        """Returns the circuit breakers last reported by each worker."""
+        return list(self._circuit_breakers)
+
+    def _start_worker(self, index: int) -> Tuple[BaseProcess, Any]:
+        job_queue = _mp_context.Queue()
+        process = _mp_context.Process(
+            target=_run_worker,
+            args=(index, job_queue, self._results),
+            name=f"job-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        logger.debug(f"Started worker {index} (pid {process.pid})")
+        return process, job_queue
+
+    async def _monitor_workers(self) -> None:
+        while True:
+            await asyncio.sleep(1)
+            for index, process in enumerate(self._processes):
+                if process.exitcode is None:
+                    continue
+
+                lost = [
+                    task_id
+                    for task_id, (worker, _) in self._tasks.items()
+                    if worker == index
+                ]
+                logger.error(
+                    f"Worker {index} (pid {process.pid}) exited with code "
+                    f"{process.exitcode}, restarting it. Lost {len(lost)} "
+                    f"job runs."
+                )
+                for task_id in lost:
+                    self._finish(task_id, cancel=True)
+
+                # Messages the worker did not read are dropped with its queue
+                self._job_queues[index].cancel_join_thread()
+                self._job_queues[index].close()
+                self._num_running[index] = 0
+                self._circuit_breakers[index] = []
+                self._num_restarts[index] += 1
+                (
+                    self._processes[index],
+                    self._job_queues[index],
+                ) = self._start_worker(index)
+
+    def _read_results(self) -> None:
+        # Runs in a thread, results are handled on the event loop
+        assert self._loop is not None
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._handle_result, *message)
+
+    def _handle_result(self, kind: str, index: int, data: Any) -> None:
+        if kind == "done":
+            self._finish(*data)
+        elif kind == "history":
+            if self.history is not None:
+                self.history.record(**data)
+        elif kind == "reschedule":
+            task = asyncio.create_task(
+                self._reschedule(self._job_queues[index], *data)
+            )
+            self._reschedules.add(task)
+            task.add_done_callback(self._reschedules.discard)
+        elif kind == "report":
+            (
+                samples,
+                self._num_running[index],
+                self._circuit_breakers[index],
+            ) = data
+            metrics.registry.merge_samples(samples)
+
+    async def _reschedule(
+        self, job_queue: Any, request_id: str, job: RunnableJob, delay: float
+    ) -> None:
+        """Stores a retry or deferral of a worker and tells it the outcome."""
+        error = None
+        try:
+            await self.reschedule_job(job, delay)
+        except Exception as exp:
+            logger.exception(f"Error rescheduling job {job.uuid}: {exp}")
+            error = str(exp) or type(exp).__name__
+        try:
+            job_queue.put(("rescheduled", (request_id, error)))
+        except (OSError, ValueError):
+            # The worker died and was restarted, its runs were cancelled
+            pass
+
+    def _finish(self, task_id: int, cancel: bool = False) -> None:
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return
+        self._queue_slots.release()
+        if cancel:
+            task[1].cancel()
+        elif not task[1].done():
+            task[1].set_result(None)
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Text
+
+# Settings are read on import, the scheduler module connects to
+# DATABASE_URL on import. The tests use their own SQLite databases.
+os.environ.setdefault("API_TOKEN", "test")
+os.environ.setdefault("TIMEZONE", "UTC")
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/scheduler.db",
+)
+os.environ.setdefault("LOGURU_LEVEL", "WARNING")
+
+import pytest  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from job_scheduler.models import Job, RunnableJob  # noqa: E402
+from job_scheduler.store import AsyncJobStore, StoredJob  # noqa: E402
+from job_scheduler.tables import create_or_upgrade_tables  # noqa: E402
+from job_scheduler.templates import TemplateRegistry  # noqa: E402
+
+
+def make_job_data(
+    name: str = "job", run_at: Optional[datetime] = None, **fields: Any
+) -> Dict[Text, Any]:
+    """Returns the JSON of an HTTP job, due in a day by default."""
+    if run_at is None:
+        run_at = datetime.now(timezone.utc) + timedelta(days=1)
+    return {
+        "name": name,
+        "run_at": run_at.isoformat(),
+        "action": {"http": {"url": "http://a/"}},
+        **fields,
+    }
+
+
+def make_job(
+    run_at: Optional[datetime] = None, attempt: int = 1, **fields: Any
+) -> RunnableJob:
+    return RunnableJob(
+        job=Job.model_validate(make_job_data(run_at=run_at, **fields)),
+        uuid=str(uuid.uuid4()),
+        attempt=attempt,
+    )
+
+
+def make_stored_job(run_at: datetime, **fields: Any) -> StoredJob:
+    """Returns a one-shot job as the scheduler stores it."""
+    return StoredJob(job=make_job(run_at, **fields), next_run_time=run_at)
+
+
+def make_store(
+    engine: Any, node_id: str, lease_duration: float = 30
+) -> AsyncJobStore:
+    return AsyncJobStore(
+        engine,
+        timezone.utc,
+        TemplateRegistry(engine),
+        node_id=node_id,
+        lease_duration=lease_duration,
+    )
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/test.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(create_or_upgrade_tables)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def scheduler():
+    """The scheduler module on its database, without the dispatcher."""
+    from job_scheduler import scheduler
+
+    await scheduler.job_store.start()
+    yield scheduler
+    await scheduler.job_store.remove_all_jobs()
+    await scheduler.engine.dispose()
@@ -0,0 +1,46 @@
+import socket
+
+import pytest
+
+from job_scheduler.scripts.benchmark import run_benchmark, summarize
+
+pytestmark = pytest.mark.anyio
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_summary_is_in_milliseconds():
+    summary = summarize([0.004, 0.001, 0.002, 0.003])
+
+    assert summary["count"] == 4
+    assert summary["mean_ms"] == pytest.approx(2.5)
+    assert summary["p50_ms"] == pytest.approx(3)
+    assert summary["max_ms"] == pytest.approx(4)
+    assert summarize([]) == {"count": 0}
+
+
+async def test_small_run_reports_every_phase(tmp_path):
+    results = await run_benchmark(
+        database_url=f"sqlite+aiosqlite:///{tmp_path}/benchmark.db",
+        port=free_port(),
+        target_port=free_port(),
+        app_env={},
+        create_jobs=5,
+        concurrency=2,
+        store_sizes=[10],
+        lookups=5,
+        due_jobs=5,
+        due_in=1,
+        lag_timeout=30,
+    )
+
+    assert results["create"]["errors"] == 0
+    assert results["create"]["latency"]["count"] == 5
+    (lookup,) = results["lookup"]
+    assert lookup["store_size"] == 10
+    assert lookup["get_job"]["errors"] == lookup["list_jobs"]["errors"] == 0
+    assert results["schedule_lag"]["executed"] == 5
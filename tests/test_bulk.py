@@ -0,0 +1,152 @@
+import json
+
+import pytest
+
+from job_scheduler import domain
+from tests.conftest import make_job_data
+
+pytestmark = pytest.mark.anyio
+
+
+async def iterate(items):
+    for item in items:
+        yield item
+
+
+@pytest.fixture
+def wakeups(scheduler, monkeypatch):
+    """The jobs of each wakeup of the dispatcher."""
+    wakeups = []
+    monkeypatch.setattr(
+        scheduler.dispatcher, "jobs_added", lambda jobs: wakeups.append(jobs)
+    )
+    return wakeups
+
+
+@pytest.fixture
+def transactions(scheduler, monkeypatch):
+    """The jobs passed to each add_jobs_to_scheduler() call."""
+    transactions = []
+    add_jobs_to_scheduler = scheduler.add_jobs_to_scheduler
+
+    async def record(stored_jobs, wakeup=True):
+        transactions.append(stored_jobs)
+        return await add_jobs_to_scheduler(stored_jobs, wakeup=wakeup)
+
+    monkeypatch.setattr(scheduler, "add_jobs_to_scheduler", record)
+    return transactions
+
+
+async def test_results_are_reported_per_item(scheduler, monkeypatch):
+    build_stored_job = scheduler.build_stored_job
+
+    def build_or_fail(job):
+        if job.job.name == "unbuildable":
+            raise ValueError("The schedule has no future run times")
+        return build_stored_job(job)
+
+    monkeypatch.setattr(scheduler, "build_stored_job", build_or_fail)
+    items = [
+        make_job_data("valid"),
+        {"name": "missing run_at"},
+        make_job_data("unbuildable"),
+        make_job_data("unknown template", action={"template": "missing"}),
+        json.dumps(make_job_data("ndjson line")),
+    ]
+
+    response = await domain.create_jobs(iterate(items))
+
+    statuses = [result["status"] for result in response["results"]]
+    assert statuses == ["success", "error", "error", "error", "success"]
+    assert [result["index"] for result in response["results"]] == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert "missing" in response["results"][3]["message"]
+    assert response["atomic"]
+    assert response["num_created"] == 2
+    assert response["num_failed"] == 3
+    assert await scheduler.job_store.count_jobs() == 2
+
+
+async def test_array_is_stored_in_one_transaction(
+    scheduler, wakeups, transactions
+):
+    items = [make_job_data(f"job {index}") for index in range(5)]
+
+    response = await domain.create_jobs(iterate(items))
+
+    assert response["atomic"]
+    assert response["num_created"] == 5
+    assert [len(jobs) for jobs in transactions] == [5]
+    assert [len(jobs) for jobs in wakeups] == [5]
+
+
+async def test_failed_transaction_fails_the_request(scheduler, monkeypatch):
+    async def fail(stored_jobs, wakeup=True):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(scheduler, "add_jobs_to_scheduler", fail)
+    items = [make_job_data(f"job {index}") for index in range(5)]
+
+    with pytest.raises(RuntimeError):
+        await domain.create_jobs(iterate(items), chunk_size=2)
+    assert await scheduler.job_store.count_jobs() == 0
+
+
+async def test_jobs_are_stored_in_chunks(scheduler, wakeups, transactions):
+    items = [
+        make_job_data(f"job {index}", idempotency_key=f"key {index % 3}")
+        for index in range(5)
+    ]
+
+    response = await domain.create_jobs(iterate(items), chunk_size=2)
+
+    results = response["results"]
+    assert [result["duplicate"] for result in results] == [
+        False,
+        False,
+        False,
+        True,
+        True,
+    ]
+    assert results[3]["job_uuid"] == results[0]["job_uuid"]
+    assert not response["atomic"]
+    assert response["num_created"] == 3
+    assert response["num_duplicates"] == 2
+    assert await scheduler.job_store.count_jobs() == 3
+    assert [len(jobs) for jobs in transactions] == [2, 2, 1]
+    # Once for the new jobs, after the last chunk
+    assert [len(jobs) for jobs in wakeups] == [3]
+
+
+async def test_failed_chunks_are_reported_per_item(
+    scheduler, wakeups, monkeypatch
+):
+    add_jobs_to_scheduler = scheduler.add_jobs_to_scheduler
+    num_calls = 0
+
+    async def fail_second_chunk(stored_jobs, wakeup=True):
+        nonlocal num_calls
+        num_calls += 1
+        if num_calls == 2:
+            raise RuntimeError("database is locked")
+        return await add_jobs_to_scheduler(stored_jobs, wakeup=wakeup)
+
+    monkeypatch.setattr(scheduler, "add_jobs_to_scheduler", fail_second_chunk)
+    items = [make_job_data(f"job {index}") for index in range(5)]
+
+    response = await domain.create_jobs(iterate(items), chunk_size=2)
+
+    statuses = [result["status"] for result in response["results"]]
+    assert statuses == ["success", "success", "error", "error", "success"]
+    assert "database is locked" in response["results"][2]["message"]
+    assert "job_uuid" not in response["results"][2]
+    assert not response["atomic"]
+    assert response["num_created"] == 3
+    assert response["num_failed"] == 2
+    assert await scheduler.job_store.count_jobs() == 3
+    assert [len(jobs) for jobs in wakeups] == [3]
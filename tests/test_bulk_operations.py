@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import pydantic
+import pytest
+
+from job_scheduler import domain
+from job_scheduler.api_models import JobSelection, ShiftJobs
+from tests.conftest import make_stored_job
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def jobs(scheduler):
+    """Jobs by name, the mail jobs an hour apart."""
+    stored_jobs = {
+        name: make_stored_job(
+            START + timedelta(hours=index), name=name, category=category
+        )
+        for index, (name, category) in enumerate(
+            [
+                ("welcome-1", "mail"),
+                ("welcome-2", "mail"),
+                ("digest", "mail"),
+                ("report", None),
+            ]
+        )
+    }
+    await scheduler.job_store.add_jobs(list(stored_jobs.values()))
+    return stored_jobs
+
+
+async def remaining_names(scheduler):
+    return {
+        job.job.job.name
+        for job in await scheduler.job_store.get_jobs(limit=100)
+    }
+
+
+def test_all_jobs_cannot_be_selected():
+    with pytest.raises(pydantic.ValidationError):
+        JobSelection()
+    with pytest.raises(pydantic.ValidationError):
+        ShiftJobs(seconds=60, name_prefix="")
+
+
+async def test_selected_jobs_are_removed(scheduler, jobs):
+    response = await domain.remove_selected_jobs(
+        JobSelection(category="mail", name_prefix="welcome")
+    )
+
+    assert response["num_jobs"] == 2
+    assert await remaining_names(scheduler) == {"digest", "report"}
+
+
+async def test_selection_by_run_at(scheduler, jobs):
+    response = await domain.remove_selected_jobs(
+        JobSelection(
+            category="mail",
+            run_at_from=START + timedelta(minutes=30),
+            run_at_to=START + timedelta(hours=2),
+        )
+    )
+
+    assert response["num_jobs"] == 1
+    assert "welcome-2" not in await remaining_names(scheduler)
+
+
+async def test_paused_jobs_are_not_claimed_until_resumed(scheduler, jobs):
+    selection = JobSelection(category="mail")
+    later = START + timedelta(days=1)
+
+    assert (await domain.pause_jobs(selection))["num_jobs"] == 3
+    # Paused jobs are not selected again
+    assert (await domain.pause_jobs(selection))["num_jobs"] == 0
+    claimed = await scheduler.job_store.claim_due_jobs(later, 10)
+    assert [job.job.job.name for job in claimed] == ["report"]
+
+    assert (await domain.resume_jobs(selection))["num_jobs"] == 3
+    claimed = await scheduler.job_store.claim_due_jobs(later, 10)
+    assert len(claimed) == 3
+
+
+async def test_selected_jobs_are_shifted(scheduler, jobs):
+    response = await domain.shift_jobs(
+        ShiftJobs(name_prefix="welcome", seconds=-1800)
+    )
+
+    assert response["num_jobs"] == 2
+    for name in ("welcome-1", "welcome-2", "digest"):
+        stored = await scheduler.job_store.lookup_job(jobs[name].id)
+        shift = timedelta(seconds=-1800 if name != "digest" else 0)
+        assert stored.next_run_time == jobs[name].next_run_time + shift
+        assert stored.job.job.run_at == stored.next_run_time
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from job_scheduler.catch_up import (
+    MisfirePolicy,
+    TokenBucket,
+    parse_misfire_policies,
+)
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+RUN_TIMES = [NOW - timedelta(minutes=minutes) for minutes in (30, 20, 10)]
+
+
+@pytest.mark.parametrize(
+    "policy, kept",
+    [
+        ("all", RUN_TIMES),
+        ("latest", RUN_TIMES[-1:]),
+        ("skip_older_than:900", RUN_TIMES[-1:]),
+        ("skip_older_than:1500", RUN_TIMES[1:]),
+    ],
+)
+def test_misfire_policies(policy, kept):
+    assert MisfirePolicy.parse(policy).apply(RUN_TIMES, NOW) == (
+        kept,
+        len(RUN_TIMES) - len(kept),
+    )
+
+
+@pytest.mark.parametrize("value", ["none", "latest:5", "skip_older_than:x"])
+def test_invalid_misfire_policies(value):
+    with pytest.raises(ValueError):
+        MisfirePolicy.parse(value)
+
+
+def test_misfire_policies_by_category():
+    policies = parse_misfire_policies(
+        "reports=latest,emails=skip_older_than:60"
+    )
+
+    assert {
+        category: str(policy) for category, policy in policies.items()
+    } == {
+        "reports": "latest",
+        "emails": "skip_older_than:60",
+    }
+
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=0.5, burst=2)
+
+    assert bucket.take(5) == 2
+    assert bucket.take(1) == 0
+    assert 1.9 < bucket.seconds_until_available() <= 2
+
+    bucket.give_back(1)
+    assert bucket.seconds_until_available() == 0
+    assert bucket.take(5) == 1
@@ -0,0 +1,125 @@
+import pytest
+
+from job_scheduler.commands import (
+    CircuitBreaker,
+    CircuitOpenError,
+    merge_circuit_breakers,
+)
+
+
+def make_breaker(open_duration: float = 30) -> CircuitBreaker:
+    return CircuitBreaker(
+        "host",
+        failure_rate_threshold=0.5,
+        min_calls=4,
+        window_size=10,
+        slow_call_duration=5,
+        open_duration=open_duration,
+    )
+
+
+def open_circuit(breaker: CircuitBreaker) -> None:
+    for _ in range(4):
+        breaker.record(breaker.before_call(), failed=True, duration=0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_opens_at_failure_rate():
+    breaker = make_breaker()
+    for failed in (False, True, False):
+        breaker.record(breaker.before_call(), failed=failed, duration=0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record(breaker.before_call(), failed=True, duration=0.1)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_slow_calls_count_as_failed():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(breaker.before_call(), failed=False, duration=5)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_single_probe_closes_the_circuit():
+    breaker = make_breaker(open_duration=0)
+    open_circuit(breaker)
+
+    probe = breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(probe, failed=False, duration=0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failure_rate == 0
+
+
+def test_failed_probe_opens_the_circuit_again():
+    breaker = make_breaker(open_duration=0)
+    open_circuit(breaker)
+
+    breaker.record(breaker.before_call(), failed=True, duration=0.1)
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stragglers_do_not_decide_the_probe():
+    breaker = make_breaker(open_duration=0)
+    straggler = breaker.before_call()
+    open_circuit(breaker)
+    probe = breaker.before_call()
+
+    breaker.record(straggler, failed=False, duration=0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(probe, failed=True, duration=0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stragglers_do_not_count_after_closing():
+    breaker = make_breaker(open_duration=0)
+    stragglers = [breaker.before_call() for _ in range(4)]
+    open_circuit(breaker)
+    breaker.record(breaker.before_call(), failed=False, duration=0.1)
+
+    for call in stragglers:
+        breaker.record(call, failed=True, duration=0.1)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.to_dict()["num_calls"] == 0
+
+
+def test_merge_circuit_breakers_by_host():
+    closed = make_breaker()
+    closed.record(closed.before_call(), failed=True, duration=0.1)
+    opened = make_breaker()
+    open_circuit(opened)
+
+    (merged,) = merge_circuit_breakers(
+        [[closed.to_dict()], [opened.to_dict()]]
+    )
+
+    assert merged["state"] == CircuitBreaker.OPEN
+    assert merged["num_calls"] == 5
+    assert merged["failure_rate"] == 1.0
+    assert merged["states"] == {"closed": 1, "open": 1}
+    assert merged["retry_after"] > 0
+
+
+def test_merged_breakers_have_the_same_keys_for_one_process():
+    closed = make_breaker()
+    opened = make_breaker()
+    open_circuit(opened)
+
+    (single,) = merge_circuit_breakers([[closed.to_dict()]])
+    (merged,) = merge_circuit_breakers(
+        [[closed.to_dict()], [opened.to_dict()]]
+    )
+
+    assert single.keys() == merged.keys()
+    assert single["states"] == {"closed": 1}
+    assert single["retry_after"] is None
@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from job_scheduler.dispatcher import Dispatcher, TimingWheelDispatcher
+from tests.conftest import make_store, make_stored_job
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeExecutor:
+    def __init__(self) -> None:
+        self.runs = []
+
+    async def submit(self, job, scheduled_at=None):
+        done = asyncio.get_running_loop().create_future()
+        self.runs.append((job, done))
+        return done
+
+
+async def fire_due_job(engine):
+    store = make_store(engine, "a")
+    executor = FakeExecutor()
+    dispatcher = Dispatcher(store, executor, timezone.utc)
+    job = make_stored_job(datetime.now(timezone.utc) - timedelta(seconds=1))
+    await store.add_jobs([job])
+
+    await dispatcher._process_jobs()
+    assert [run[0].uuid for run in executor.runs] == [job.id]
+    return store, dispatcher, executor.runs[0][1], job
+
+
+async def test_one_shot_job_is_held_until_its_run_is_done(engine):
+    store, dispatcher, done, job = await fire_due_job(engine)
+    other = make_store(engine, "b")
+    now = datetime.now(timezone.utc)
+
+    # Still stored and leased while the run is in progress
+    assert await store.lookup_job(job.id) is not None
+    assert await other.claim_due_jobs(now, 10) == []
+
+    done.set_result(None)
+    await asyncio.sleep(0)
+    await dispatcher.close()
+
+    assert await store.lookup_job(job.id) is None
+
+
+async def test_dropped_run_is_released(engine):
+    store, dispatcher, done, job = await fire_due_job(engine)
+
+    done.cancel()
+    await asyncio.sleep(0)
+    await dispatcher.close()
+
+    other = make_store(engine, "b")
+    now = datetime.now(timezone.utc)
+    assert [job.id for job in await other.claim_due_jobs(now, 10)] == [job.id]
+
+
+async def test_close_releases_unfinished_runs(engine):
+    store, dispatcher, _, job = await fire_due_job(engine)
+
+    await dispatcher.close()
+
+    other = make_store(engine, "b")
+    now = datetime.now(timezone.utc)
+    assert [job.id for job in await other.claim_due_jobs(now, 10)] == [job.id]
+
+
+async def test_rescheduled_job_is_kept(engine):
+    store, dispatcher, done, job = await fire_due_job(engine)
+    retry = make_stored_job(datetime.now(timezone.utc) + timedelta(seconds=60))
+    retry.job = retry.job.model_copy(update={"uuid": job.id, "attempt": 2})
+
+    assert await store.reschedule_job(retry)
+    done.set_result(None)
+    await asyncio.sleep(0)
+    await dispatcher.close()
+
+    stored = await store.lookup_job(job.id)
+    assert stored.job.attempt == 2
+    assert stored.next_run_time == retry.next_run_time
+
+
+async def test_throttled_catch_up_does_not_delay_jobs_due_on_time(engine):
+    store = make_store(engine, "a")
+    executor = FakeExecutor()
+    # One late job now, the next one in 100s
+    dispatcher = Dispatcher(
+        store,
+        executor,
+        timezone.utc,
+        catch_up_max_rate=0.01,
+        catch_up_threshold=60,
+    )
+    now = datetime.now(timezone.utc)
+    late_jobs = [
+        make_stored_job(now - timedelta(hours=1, seconds=index))
+        for index in range(3)
+    ]
+    on_time = make_stored_job(now + timedelta(seconds=0.5))
+    await store.add_jobs([*late_jobs, on_time])
+
+    wait_seconds = await dispatcher._process_jobs()
+
+    assert [run[0].uuid for run in executor.runs] == [late_jobs[2].id]
+    assert dispatcher.catch_up_stats()["catching_up"]
+    assert wait_seconds <= 0.5
+
+    await asyncio.sleep(wait_seconds)
+    await dispatcher._process_jobs()
+
+    assert [run[0].uuid for run in executor.runs] == [
+        late_jobs[2].id,
+        on_time.id,
+    ]
+
+
+async def test_timing_wheel_fires_jobs_added_to_its_window(engine):
+    store = make_store(engine, "a")
+    executor = FakeExecutor()
+    dispatcher = TimingWheelDispatcher(
+        store, executor, timezone.utc, tick=0.01, window=60
+    )
+    now = datetime.now(timezone.utc)
+    loaded = make_stored_job(now + timedelta(seconds=0.1))
+    await store.add_jobs([loaded])
+
+    assert await dispatcher._process_jobs() == 0.01
+    assert executor.runs == []
+
+    # Added after the window was paged in
+    added = make_stored_job(now + timedelta(seconds=0.2))
+    await store.add_jobs([added])
+    dispatcher.jobs_added([added])
+    removed = make_stored_job(now + timedelta(seconds=0.2))
+    await store.add_jobs([removed])
+    dispatcher.jobs_added([removed])
+    dispatcher.jobs_removed([removed.id])
+
+    await asyncio.sleep(0.3)
+    await dispatcher._process_jobs()
+
+    assert [run[0].uuid for run in executor.runs] == [loaded.id, added.id]
+    await dispatcher.close()
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from job_scheduler.executor import (
+    FairQueue,
+    JobExecutor,
+    parse_category_weights,
+)
+from tests.conftest import make_job
+
+pytestmark = pytest.mark.anyio
+
+
+def make_item(name, category=None, priority=0, url="http://a/"):
+    job = make_job(
+        name=name,
+        category=category,
+        priority=priority,
+        action={"http": {"url": url}},
+    )
+    return (job, "", None, None)
+
+
+async def take_names(queue, num_items):
+    return [(await queue.get())[0].job.name for _ in range(num_items)]
+
+
+async def test_higher_priorities_are_taken_first():
+    queue = FairQueue()
+    for name, priority in [("low", 0), ("high", 9), ("mid", 5)]:
+        queue.put(make_item(name, priority=priority))
+
+    assert queue.sizes() == {0: 1, 5: 1, 9: 1}
+    assert await take_names(queue, 3) == ["high", "mid", "low"]
+    assert len(queue) == 0
+
+
+async def test_categories_take_turns_by_weight():
+    queue = FairQueue({"bulk": 2})
+    for index in range(4):
+        queue.put(make_item(f"bulk-{index}", category="bulk"))
+    for index in range(2):
+        queue.put(make_item(f"mail-{index}", category="mail"))
+    queue.put(make_item("default"))
+
+    assert await take_names(queue, 7) == [
+        "bulk-0",
+        "bulk-1",
+        "mail-0",
+        "default",
+        "bulk-2",
+        "bulk-3",
+        "mail-1",
+    ]
+
+
+def test_category_weights_must_be_positive_integers():
+    assert parse_category_weights("bulk=3, mail=1") == {"bulk": 3, "mail": 1}
+    for value in ("bulk=0", "bulk=1.5", "bulk"):
+        with pytest.raises(ValueError):
+            parse_category_weights(value)
+
+
+async def test_parked_jobs_of_a_busy_host_run_by_priority():
+    runs = []
+    release = asyncio.Event()
+
+    async def run_job(job, scheduled_at):
+        runs.append(job.job.name)
+        if job.job.name == "first":
+            await release.wait()
+
+    executor = JobExecutor(run_job, max_concurrency=2, max_per_host=1)
+    await executor.start()
+    try:
+        done = []
+        for name, priority in [("first", 0), ("low", 0), ("high", 9)]:
+            job = make_job(name=name, priority=priority)
+            done.append(await executor.submit(job))
+            await asyncio.sleep(0.01)
+        other = await executor.submit(
+            make_job(name="other", action={"http": {"url": "http://b/"}})
+        )
+
+        # The other host is not held up by the parked jobs
+        await asyncio.wait_for(other, 1)
+        assert runs == ["first", "other"]
+        assert executor.stats()["hosts"]["a"] == {"running": 1, "queued": 2}
+
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*done), 1)
+        assert runs == ["first", "other", "high", "low"]
+    finally:
+        await executor.shutdown()
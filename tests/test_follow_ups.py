@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import pytest
+
+from job_scheduler.commands import Command, CommandResult, HTTPCommand
+from job_scheduler.follow_ups import FollowUpBatcher
+from job_scheduler.job_runner import JobRunner
+from job_scheduler.models import RetryPolicy
+from tests.conftest import make_job
+
+pytestmark = pytest.mark.anyio
+
+
+class Batches:
+    """Records the batch requests, the first ``num_failures`` fail."""
+
+    def __init__(self) -> None:
+        self.sent = []
+        self.num_failures = 0
+
+    async def execute(self, command, context):
+        self.sent.append((command.url, json.loads(command.body)))
+        if self.num_failures:
+            self.num_failures -= 1
+            raise ConnectionError("refused")
+        return CommandResult(status=200)
+
+    def job_uuids(self, index):
+        return [item["job_uuid"] for item in self.sent[index][1]]
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    batches = Batches()
+
+    async def execute(command, context):
+        return await batches.execute(command, context)
+
+    monkeypatch.setattr(HTTPCommand, "execute", execute)
+    return batches
+
+
+def add(batcher, job_uuid, url="http://b/"):
+    batcher.add(HTTPCommand(url), "on_success", None, {"job_uuid": job_uuid})
+
+
+async def test_full_batches_are_sent_right_away(batches):
+    batcher = FollowUpBatcher(max_size=2, max_delay=0.2)
+    for job_uuid in "abc":
+        add(batcher, job_uuid)
+
+    await asyncio.sleep(0.05)
+    assert batches.sent == [
+        (
+            "http://b/",
+            [
+                {"job_uuid": "a", "follow_up": "on_success"},
+                {"job_uuid": "b", "follow_up": "on_success"},
+            ],
+        )
+    ]
+
+    # The rest once the oldest follow-up has waited max_delay
+    await asyncio.sleep(0.25)
+    assert batches.job_uuids(1) == ["c"]
+    assert batcher.num_pending == 0
+
+
+async def test_targets_are_batched_separately(batches):
+    batcher = FollowUpBatcher(max_size=2, max_delay=10)
+    add(batcher, "a", url="http://b/")
+    add(batcher, "b", url="http://c/")
+    add(batcher, "c", url="http://b/")
+
+    await asyncio.sleep(0.05)
+    assert batches.sent == [
+        (
+            "http://b/",
+            [
+                {"job_uuid": "a", "follow_up": "on_success"},
+                {"job_uuid": "c", "follow_up": "on_success"},
+            ],
+        )
+    ]
+    await batcher.shutdown()
+    assert batches.sent[1][0] == "http://c/"
+
+
+async def test_failed_batch_is_retried_before_the_next(batches):
+    batcher = FollowUpBatcher(max_size=1, max_attempts=3)
+    batcher.retry_policy = RetryPolicy(
+        max_attempts=3, backoff_base=0.01, jitter=0
+    )
+    batches.num_failures = 1
+    add(batcher, "a")
+    add(batcher, "b")
+
+    await asyncio.sleep(0.1)
+
+    assert [batches.job_uuids(i) for i in range(3)] == [["a"], ["a"], ["b"]]
+
+
+async def test_shutdown_sends_pending_follow_ups(batches):
+    batcher = FollowUpBatcher(max_size=10, max_delay=60)
+    add(batcher, "a")
+
+    await batcher.shutdown()
+
+    assert batches.job_uuids(0) == ["a"]
+
+
+class SucceedingCommand(Command):
+    async def execute(self, context):
+        return CommandResult(status=200)
+
+
+def test_only_http_follow_ups_are_batched():
+    batcher = FollowUpBatcher()
+
+    with pytest.raises(ValueError, match="not supported"):
+        batcher.add(SucceedingCommand("other"), "on_success", None, {})
+
+
+async def test_too_many_pending_follow_ups_are_rejected(batches):
+    batcher = FollowUpBatcher(max_pending=1, max_delay=60)
+    add(batcher, "a")
+
+    with pytest.raises(ValueError, match="Too many pending"):
+        add(batcher, "b")
+    await batcher.shutdown()
+
+
+async def test_runner_queues_follow_ups_that_opted_in(batches):
+    batcher = FollowUpBatcher(max_delay=60)
+    job = make_job(on_success={"http": {"url": "http://b/"}, "batch": True})
+    job.job.action._command = SucceedingCommand("succeeding")
+
+    await JobRunner(follow_up_batcher=batcher).run_job(job)
+
+    assert batcher.num_pending == 1
+    await batcher.shutdown()
+    assert batches.job_uuids(0) == [job.uuid]
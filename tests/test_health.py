@@ -0,0 +1,90 @@
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from job_scheduler.main import app
+from job_scheduler.settings import settings
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeDispatcher:
+    def __init__(self, running: bool, seconds_idle: float) -> None:
+        self.running = running
+        self.seconds_idle = seconds_idle
+
+
+async def get(path):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test"
+    ) as client:
+        return await client.get(path)
+
+
+async def test_ready_with_database_and_running_loop(scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler, "dispatcher", FakeDispatcher(True, 1))
+
+    response = await get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+    assert response.json()["database"]["ok"]
+
+
+@pytest.mark.parametrize(
+    "running, seconds_idle",
+    [(False, 0), (True, 10**6)],
+    ids=["stopped", "stalled"],
+)
+async def test_not_ready_without_scheduler_loop(
+    scheduler, monkeypatch, running, seconds_idle
+):
+    monkeypatch.setattr(
+        scheduler, "dispatcher", FakeDispatcher(running, seconds_idle)
+    )
+
+    response = await get("/health/ready")
+
+    assert response.status_code == 503
+    assert not response.json()["scheduler"]["ok"]
+    assert response.json()["database"]["ok"]
+
+
+async def test_not_ready_without_database(scheduler, monkeypatch, tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/missing/scheduler.db"
+    )
+    monkeypatch.setattr(scheduler, "engine", engine)
+    monkeypatch.setattr(scheduler, "dispatcher", FakeDispatcher(True, 1))
+
+    checks = await scheduler.check_readiness()
+
+    assert not checks["database"]["ok"]
+    assert "pool" in checks["database"]
+    await engine.dispose()
+
+
+async def test_alive_without_checks(scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler, "dispatcher", FakeDispatcher(False, 0))
+
+    response = await get("/health/live")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+
+async def test_job_count_is_cached(scheduler, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_COUNT_CACHE_TTL", 60)
+    monkeypatch.setattr(scheduler, "_job_count_cache", (None, 0.0))
+    counts = []
+
+    async def count_jobs():
+        counts.append(1)
+        return len(counts)
+
+    monkeypatch.setattr(scheduler.job_store, "count_jobs", count_jobs)
+
+    assert await scheduler.get_num_jobs_in_scheduler() == 1
+    assert await scheduler.get_num_jobs_in_scheduler() == 1
+    assert len(counts) == 1
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from datetime import timezone
+
+import pytest
+
+from job_scheduler.history import HistoryRecorder
+
+pytestmark = pytest.mark.anyio
+
+
+def record(history, job_uuid="a", category=None, started_at=None, **fields):
+    history.record(
+        job_uuid=job_uuid,
+        category=category,
+        name="job",
+        attempt=1,
+        scheduled_at=None,
+        started_at=time.time() if started_at is None else started_at,
+        duration=0.1,
+        outcome="success",
+        **fields,
+    )
+
+
+async def test_records_are_written_in_batches(engine):
+    history = HistoryRecorder(engine, timezone.utc, batch_size=2)
+    for _ in range(5):
+        record(history, status=200)
+
+    assert await history.get_executions() == []
+    assert await history.flush() == 5
+
+    executions = await history.get_executions()
+    assert len(executions) == 5
+    assert executions[0]["status"] == 200
+    assert executions[0]["id"] > executions[-1]["id"]
+
+
+async def test_full_batch_is_written_before_the_interval(engine):
+    history = HistoryRecorder(
+        engine, timezone.utc, batch_size=2, flush_interval=60
+    )
+    await history.start()
+    try:
+        record(history)
+        record(history)
+        for _ in range(100):
+            if await history.get_executions():
+                break
+            await asyncio.sleep(0.01)
+        assert len(await history.get_executions()) == 2
+    finally:
+        await history.shutdown()
+
+
+async def test_shutdown_writes_the_buffer(engine):
+    history = HistoryRecorder(engine, timezone.utc, flush_interval=60)
+    await history.start()
+    record(history)
+
+    await history.shutdown()
+
+    assert len(await history.get_executions()) == 1
+
+
+async def test_unwritten_records_are_capped(engine):
+    history = HistoryRecorder(
+        engine, timezone.utc, flush_interval=0.01, max_buffer=2
+    )
+    history.engine = None  # every write fails
+    for job_uuid in "abc":
+        record(history, job_uuid=job_uuid)
+
+    await history.start()
+    await asyncio.sleep(0.05)
+    await history.shutdown()
+
+    assert [record["job_uuid"] for record in history._buffer] == ["b", "c"]
+
+
+async def test_executions_are_filtered_and_paginated(engine):
+    history = HistoryRecorder(engine, timezone.utc)
+    now = time.time()
+    record(history, job_uuid="a", category="mail", started_at=now - 60)
+    record(history, job_uuid="a", started_at=now - 30)
+    record(history, job_uuid="b", category="mail", started_at=now)
+    await history.flush()
+
+    assert [e["job_uuid"] for e in await history.get_executions()] == [
+        "b",
+        "a",
+        "a",
+    ]
+    mail = await history.get_executions(category="mail")
+    assert [e["job_uuid"] for e in mail] == ["b", "a"]
+    assert len(await history.get_executions(job_uuid="a")) == 2
+    assert len(await history.get_executions(started_from=now - 45)) == 2
+    assert len(await history.get_executions(started_to=now - 45)) == 1
+
+    (first,) = await history.get_executions(limit=1)
+    rest = await history.get_executions(before_id=first["id"])
+    assert [e["job_uuid"] for e in rest] == ["a", "a"]
+
+
+async def test_old_executions_are_pruned(engine):
+    history = HistoryRecorder(engine, timezone.utc)
+    record(history, job_uuid="old", started_at=time.time() - 3600)
+    record(history, job_uuid="new")
+    await history.flush()
+
+    assert await history.prune(max_age=60) == 1
+    assert [e["job_uuid"] for e in await history.get_executions()] == ["new"]
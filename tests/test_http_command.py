@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from job_scheduler.commands import HTTPCommand, HTTPCommandError
+from job_scheduler.http_client import (
+    get_http_session,
+    start_http_client,
+    stop_http_client,
+)
+from job_scheduler.settings import settings
+
+pytestmark = pytest.mark.anyio
+
+BIG_BODY = b"x" * 1024 * 1024
+
+
+class Target:
+    """HTTP server the commands call, records the client port per request."""
+
+    def __init__(self) -> None:
+        self.client_ports = []
+        self._runner = None
+        self.url = ""
+
+    async def _handle(self, request):
+        self.client_ports.append(
+            request.transport.get_extra_info("peername")[1]
+        )
+        status = int(request.query.get("status", 200))
+        if request.path == "/big":
+            return web.Response(body=BIG_BODY, status=status)
+        return web.Response(text="ok", status=status)
+
+    async def start(self) -> None:
+        target_app = web.Application()
+        target_app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(target_app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+
+@pytest.fixture
+async def target(monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", False)
+    target = Target()
+    await target.start()
+    await start_http_client()
+    yield target
+    await stop_http_client()
+    await target.stop()
+
+
+async def execute(command):
+    return await command.execute({"job_uuid": "a", "job_category": None})
+
+
+async def test_capture_reads_only_the_start_of_the_body(target):
+    result = await execute(
+        HTTPCommand(
+            f"{target.url}/big",
+            response_mode="capture",
+            response_max_bytes=10,
+        )
+    )
+
+    assert result.status == 200
+    assert result.response == "x" * 10
+
+
+@pytest.mark.parametrize("response_mode", ["discard", "read"])
+async def test_body_is_only_captured_on_request(target, response_mode):
+    result = await execute(
+        HTTPCommand(f"{target.url}/small", response_mode=response_mode)
+    )
+
+    assert result.status == 200
+    assert result.response is None
+
+
+async def test_failure_carries_the_captured_body(target):
+    with pytest.raises(HTTPCommandError) as error:
+        await execute(
+            HTTPCommand(
+                f"{target.url}/small?status=503", response_mode="capture"
+            )
+        )
+
+    assert error.value.status == 503
+    assert error.value.response == "ok"
+
+
+async def test_connection_is_closed_instead_of_draining_large_bodies(
+    target, monkeypatch
+):
+    monkeypatch.setattr(settings, "HTTP_DRAIN_MAX_BYTES", 1024)
+
+    for path in ("small", "small", "big", "small"):
+        await execute(HTTPCommand(f"{target.url}/{path}"))
+
+    first, second, big, after_big = target.client_ports
+    # Drained bodies free the connection for the next request
+    assert second == first == big
+    assert after_big != big
+
+
+async def test_client_is_started_once():
+    await start_http_client()
+    session = get_http_session()
+    await start_http_client()
+
+    assert get_http_session() is session
+    await stop_http_client()
+    with pytest.raises(RuntimeError):
+        get_http_session()
+
+
+async def test_commands_share_the_pooled_connections(target, monkeypatch):
+    await stop_http_client()
+    monkeypatch.setattr(settings, "HTTP_POOL_LIMIT_PER_HOST", 1)
+    await start_http_client()
+
+    await asyncio.gather(
+        *(execute(HTTPCommand(f"{target.url}/small")) for _ in range(5))
+    )
+
+    assert len(target.client_ports) == 5
+    assert len(set(target.client_ports)) == 1
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import update
+
+from job_scheduler import domain
+from job_scheduler.models import Job
+from job_scheduler.tables import idempotency_keys_t
+from tests.conftest import make_job_data, make_store, make_stored_job
+
+pytestmark = pytest.mark.anyio
+
+RUN_AT = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+async def test_first_job_with_a_key_is_kept(engine):
+    store = make_store(engine, "a")
+    first, second, third, other = (
+        make_stored_job(RUN_AT, idempotency_key=key)
+        for key in ("key", "key", "key", "other")
+    )
+
+    # Within one call and across calls
+    assert await store.add_jobs([first, second]) == [first.id, first.id]
+    assert await store.add_jobs([third, other]) == [first.id, other.id]
+    assert await store.count_jobs() == 2
+
+
+async def test_concurrent_jobs_with_a_key_resolve_to_one(engine):
+    stores = [make_store(engine, str(index)) for index in range(5)]
+
+    job_uuids = await asyncio.gather(
+        *(
+            store.add_jobs([make_stored_job(RUN_AT, idempotency_key="key")])
+            for store in stores
+        )
+    )
+
+    assert len({job_uuid for (job_uuid,) in job_uuids}) == 1
+    assert await make_store(engine, "a").count_jobs() == 1
+
+
+async def test_key_is_remembered_until_pruned(engine):
+    store = make_store(engine, "a")
+    job = make_stored_job(RUN_AT, idempotency_key="key")
+    await store.add_jobs([job])
+    # The job ran and was removed
+    await store.remove_jobs([job.id])
+    assert await store.add_jobs(
+        [make_stored_job(RUN_AT, idempotency_key="key")]
+    ) == [job.id]
+
+    assert await store.prune_idempotency_keys(max_age=60) == 0
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(idempotency_keys_t).values(created_at=time.time() - 120)
+        )
+    assert await store.prune_idempotency_keys(max_age=60) == 1
+
+    again = make_stored_job(RUN_AT, idempotency_key="key")
+    assert await store.add_jobs([again]) == [again.id]
+
+
+async def test_duplicate_is_reported_on_creation(scheduler):
+    job = Job.model_validate(make_job_data(idempotency_key="key"))
+
+    created = await domain.create_job(job)
+    duplicate = await domain.create_job(job)
+
+    assert not created["duplicate"]
+    assert duplicate["duplicate"]
+    assert duplicate["job_uuid"] == created["job_uuid"]
@@ -0,0 +1,138 @@
+import pytest
+
+from job_scheduler.commands import (
+    CircuitOpenError,
+    Command,
+    CommandResult,
+    HTTPCommandError,
+)
+from job_scheduler.job_runner import JobRunner
+from job_scheduler.models import RunnableJob
+from job_scheduler.settings import settings
+from tests.conftest import make_job
+
+pytestmark = pytest.mark.anyio
+
+RETRY = {"max_attempts": 3, "backoff_base": 2, "jitter": 0}
+
+
+class FailingCommand(Command):
+    def __init__(self, error: Exception) -> None:
+        super().__init__("failing")
+        self.error = error
+
+    async def execute(self, context):
+        raise self.error
+
+
+class History:
+    def __init__(self) -> None:
+        self.records = []
+
+    def record(self, **execution) -> None:
+        self.records.append(execution)
+
+
+def make_failing_job(error: Exception, **fields) -> RunnableJob:
+    job = make_job(**fields)
+    job.job.action._command = FailingCommand(error)
+    return job
+
+
+def make_runner(rescheduled):
+    async def reschedule_job(job: RunnableJob, delay: float) -> None:
+        rescheduled.append((job, delay))
+
+    history = History()
+    return JobRunner(reschedule_job=reschedule_job, history=history), history
+
+
+async def test_retryable_failure_is_rescheduled_with_backoff():
+    rescheduled = []
+    runner, history = make_runner(rescheduled)
+
+    failed_job = make_failing_job(
+        HTTPCommandError("unavailable", 503), attempt=2, retry=RETRY
+    )
+
+    await runner.run_job(failed_job)
+
+    ((job, delay),) = rescheduled
+    assert job.uuid == failed_job.uuid
+    assert job.attempt == 3
+    assert delay == 4
+    assert history.records[0]["outcome"] == "retry"
+    assert history.records[0]["status"] == 503
+
+
+@pytest.mark.parametrize(
+    "error, attempt, fields",
+    [
+        (HTTPCommandError("unavailable", 503), 3, {"retry": RETRY}),
+        (HTTPCommandError("not found", 404), 1, {"retry": RETRY}),
+        (HTTPCommandError("unavailable", 503), 1, {}),
+        (
+            HTTPCommandError("unavailable", 503),
+            1,
+            {"retry": RETRY, "schedule": {"type": "interval", "seconds": 60}},
+        ),
+    ],
+    ids=["exhausted", "not retryable", "no policy", "recurring"],
+)
+async def test_failure_is_not_retried(error, attempt, fields):
+    rescheduled = []
+    runner, history = make_runner(rescheduled)
+
+    await runner.run_job(make_failing_job(error, attempt=attempt, **fields))
+
+    assert rescheduled == []
+    assert history.records[0]["outcome"] == "failure"
+
+
+async def test_failed_reschedule_counts_as_failure():
+    async def reschedule_job(job: RunnableJob, delay: float) -> None:
+        raise RuntimeError("database is locked")
+
+    history = History()
+    runner = JobRunner(reschedule_job=reschedule_job, history=history)
+
+    await runner.run_job(
+        make_failing_job(HTTPCommandError("unavailable", 503), retry=RETRY)
+    )
+
+    assert history.records[0]["outcome"] == "failure"
+
+
+async def test_open_circuit_defers_without_counting_the_attempt(
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_OPEN_ACTION", "defer")
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_OPEN_DURATION", 30.0)
+    rescheduled = []
+    runner, history = make_runner(rescheduled)
+
+    await runner.run_job(
+        make_failing_job(CircuitOpenError("a", 10), retry=RETRY)
+    )
+
+    ((job, delay),) = rescheduled
+    assert job.attempt == 1
+    assert 10 <= delay <= 40
+    assert history.records[0]["outcome"] == "deferred"
+
+
+async def test_success_is_not_rescheduled():
+    class SucceedingCommand(Command):
+        async def execute(self, context):
+            return CommandResult(status=200)
+
+    rescheduled = []
+    runner, history = make_runner(rescheduled)
+    job = make_failing_job(RuntimeError(), retry=RETRY)
+    job.job.action._command = SucceedingCommand("succeeding")
+
+    await runner.run_job(job)
+
+    assert rescheduled == []
+    assert history.records[0]["outcome"] == "success"
+    assert history.records[0]["status"] == 200
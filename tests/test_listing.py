@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from job_scheduler import domain
+from job_scheduler.api_models import JobSelection, ListJobs
+from tests.conftest import make_stored_job
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def jobs(scheduler):
+    """Jobs a minute apart, the last two due at the same time."""
+    stored_jobs = [
+        make_stored_job(START + timedelta(minutes=min(index, 3)), name=name)
+        for index, name in enumerate(["a", "b", "c", "d", "e"])
+    ]
+    await scheduler.job_store.add_jobs(stored_jobs)
+    return sorted(stored_jobs, key=lambda job: (job.next_run_time, job.id))
+
+
+async def list_pages(**params):
+    pages = []
+    cursor = None
+    while True:
+        response = await domain.get_jobs_from_scheduler(
+            ListJobs(cursor=cursor, **params)
+        )
+        pages.append([job["uuid"] for job in response["jobs"]])
+        cursor = response["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_pages_follow_the_cursor(jobs):
+    ids = [job.id for job in jobs]
+
+    assert await list_pages(limit=2) == [ids[:2], ids[2:4], ids[4:]]
+    # No empty page after a full last page
+    assert await list_pages(limit=5) == [ids]
+
+
+async def test_pages_are_read_in_chunks(jobs, scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler, "JOBS_CHUNK_SIZE", 2)
+
+    assert await list_pages(limit=4) == [
+        [job.id for job in jobs[:4]],
+        [jobs[4].id],
+    ]
+
+
+@pytest.mark.parametrize(
+    "params, names",
+    [
+        ({"category": "mail"}, ["b"]),
+        ({"name_prefix": "d"}, ["d"]),
+        ({"run_at_to": START + timedelta(minutes=2)}, ["a", "b"]),
+        ({"run_at_from": START + timedelta(minutes=3)}, ["d", "e"]),
+        ({"paused": True}, ["c"]),
+        ({"paused": False}, ["a", "b", "d", "e"]),
+    ],
+)
+async def test_jobs_are_filtered(scheduler, params, names):
+    fields = {"b": {"category": "mail"}}
+    stored_jobs = [
+        make_stored_job(
+            START + timedelta(minutes=index), name=name, **fields.get(name, {})
+        )
+        for index, name in enumerate(["a", "b", "c", "d", "e"])
+    ]
+    await scheduler.job_store.add_jobs(stored_jobs)
+    await scheduler.pause_jobs_in_scheduler(
+        **JobSelection(name_prefix="c").model_dump()
+    )
+
+    response = await domain.get_jobs_from_scheduler(ListJobs(**params))
+
+    assert [job["job"]["name"] for job in response["jobs"]] == names
+
+
+async def test_invalid_cursor_is_rejected(scheduler):
+    with pytest.raises(ValueError):
+        await domain.get_jobs_from_scheduler(ListJobs(cursor="invalid"))
+    with pytest.raises(ValueError):
+        await domain.stream_jobs_from_scheduler(ListJobs(cursor="invalid"))
+
+
+async def test_stream_continues_after_the_cursor(jobs):
+    response = await domain.get_jobs_from_scheduler(ListJobs(limit=1))
+    params = ListJobs(cursor=response["next_cursor"], limit=3, stream=True)
+
+    lines = [
+        json.loads(line)
+        async for line in await domain.stream_jobs_from_scheduler(params)
+    ]
+
+    assert [job["uuid"] for job in lines] == [job.id for job in jobs[1:4]]
+
+
+async def test_job_is_looked_up_by_uuid(jobs, scheduler, monkeypatch):
+    async def get_jobs(**kwargs):
+        raise AssertionError("The store is not scanned")
+
+    monkeypatch.setattr(scheduler.job_store, "get_jobs", get_jobs)
+
+    response = await domain.get_job_from_scheduler(jobs[2].id)
+
+    assert response["status"] == "success"
+    assert response["job"]["uuid"] == jobs[2].id
+    assert response["job"]["paused"] is False
+
+
+async def test_unknown_job_is_not_found(scheduler):
+    response = await domain.get_job_from_scheduler("unknown")
+
+    assert response == {"status": "error", "message": "Job not found"}
@@ -0,0 +1,70 @@
+import pytest
+from loguru import logger
+
+from job_scheduler import log
+from job_scheduler.commands import Command, CommandResult
+from job_scheduler.job_runner import JobRunner
+from job_scheduler.settings import settings
+from tests.conftest import make_job
+
+pytestmark = pytest.mark.anyio
+
+
+class SucceedingCommand(Command):
+    async def execute(self, context):
+        return CommandResult(status=200)
+
+
+@pytest.fixture
+def records():
+    records = []
+    handler_id = logger.add(records.append, level="INFO")
+    yield records
+    logger.remove(handler_id)
+
+
+def test_long_bodies_are_truncated(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_MAX_BODY_SIZE", 4)
+
+    assert log.truncate("body") == "body"
+    assert log.truncate("long body") == "long..."
+    assert log.truncate(None) is None
+
+
+def test_credential_headers_are_redacted(monkeypatch):
+    monkeypatch.setattr(log, "REDACTED_HEADERS", {"authorization", "x-sig"})
+
+    assert log.redact_headers(
+        {"Authorization": "Bearer a", "X-Sig": "b", "Accept": "*/*"}
+    ) == {"Authorization": "***", "X-Sig": "***", "Accept": "*/*"}
+    assert log.redact_headers(None) is None
+
+
+def test_successes_are_sampled_per_category(monkeypatch):
+    monkeypatch.setattr(settings, "LOG_SUCCESS_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(log, "_success_sample_rates", {"mail": 1.0})
+
+    assert log.sample_success("mail")
+    assert not log.sample_success("bulk")
+    assert not log.sample_success(None)
+
+
+@pytest.mark.parametrize("rate, num_records", [(1.0, 1), (0.0, 0)])
+async def test_success_log_is_structured_and_sampled(
+    monkeypatch, records, rate, num_records
+):
+    monkeypatch.setattr(settings, "LOG_SUCCESS_SAMPLE_RATE", rate)
+    job = make_job()
+    job.job.action._command = SucceedingCommand("succeeding")
+
+    await JobRunner().run_job(job)
+
+    successes = [
+        record
+        for record in records
+        if "completed successfully" in record.record["message"]
+    ]
+    assert len(successes) == num_records
+    for record in successes:
+        assert record.record["extra"]["job_uuid"] == job.uuid
+        assert record.record["extra"]["duration"] >= 0
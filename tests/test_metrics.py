@@ -0,0 +1,74 @@
+import pytest
+
+from job_scheduler.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_counter_is_rendered_with_labels():
+    registry = MetricsRegistry()
+    runs = registry.register(
+        Counter("runs_total", "Runs.", ["category", "outcome"])
+    )
+    runs.inc("mail", "success")
+    runs.inc("mail", "success")
+    runs.inc('say "hi"', "failure", amount=3)
+
+    assert registry.render() == (
+        "# HELP runs_total Runs.\n"
+        "# TYPE runs_total counter\n"
+        'runs_total{category="mail",outcome="success"} 2.0\n'
+        'runs_total{category="say \\"hi\\"",outcome="failure"} 3.0\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    lag = Histogram("lag_seconds", "Lag.", ["category"], buckets=[1, 5])
+    for value in (0.5, 1, 3, 10):
+        lag.observe(value, "")
+
+    assert lag.render()[2:] == [
+        'lag_seconds_bucket{category="",le="1.0"} 2',
+        'lag_seconds_bucket{category="",le="5.0"} 3',
+        'lag_seconds_bucket{category="",le="+Inf"} 4',
+        'lag_seconds_sum{category=""} 14.5',
+        'lag_seconds_count{category=""} 4',
+    ]
+
+
+def test_gauge_is_read_when_rendered():
+    values = iter([1, 2])
+    gauge = Gauge("jobs", "Jobs.", lambda: next(values))
+
+    assert gauge.render()[2:] == ["jobs 1.0"]
+    assert gauge.render()[2:] == ["jobs 2.0"]
+
+
+def test_samples_of_workers_are_merged():
+    def make_registry():
+        registry = MetricsRegistry()
+        registry.register(Counter("runs_total", "Runs.", ["outcome"]))
+        registry.register(Histogram("lag_seconds", "Lag.", buckets=[1]))
+        registry.register(Gauge("jobs", "Jobs.", lambda: 0))
+        return registry
+
+    main, worker = make_registry(), make_registry()
+    for registry in (main, worker):
+        registry._metrics["runs_total"].inc("success")
+        registry._metrics["lag_seconds"].observe(2)
+
+    samples = worker.take_samples()
+    assert set(samples) == {"runs_total", "lag_seconds"}
+    assert worker.take_samples() == {}
+
+    main.merge_samples(samples)
+    rendered = main.render()
+    assert 'runs_total{outcome="success"} 2.0' in rendered
+    assert 'lag_seconds_bucket{le="+Inf"} 2' in rendered
+    assert "lag_seconds_sum 4.0" in rendered
+
+
+def test_metric_names_are_unique():
+    registry = MetricsRegistry()
+    registry.register(Counter("runs_total", "Runs."))
+
+    with pytest.raises(ValueError):
+        registry.register(Counter("runs_total", "Runs."))
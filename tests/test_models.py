@@ -0,0 +1,35 @@
+import pydantic
+import pytest
+
+from job_scheduler.models import Job
+from tests.conftest import make_job, make_job_data
+
+BATCHED = {"http": {"url": "http://b/"}, "batch": True}
+
+
+def test_follow_ups_can_be_batched():
+    job = Job.model_validate(
+        make_job_data(on_success=BATCHED, on_failure=BATCHED)
+    )
+
+    assert job.on_success.batch
+    assert job.on_failure.batch
+
+
+def test_main_action_cannot_be_batched():
+    with pytest.raises(pydantic.ValidationError, match="can be batched"):
+        Job.model_validate(make_job_data(action=BATCHED))
+
+
+def test_template_actions_take_batch_from_the_template():
+    with pytest.raises(pydantic.ValidationError, match="from the template"):
+        Job.model_validate(
+            make_job_data(on_success={"template": "notify", "batch": True})
+        )
+
+
+def test_context_has_the_attempt_of_retried_jobs_only():
+    retry = {"max_attempts": 3}
+
+    assert "job_attempt" not in make_job().to_context()
+    assert make_job(attempt=2, retry=retry).to_context()["job_attempt"] == 2
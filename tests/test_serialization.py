@@ -0,0 +1,98 @@
+import json
+import pickle
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from job_scheduler.store import StoredJob
+from job_scheduler.tables import jobs_t, legacy_jobs_t
+from tests.conftest import make_job, make_store, make_stored_job
+
+pytestmark = pytest.mark.anyio
+
+RUN_AT = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+async def read_payload(engine, job_id):
+    async with engine.connect() as conn:
+        return json.loads(
+            (
+                await conn.execute(
+                    select(jobs_t.c.payload).where(jobs_t.c.uuid == job_id)
+                )
+            ).scalar_one()
+        )
+
+
+async def test_jobs_are_stored_and_loaded_unchanged(engine):
+    store = make_store(engine, "a")
+    job = make_stored_job(
+        RUN_AT,
+        category="mail",
+        priority=3,
+        retry={"max_attempts": 5, "backoff_cap": 60},
+        idempotency_key="key",
+        on_success={"http": {"url": "http://b/", "method": "POST"}},
+    )
+    await store.add_jobs([job])
+
+    loaded = await store.lookup_job(job.id)
+
+    assert loaded.job.model_dump() == job.job.model_dump()
+    assert loaded.next_run_time == RUN_AT
+    assert await read_payload(engine, job.id) == {
+        "k": "key",
+        "r": {"backoff_cap": 60.0, "max_attempts": 5},
+    }
+
+
+async def test_schedules_are_stored_as_json(engine):
+    store = make_store(engine, "a")
+    schedule = {"type": "cron", "expression": "0 * * * *"}
+    runnable_job = make_job(RUN_AT, schedule=schedule)
+    await store.add_jobs([StoredJob(runnable_job, next_run_time=RUN_AT)])
+
+    loaded = await store.lookup_job(runnable_job.uuid)
+
+    assert loaded.job.job.schedule == runnable_job.job.schedule
+    assert loaded.trigger is not None
+    assert (await read_payload(engine, runnable_job.uuid))["t"]["type"] == (
+        "cron"
+    )
+
+
+async def test_plain_jobs_have_an_empty_payload(engine):
+    store = make_store(engine, "a")
+    job = make_stored_job(RUN_AT)
+    await store.add_jobs([job])
+
+    assert await read_payload(engine, job.id) == {}
+
+
+async def test_pickled_jobs_are_migrated(engine):
+    job = make_job(RUN_AT)
+    next_run_time = RUN_AT + timedelta(minutes=1)
+    job_state = pickle.dumps(
+        {"args": (None, job), "next_run_time": next_run_time}
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(legacy_jobs_t.create)
+        await conn.execute(
+            legacy_jobs_t.insert(),
+            [
+                {"id": job.uuid, "job_state": job_state},
+                {"id": "broken", "job_state": b"not a pickle"},
+            ],
+        )
+    store = make_store(engine, "a")
+
+    assert await store.migrate_legacy_jobs() == 1
+
+    loaded = await store.lookup_job(job.uuid)
+    assert loaded.job.model_dump() == job.model_dump()
+    assert loaded.next_run_time == next_run_time
+    async with engine.connect() as conn:
+        assert (
+            await conn.execute(select(func.count()).select_from(legacy_jobs_t))
+        ).scalar_one() == 0
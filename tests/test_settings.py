@@ -0,0 +1,45 @@
+import pytest
+
+from job_scheduler.settings import Settings
+
+DB_ENV = {
+    "DB_SCHEMA": "postgresql+asyncpg",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "jobs",
+    "DB_USER": "jobs",
+    "DB_PASSWORD": "secret",
+}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in DB_ENV:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    return monkeypatch
+
+
+def test_database_url_replaces_the_connection_settings(env):
+    env.setenv("DATABASE_URL", "sqlite+aiosqlite:///jobs.db")
+
+    settings = Settings()
+
+    assert settings.DATABASE_URL == "sqlite+aiosqlite:///jobs.db"
+    assert settings.DB_HOST is None
+
+
+def test_connection_settings_without_database_url(env):
+    for name, value in DB_ENV.items():
+        env.setenv(name, value)
+
+    assert Settings().DB_HOST == "localhost"
+
+
+def test_connection_settings_are_required_without_database_url(env):
+    for name, value in DB_ENV.items():
+        if name != "DB_PASSWORD":
+            env.setenv(name, value)
+
+    with pytest.raises(ValueError, match="DB_PASSWORD .*DATABASE_URL"):
+        Settings()
@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from apscheduler.util import datetime_to_utc_timestamp  # type: ignore
+
+from job_scheduler.models import HTTPJobData, JobAction
+from job_scheduler.store import StoredJob, schedule_options
+from job_scheduler.tables import action_templates_t
+from tests.conftest import make_job, make_store, make_stored_job
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_claim_leases_due_jobs_by_priority(engine):
+    store = make_store(engine, "a")
+    now = datetime.now(timezone.utc)
+    low = make_stored_job(now - timedelta(seconds=2))
+    high = make_stored_job(now - timedelta(seconds=1), priority=5)
+    later = make_stored_job(now + timedelta(hours=1))
+    await store.add_jobs([low, high, later])
+
+    claimed = await store.claim_due_jobs(now, 10)
+
+    assert [job.id for job in claimed] == [high.id, low.id]
+    assert claimed[0].lease_token == claimed[1].lease_token
+    assert await store.claim_due_jobs(now, 10) == []
+    assert await make_store(engine, "b").claim_due_jobs(now, 10) == []
+
+
+async def test_claims_do_not_mix_up_their_jobs(engine):
+    store = make_store(engine, "a")
+    now = datetime.now(timezone.utc)
+    jobs = [make_stored_job(now - timedelta(seconds=1)) for _ in range(3)]
+    await store.add_jobs(jobs)
+
+    first = await store.claim_due_jobs(now, 1)
+    second = await store.claim_due_jobs(now, 10)
+
+    assert len(first) == 1 and len(second) == 2
+    assert {job.id for job in first + second} == {job.id for job in jobs}
+    assert first[0].lease_token != second[0].lease_token
+
+
+async def test_expired_lease_is_taken_over(engine):
+    store = make_store(engine, "a", lease_duration=-1)
+    other = make_store(engine, "b")
+    now = datetime.now(timezone.utc)
+    job = make_stored_job(now - timedelta(seconds=1))
+    await store.add_jobs([job])
+
+    (claimed,) = await store.claim_due_jobs(now, 10)
+    (taken_over,) = await other.claim_due_jobs(now, 10)
+
+    assert taken_over.id == job.id
+    assert await store.complete_jobs([], [claimed]) == set()
+    assert await other.complete_jobs([], [taken_over]) == {job.id}
+    assert await store.lookup_job(job.id) is None
+
+
+async def test_complete_jobs_stores_next_run_time_and_releases(engine):
+    store = make_store(engine, "a")
+    now = datetime.now(timezone.utc)
+    job = make_stored_job(now - timedelta(seconds=1))
+    await store.add_jobs([job])
+
+    (claimed,) = await store.claim_due_jobs(now, 10)
+    claimed.next_run_time = now + timedelta(seconds=10)
+    assert await store.complete_jobs([claimed], []) == {job.id}
+
+    stored = await store.lookup_job(job.id)
+    assert stored.next_run_time == claimed.next_run_time
+    later = now + timedelta(seconds=20)
+    assert [job.id for job in await store.claim_due_jobs(later, 10)] == [
+        job.id
+    ]
+
+
+async def add_job_with_named_template(store, registry):
+    template = await registry.put_named(
+        "notify", JobAction(http=HTTPJobData(url="http://notify/"))
+    )
+    job = make_stored_job(
+        datetime.now(timezone.utc) + timedelta(hours=1),
+        on_success={"template": "notify"},
+    )
+    return template, job
+
+
+async def test_pruned_named_template_is_stored_again(engine, monkeypatch):
+    store = make_store(engine, "a")
+    registry = store.templates
+    template, job = await add_job_with_named_template(store, registry)
+    get_named = registry.get_named
+
+    async def get_named_then_prune(conn, names):
+        # Renamed and pruned after it was looked up
+        named = await get_named(conn, names)
+        await conn.execute(
+            action_templates_t.delete().where(
+                action_templates_t.c.hash == template.hash
+            )
+        )
+        return named
+
+    monkeypatch.setattr(registry, "get_named", get_named_then_prune)
+    await store.add_jobs([job])
+    registry._cache.clear()
+
+    stored = await store.lookup_job(job.id)
+    assert stored.job.job.on_success.http.url == "http://notify/"
+    assert await registry.prune(min_age=-1) == 0
+
+
+async def test_job_with_missing_template_is_kept(engine):
+    store = make_store(engine, "a")
+    registry = store.templates
+    template, job = await add_job_with_named_template(store, registry)
+    await store.add_jobs([job])
+    async with engine.begin() as conn:
+        await conn.execute(
+            action_templates_t.delete().where(
+                action_templates_t.c.hash == template.hash
+            )
+        )
+    registry._cache.clear()
+
+    assert await store.lookup_job(job.id) is None
+    assert await store.count_jobs() == 1
+
+    await registry.put_named(
+        "notify", JobAction(http=HTTPJobData(url="http://notify/"))
+    )
+    assert await store.lookup_job(job.id) is not None
+
+
+def make_recurring_job(start: datetime, seconds: int = 60) -> StoredJob:
+    job = make_job(
+        start,
+        schedule={
+            "type": "interval",
+            "seconds": seconds,
+            "start_date": start.isoformat(),
+        },
+    )
+    schedule = job.job.schedule
+    return StoredJob(
+        job,
+        next_run_time=start,
+        **schedule_options(schedule, schedule.build_trigger(timezone.utc)),
+    )
+
+
+async def claim_recurring_job(store):
+    now = datetime.now(timezone.utc)
+    job = make_recurring_job(now - timedelta(seconds=1))
+    await store.add_jobs([job])
+    (claimed,) = await store.claim_due_jobs(now, 10)
+    claimed.next_run_time = claimed.get_next_fire_time(
+        claimed.next_run_time, now
+    )
+    return claimed
+
+
+async def test_recurring_jobs_store_their_next_run_as_run_at(engine):
+    store = make_store(engine, "a")
+    claimed = await claim_recurring_job(store)
+
+    await store.complete_jobs([claimed], [])
+
+    stored = await store.lookup_job(claimed.id)
+    assert stored.job.job.run_at == claimed.next_run_time
+    run_at = datetime_to_utc_timestamp(claimed.next_run_time)
+    assert [
+        job.id
+        for job in await store.get_jobs(
+            limit=10, run_at_from=run_at, run_at_to=run_at + 1
+        )
+    ] == [claimed.id]
+
+
+async def test_shift_of_a_claimed_recurring_job_is_kept(engine):
+    store = make_store(engine, "a")
+    claimed = await claim_recurring_job(store)
+
+    assert await store.shift_selected_jobs(300) == 1
+    await store.complete_jobs([claimed], [])
+
+    stored = await store.lookup_job(claimed.id)
+    shifted = claimed.next_run_time + timedelta(seconds=300)
+    assert abs((stored.next_run_time - shifted).total_seconds()) < 0.001
+    assert stored.job.job.run_at == stored.next_run_time
+
+
+async def test_shift_of_a_held_job_is_kept(engine):
+    store = make_store(engine, "a")
+    now = datetime.now(timezone.utc)
+    job = make_stored_job(now - timedelta(seconds=1))
+    await store.add_jobs([job])
+    (claimed,) = await store.claim_due_jobs(now, 10)
+    await store.complete_jobs([], [], [claimed])
+
+    assert await store.shift_selected_jobs(300) == 1
+    await store.finish_jobs(
+        [(claimed.id, claimed.lease_token, claimed.claimed_run_time)]
+    )
+
+    # Released to run again at the shifted time
+    other = make_store(engine, "b")
+    assert await other.claim_due_jobs(now, 10) == []
+    later = now + timedelta(seconds=300)
+    assert [job.id for job in await other.claim_due_jobs(later, 10)] == [
+        job.id
+    ]
+
+
+async def test_unshifted_held_job_is_removed(engine):
+    store = make_store(engine, "a")
+    now = datetime.now(timezone.utc)
+    job = make_stored_job(now - timedelta(seconds=1))
+    await store.add_jobs([job])
+    (claimed,) = await store.claim_due_jobs(now, 10)
+    await store.complete_jobs([], [], [claimed])
+
+    assert (
+        await store.finish_jobs(
+            [(claimed.id, claimed.lease_token, claimed.claimed_run_time)]
+        )
+        == 1
+    )
+    assert await store.lookup_job(job.id) is None
+
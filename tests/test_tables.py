@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from job_scheduler.tables import create_or_upgrade_tables, jobs_t
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_startups_create_the_schema_once(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path}/race.db"
+    engines = [create_async_engine(url) for _ in range(4)]
+
+    async def start(engine):
+        async with engine.begin() as conn:
+            await conn.run_sync(create_or_upgrade_tables)
+
+    try:
+        await asyncio.gather(*(start(engine) for engine in engines))
+        async with engines[0].connect() as conn:
+            columns = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_columns(jobs_t.name)
+            )
+    finally:
+        for engine in engines:
+            await engine.dispose()
+
+    assert {column["name"] for column in columns} == set(jobs_t.c.keys())
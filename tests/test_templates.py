@@ -0,0 +1,56 @@
+import pytest
+
+from job_scheduler.models import HTTPJobData, JobAction
+from job_scheduler.templates import TemplateRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+def make_action(url: str) -> JobAction:
+    return JobAction(http=HTTPJobData(url=url))
+
+
+async def test_anonymous_templates_are_deduplicated(engine):
+    registry = TemplateRegistry(engine)
+    first = registry.intern(make_action("http://a/"))
+    second = registry.intern(make_action("http://a/"))
+
+    assert first is second
+    assert first.hash != registry.intern(make_action("http://b/")).hash
+
+
+async def test_put_named_moves_the_name(engine):
+    registry = TemplateRegistry(engine)
+    first = await registry.put_named("cb", make_action("http://a/"))
+    second = await registry.put_named("cb", make_action("http://b/"))
+
+    assert first.hash != second.hash
+    assert [t.hash for t in await registry.list_named()] == [second.hash]
+
+
+async def test_put_named_after_remove(engine):
+    registry = TemplateRegistry(engine)
+    template = await registry.put_named("cb", make_action("http://a/"))
+    assert await registry.remove_named("cb")
+
+    await registry.put_named("cb", make_action("http://a/"))
+
+    assert [t.hash for t in await registry.list_named()] == [template.hash]
+    async with engine.begin() as conn:
+        named = await registry.get_named(conn, ["cb"])
+    assert named["cb"].hash == template.hash
+
+
+async def test_put_named_back_to_earlier_content(engine):
+    registry = TemplateRegistry(engine)
+    first = await registry.put_named("cb", make_action("http://a/"))
+    await registry.put_named("cb", make_action("http://b/"))
+
+    again = await registry.put_named("cb", make_action("http://a/"))
+
+    assert again.hash == first.hash
+    assert [t.hash for t in await registry.list_named()] == [first.hash]
+
+
+async def test_remove_unknown_name(engine):
+    assert not await TemplateRegistry(engine).remove_named("missing")
@@ -0,0 +1,79 @@
+import math
+import random
+
+from job_scheduler.timing_wheel import TimingWheel
+
+
+def expire_all(wheel, end):
+    """Advances tick by tick, returns the time every key expired at."""
+    expired_at = {}
+    for now in range(1, end):
+        for key in wheel.advance(now):
+            expired_at[key] = now
+    assert len(wheel) == 0
+    return expired_at
+
+
+def test_keys_expire_on_the_first_tick_at_their_deadline():
+    wheel = TimingWheel(tick=1, start=0, slots=4, levels=2)
+    wheel.add("a", 2.5)
+    wheel.add("b", 3)
+
+    assert wheel.advance(2) == []
+    assert sorted(wheel.advance(3)) == ["a", "b"]
+    assert "a" not in wheel
+
+
+def test_keys_cascade_from_higher_levels_and_beyond_the_span():
+    # Level 0 spans 4 ticks, level 1 16 ticks
+    wheel = TimingWheel(tick=1, start=0, slots=4, levels=2)
+    deadlines = {"level 0": 3, "level 1": 9, "beyond": 40}
+    for key, deadline in deadlines.items():
+        wheel.add(key, deadline)
+
+    assert expire_all(wheel, 50) == deadlines
+
+
+def test_deadlines_match_a_sorted_list():
+    rng = random.Random(1)
+    wheel = TimingWheel(tick=1, start=0, slots=8, levels=3)
+    deadlines = {str(key): rng.uniform(0, 1000) for key in range(500)}
+    for key, deadline in deadlines.items():
+        wheel.add(key, deadline)
+
+    expired_at = expire_all(wheel, 1100)
+
+    # The first advance is at 1
+    assert expired_at == {
+        key: max(1, math.ceil(deadline)) for key, deadline in deadlines.items()
+    }
+
+
+def test_keys_are_moved_and_removed():
+    wheel = TimingWheel(tick=1, start=0, slots=4, levels=2)
+    wheel.add("moved", 10)
+    wheel.add("removed", 5)
+    wheel.add("moved", 2)
+    wheel.remove("removed")
+    wheel.remove("unknown")
+
+    assert len(wheel) == 1
+    assert wheel.advance(2) == ["moved"]
+    assert wheel.advance(20) == []
+
+
+def test_past_deadlines_expire_on_the_next_advance():
+    wheel = TimingWheel(tick=0.1, start=100, slots=4, levels=2)
+    wheel.add("late", 50)
+
+    assert wheel.advance(100) == ["late"]
+    assert len(wheel) == 0
+
+
+def test_empty_wheel_jumps_to_now():
+    wheel = TimingWheel(tick=1, start=0, slots=4, levels=2)
+    wheel.advance(10**6)
+    wheel.add("a", 10**6 + 2)
+
+    assert wheel.advance(10**6 + 1) == []
+    assert wheel.advance(10**6 + 2) == ["a"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from job_scheduler.workers import WorkerPool, get_job_shard
+from tests.conftest import make_job
+
+pytestmark = pytest.mark.anyio
+
+# Nothing listens on port 1, the connection error is retried
+RETRY = {"max_attempts": 2, "backoff_base": 60}
+
+
+class History:
+    def __init__(self) -> None:
+        self.records = []
+
+    def record(self, **execution) -> None:
+        self.records.append(execution)
+
+
+async def run_in_worker(reschedule_job):
+    history = History()
+    pool = WorkerPool(1, reschedule_job=reschedule_job, history=history)
+    await pool.start()
+    try:
+        job = make_job(
+            action={"http": {"url": "http://127.0.0.1:1/"}}, retry=RETRY
+        )
+        done = await pool.submit(job)
+        await asyncio.wait_for(done, timeout=30)
+    finally:
+        await pool.shutdown()
+    return job, history.records
+
+
+def test_jobs_are_sharded_by_uuid():
+    shards = {get_job_shard(f"job {index}", 4) for index in range(100)}
+
+    assert shards == {0, 1, 2, 3}
+    assert get_job_shard("job", 4) == get_job_shard("job", 4)
+
+
+async def test_retry_counts_once_the_main_process_stored_it():
+    rescheduled = []
+
+    async def reschedule_job(job, delay):
+        rescheduled.append((job, delay))
+
+    job, records = await run_in_worker(reschedule_job)
+
+    ((retry, delay),) = rescheduled
+    assert retry.uuid == job.uuid
+    assert retry.attempt == 2
+    assert [record["outcome"] for record in records] == ["retry"]
+
+
+async def test_failed_reschedule_counts_as_failure():
+    async def reschedule_job(job, delay):
+        raise RuntimeError("database is locked")
+
+    _, records = await run_in_worker(reschedule_job)
+
+    assert [record["outcome"] for record in records] == ["failure"]